@@ -1,37 +1,85 @@
 # app.py - Omni-Med Vault (Voice + Diagnosis Only)
-from logic import get_diagnosis, get_sub_options, get_all_main_symptoms, get_ai_diagnosis, detect_emergency
+from logic import get_diagnosis, get_sub_options, get_all_main_symptoms, get_ai_diagnosis, detect_emergency, detect_speech_symptom, get_ai_state, get_model_stats, AI_DISABLED_MESSAGE
 import streamlit as st
-import sqlite3
-import uuid
-import tempfile
 import os
-import base64
+import time
 from datetime import date
 
+import analytics
+import assets
+import database
+import metrics
 from emergency import show_emergency
+from history import prescription_page
+from search import normalize as normalize_name, search_patients
+from writer import get_writer
+import startup
 from streamlit_mic_recorder import mic_recorder
-# from voice import recognize_audio  # Uncomment when voice recognition is implemented
+
+# Voice recognition runs in a pool of Whisper worker processes; set
+# CLINIC_VOICE=1 to enable it (workers: CLINIC_TRANSCRIBE_WORKERS)
+VOICE_ENABLED = os.environ.get("CLINIC_VOICE") == "1"
+
+# CLINIC_TRACE=1 adds a per-run timing breakdown to the sidebar
+TRACE_ENABLED = os.environ.get("CLINIC_TRACE") == "1"
+run_started = time.perf_counter()
+request_trace = metrics.start_trace() if TRACE_ENABLED else None
 
 # ---------------------------
 # Page Config
 st.set_page_config(page_title="💊 Asquare Med's", page_icon="💊")
 
+# ---------------------------
+# Cached Resources (built once per process, not on every rerun)
+DB_PATH = database.DB_PATH
+
+
+@st.cache_resource(show_spinner=False)
+def background_css(image_path, mtime):
+    # mtime is part of the cache key so replacing the image invalidates it.
+    # With static serving on, the CSS points at resized variants in static/
+    # (built here, once per process) instead of carrying the image itself.
+    if st.get_option("server.enableStaticServing"):
+        try:
+            return assets.background_css(assets.build_variants(image_path))
+        except (ImportError, OSError) as e:
+            print(f"⚠️ Static background unavailable, inlining it: {e}")
+    return assets.inline_background_css(image_path)
+
+
+@st.cache_resource(show_spinner=False)
+def init_schema(db_path):
+    # Schema, indexes and WAL mode; connections come from database's shared pool
+    database.init_db(db_path)
+    # Summary tables + triggers; filled from existing history the first time
+    analytics.ensure_analytics(db_path)
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def symptom_index():
+    symptoms = get_all_main_symptoms()
+    return symptoms, {symptom: i for i, symptom in enumerate(symptoms)}
+
+
+@st.fragment(run_every=0.5)
+def transcription_progress():
+    # Polls the pending job on its own timer, rerunning only this fragment;
+    # once the job finishes, one full rerun acts on the transcript
+    from transcriber import FINISHED, get_transcription_service
+    job = get_transcription_service().poll(st.session_state.transcription_job)
+    if job.state not in FINISHED:
+        st.info(f"🎧 Transcribing... ({job.state})")
+        return
+    st.session_state.transcription_job = None
+    st.session_state.transcription_result = job
+    st.rerun()
+
+
 # Background Image
 def set_background(image_path):
-    with open(image_path, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode()
-
     st.markdown(
-        f"""
-        <style>
-        .stApp {{
-            background-image: url("data:image/jpeg;base64,{encoded}");
-            background-size: cover;
-            background-position: center;
-            background-attachment: fixed;
-        }}
-        </style>
-        """,
+        background_css(image_path, os.path.getmtime(image_path)),
         unsafe_allow_html=True
     )
 
@@ -42,31 +90,7 @@ st.subheader("Your AI-Powered Home Clinic")
 
 # ---------------------------
 # Database Setup
-conn = sqlite3.connect("clinic.db", check_same_thread=False, timeout=10)
-c = conn.cursor()
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS patients (
-    id TEXT PRIMARY KEY,
-    name TEXT UNIQUE,
-    age INTEGER,
-    gender TEXT,
-    dob TEXT
-)
-""")
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS prescriptions (
-    id TEXT PRIMARY KEY,
-    patient_id TEXT,
-    symptom TEXT,
-    sub_symptom TEXT,
-    medicine TEXT,
-    dosage TEXT,
-    bin INTEGER
-)
-""")
-conn.commit()
+init_schema(DB_PATH)
 
 # ---------------------------
 # Session State
@@ -76,6 +100,18 @@ if "patient" not in st.session_state:
 if "speech_symptom" not in st.session_state:
     st.session_state.speech_symptom = None
 
+if "pending_writes" not in st.session_state:
+    st.session_state.pending_writes = []
+
+if "transcription_job" not in st.session_state:
+    st.session_state.transcription_job = None
+
+# Surface background write failures from earlier reruns
+for future in [f for f in st.session_state.pending_writes if f.done()]:
+    st.session_state.pending_writes.remove(future)
+    if future.exception() is not None:
+        st.error(f"Saving a prescription failed: {future.exception()}")
+
 # ---------------------------
 # Patient Registration / Auto Load
 if st.session_state.patient is None:
@@ -83,19 +119,27 @@ if st.session_state.patient is None:
 
     name = st.text_input("Name", key="register_name")
 
+    # Ranked, case-insensitive matches; an exact (any-case) hit loads directly
     existing_patient = None
-    if name.strip() != "":
-        c.execute("SELECT id, dob, gender, age FROM patients WHERE name = ?", (name,))
-        existing_patient = c.fetchone()
+    matches = search_patients(name, db_path=DB_PATH) if name.strip() != "" else []
+    if matches and normalize_name(matches[0][0].name) == normalize_name(name):
+        existing_patient = matches[0][0]
+    elif matches:
+        match_options = {f"{p.name} ({p.age}, {p.gender})": p for p, _ in matches}
+        picked = st.selectbox(
+            "Existing patients with a similar name",
+            ["— New patient —"] + list(match_options),
+            key="patient_match"
+        )
+        existing_patient = match_options.get(picked)
 
     if existing_patient:
-        patient_id, dob, gender, age = existing_patient
         st.session_state.patient = {
-            "id": patient_id,
-            "name": name,
-            "DOB": dob,
-            "age": age,
-            "gender": gender
+            "id": existing_patient.id,
+            "name": existing_patient.name,
+            "DOB": existing_patient.dob,
+            "age": existing_patient.age,
+            "gender": existing_patient.gender
         }
         st.success("Existing patient loaded successfully!")
 
@@ -109,20 +153,15 @@ if st.session_state.patient is None:
             if name.strip() == "":
                 st.error("Name cannot be empty!")
             else:
-                patient_id = str(uuid.uuid4())
+                with metrics.timed("db_write_seconds", site="register_patient"):
+                    patient = database.add_patient(name, dob, age, gender, db_path=DB_PATH)
                 st.session_state.patient = {
-                    "id": patient_id,
+                    "id": patient.id,
                     "name": name,
-                    "DOB": str(dob),
+                    "DOB": patient.dob,
                     "age": age,
                     "gender": gender
                 }
-
-                c.execute(
-                    "INSERT INTO patients (id, name, dob, age, gender) VALUES (?, ?, ?, ?, ?)",
-                    (patient_id, name, str(dob), age, gender)
-                )
-                conn.commit()
                 st.success(f"Patient {name} registered successfully!")
 
 # ---------------------------
@@ -138,57 +177,61 @@ if st.session_state.patient is not None:
         start_prompt="🎤 Start Recording",
         stop_prompt="⏹ Stop Recording",
         just_once=True,
-        use_container_width=True
+        use_container_width=True,
+        format="wav"
     )
 
     detected_symptom = None
+    spoken_text = ""
     if audio and "bytes" in audio:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            tmp.write(audio["bytes"])
-            audio_path = tmp.name
-
-        # Uncomment this line if you implement voice recognition
-        # spoken_text = recognize_audio(audio_path)
-
-        spoken_text = ""  # placeholder if audio recognition is not enabled
-        os.remove(audio_path)
-
-        if spoken_text:
-            st.write(f"🗣 You said: **{spoken_text}**")
-
-            # Detect emergencies from spoken text
-            is_emergency, keyword = detect_emergency(spoken_text)
-            if is_emergency:
-                st.error("🚨 EMERGENCY DETECTED!")
-                st.error(f"Issue: {keyword.upper()}")
-                show_emergency(c, conn, st.session_state.patient["id"])
-                st.stop()
-
-            # Map spoken keywords to main symptoms
-            speech_symptom_map = {
-                "cough": "Cough",
-                "fever": "Fever",
-                "headache": "Headache",
-                "pain": "Pain",
-                "cold": "Cough",
-                "temperature": "Fever",
-                "breath": "Breathing Difficulty",
-            }
-
-            for key, value in speech_symptom_map.items():
-                if key in spoken_text.lower():
-                    st.session_state.speech_symptom = value
-                    st.success(f"Detected symptom from speech: **{value}**")
-                    break
+        if VOICE_ENABLED:
+            # Hand the clip to the worker pool; the UI thread never runs Whisper
+            from transcriber import QueueFull, get_transcription_service
+            try:
+                st.session_state.transcription_job = get_transcription_service().submit(audio["bytes"])
+            except (QueueFull, RuntimeError) as e:
+                st.warning(f"Voice recognition unavailable right now: {e}")
+        else:
+            st.info("Voice recognition is disabled on this kiosk.")
+
+    if st.session_state.transcription_job is not None:
+        transcription_progress()
+    job = st.session_state.pop("transcription_result", None)
+    if job is not None:
+        from transcriber import DONE
+        if job.state == DONE:
+            spoken_text = job.result.text.lower()
+            # Whisper ran in a worker process; record its timing here
+            metrics.observe("transcription_seconds", job.result.latency_seconds, source="pool")
+            metrics.count("transcription_audio_seconds_total", job.result.audio_seconds)
+        else:
+            st.warning(f"Could not transcribe audio ({job.state}): {job.error}")
+
+    if spoken_text:
+        st.write(f"🗣 You said: **{spoken_text}**")
+
+        # Detect emergencies from spoken text
+        is_emergency, keyword = detect_emergency(spoken_text)
+        if is_emergency:
+            st.error("🚨 EMERGENCY DETECTED!")
+            st.error(f"Issue: {keyword.upper()}")
+            show_emergency(st.session_state.patient["id"])
+            st.stop()
+
+        # Map spoken keywords to main symptoms
+        speech_symptom = detect_speech_symptom(spoken_text)
+        if speech_symptom:
+            st.session_state.speech_symptom = speech_symptom
+            st.success(f"Detected symptom from speech: **{speech_symptom}**")
 
     # ---------------------------
     # Symptom Selection
     st.write("### 🩺 Select Symptoms")
+    main_symptoms, main_symptom_index = symptom_index()
     main_symptom = st.selectbox(
         "Main Symptom",
-        get_all_main_symptoms(),
-        index=get_all_main_symptoms().index(st.session_state.speech_symptom)
-        if st.session_state.speech_symptom in get_all_main_symptoms() else 0
+        main_symptoms,
+        index=main_symptom_index.get(st.session_state.speech_symptom, 0)
     )
 
     sub_symptom = st.selectbox("Sub Symptom", get_sub_options(main_symptom))
@@ -203,19 +246,51 @@ if st.session_state.patient is not None:
         st.info(f"Dosage: {result['Dosage']}")
         st.warning(f"Dispensing from Bin {result['Bin']}")
 
-        c.execute("""
-        INSERT INTO prescriptions VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            str(uuid.uuid4()),
-            st.session_state.patient["id"],
-            main_symptom,
-            sub_symptom,
-            result["Medicine"],
-            result["Dosage"],
-            result["Bin"]
-        ))
-        conn.commit()
-        st.success("Prescription saved successfully!")
+        # Group-committed in the background; the future is checked on later reruns
+        with metrics.timed("db_write_seconds", site="prescription"):
+            st.session_state.pending_writes.append(
+                get_writer(DB_PATH).submit_prescription(
+                    st.session_state.patient["id"],
+                    main_symptom,
+                    sub_symptom,
+                    result["Medicine"],
+                    result["Dosage"],
+                    result["Bin"]
+                )
+            )
+        # Not committed yet: a failed commit is reported on a later rerun
+        st.info("📝 Prescription queued for saving.")
+
+    # ---------------------------
+    # 📜 Prescription History (one keyset page per rerun, only while shown)
+    if st.toggle("📜 Show prescription history"):
+        # Cursors of the pages before the current one, so "Newer" can step back
+        if "history_cursors" not in st.session_state:
+            st.session_state.history_cursors = [None]
+        page = prescription_page(st.session_state.patient["id"],
+                                 cursor=st.session_state.history_cursors[-1], db_path=DB_PATH)
+        if not page.rows:
+            st.caption("No prescriptions recorded yet.")
+        else:
+            st.dataframe(
+                [{"When": row.created_at[:19] or "—", "Symptom": row.symptom,
+                  "Detail": row.sub_symptom, "Medicine": row.medicine, "Dosage": row.dosage}
+                 for row in page.rows],
+                hide_index=True, width="stretch",
+            )
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            if st.button("⬅ Newer", disabled=len(st.session_state.history_cursors) == 1):
+                st.session_state.history_cursors.pop()
+                st.rerun()
+        with p2:
+            st.caption(f"Page {len(st.session_state.history_cursors)}")
+        with p3:
+            if st.button("Older ➡", disabled=page.next_cursor is None):
+                st.session_state.history_cursors.append(page.next_cursor)
+                st.rerun()
+    else:
+        st.session_state.pop("history_cursors", None)
 
 # =========================
 # 🤖 AI Diagnosis (Enhanced UI)
@@ -269,7 +344,12 @@ st.divider()
 
 # --- AI Action ---
 ai_result = None
-if st.button("🧠 Generate AI Diagnosis"):
+ai_state = get_ai_state()
+if ai_state == "disabled":
+    st.warning(f"🧠 {AI_DISABLED_MESSAGE}")
+elif ai_state == "error":
+    st.error(f"🧠 AI model failed to load: {get_model_stats()['error']}")
+if st.button("🧠 Generate AI Diagnosis", disabled=ai_state not in ("ready", "available")):
     with st.spinner("🔍 Analyzing patient data..."):
         gender_num = 0 if gender_value == "Male" else 1 if gender_value == "Female" else 2
         patient_data = [
@@ -278,6 +358,15 @@ if st.button("🧠 Generate AI Diagnosis"):
         ]
         ai_result = get_ai_diagnosis(patient_data)
 
+        # Keep the entered vitals as history instead of discarding them
+        if st.session_state.patient is not None:
+            from vitals_store import get_vitals_store
+            with metrics.timed("db_write_seconds", site="vitals"):
+                get_vitals_store(DB_PATH).record(st.session_state.patient["id"], {
+                    "temperature": temp_ai, "heart_rate": hr_ai, "bp_systolic": bp_sys_ai,
+                    "spo2": spo2_ai, "wbc": wbc_ai, "crp": crp_ai, "hemoglobin": hb_ai, "bmi": bmi,
+                })
+
     st.subheader("📌 AI Prediction")
     st.success(f"🧾 **Diagnosis:** {ai_result}")
 
@@ -295,6 +384,94 @@ with st.expander("💡 AI Health Tip"):
         "Always combine AI predictions with clinical judgment."
     )
 
+# ---------------------------
+# 📈 Vitals History (queried only while the toggle is on)
+if st.session_state.patient is not None and st.toggle("📈 Show vitals history"):
+    # numpy/pandas load with the first history view, not with the page
+    import pandas as pd
+    from vitals_store import get_vitals_store
+    vitals_store = get_vitals_store(DB_PATH)
+    history_metrics = vitals_store.series(st.session_state.patient["id"])
+    if not history_metrics:
+        st.caption("No vitals recorded for this patient yet.")
+    else:
+        h1, h2 = st.columns(2)
+        with h1:
+            history_metric = st.selectbox(
+                "Metric", history_metrics,
+                index=history_metrics.index("heart_rate") if "heart_rate" in history_metrics else 0
+            )
+        with h2:
+            history_days = st.selectbox("Period", [1, 7, 30, 90, 365], index=2,
+                                        format_func=lambda d: f"Last {d} days")
+        now = time.time()
+        buckets = vitals_store.downsample(st.session_state.patient["id"], history_metric,
+                                          now - history_days * 86400, now, buckets=120)
+        if len(buckets.start) > 1:
+            st.line_chart(pd.DataFrame(
+                {"min": buckets.min, "mean": buckets.mean, "max": buckets.max},
+                index=pd.to_datetime(buckets.start, unit="s"),
+            ))
+        elif len(buckets.start) == 1:
+            st.metric(history_metric, f"{buckets.mean[0]:g}")
+        st.caption(f"{int(buckets.n.sum())} readings in {len(buckets.start)} time buckets")
+
 # ---------------------------
 if st.session_state.patient is not None:
-    show_emergency(c, conn, st.session_state.patient["id"])
+    show_emergency(st.session_state.patient["id"])
+
+# ---------------------------
+# 📊 Clinic Analytics (summary tables only; cost grows with buckets, not rows)
+if st.toggle("📊 Show clinic analytics"):
+    from logic import DIAGNOSIS_TREE
+    analytics_days = st.selectbox("Window", [1, 7, 30, 90], index=1,
+                                  format_func=lambda d: "Today" if d == 1 else f"Last {d} days")
+    analytics_since = date.fromordinal(date.today().toordinal() - analytics_days + 1)
+
+    # Every Bin in the tree, including ones nothing was dispensed from
+    units = {(row.bin, row.medicine): row.units
+             for row in analytics.bin_usage(analytics_since, db_path=DB_PATH)}
+    for options in DIAGNOSIS_TREE.values():
+        for entry in options.values():
+            units.setdefault((entry["Bin"], entry["Medicine"]), 0)
+    st.markdown("**Units dispensed per Bin**")
+    st.dataframe(
+        [{"Bin": b, "Medicine": medicine, "Units": n} for (b, medicine), n in sorted(units.items())],
+        width="stretch", hide_index=True,
+    )
+
+    analytics_symptom = st.selectbox("Top medicines for", ["All symptoms"] + list(DIAGNOSIS_TREE))
+    top = analytics.top_medicines(
+        None if analytics_symptom == "All symptoms" else analytics_symptom,
+        since=analytics_since, db_path=DB_PATH,
+    )
+    if top:
+        st.dataframe([row._asdict() for row in top], width="stretch", hide_index=True)
+    else:
+        st.caption("Nothing dispensed in this window.")
+
+    hours = analytics.emergencies_per_hour(analytics_since, db_path=DB_PATH)
+    st.markdown(f"**Emergencies per hour** ({sum(h.emergencies for h in hours)} in this window)")
+    if hours:
+        st.bar_chart({"hour": [h.hour + ":00" for h in hours],
+                      "emergencies": [h.emergencies for h in hours]},
+                     x="hour", y="emergencies")
+
+# ---------------------------
+# Instrumentation (runs cut short by st.stop / st.rerun are not recorded)
+metrics.observe("app_rerun_seconds", time.perf_counter() - run_started)
+first_render = startup.mark_first_render()
+if first_render is not None:
+    metrics.observe("app_first_render_seconds", first_render)
+metrics.maybe_export()
+
+if request_trace is not None:
+    with st.sidebar.expander("⏱ Request trace", expanded=True):
+        st.write(f"Script run: **{request_trace.total_ms():.1f} ms**")
+        if startup.first_render_seconds():
+            st.caption(f"Process start → first render: {startup.first_render_seconds() * 1e3:.0f} ms")
+        for span in request_trace.spans:
+            labels = " ".join(f"{k}={v}" for k, v in span.labels.items())
+            st.text(f"+{span.start_ms:7.1f} ms  {span.duration_ms:8.2f} ms  {span.name} {labels}")
+        if not request_trace.spans:
+            st.caption("No instrumented calls in this run.")
@@ -0,0 +1,269 @@
+# analytics.py - Dispensing & Emergency Aggregates (trigger-maintained summary tables)
+#
+# Dashboards read small summary tables instead of scanning prescriptions:
+#   dispense_daily    one row per day x Bin x medicine x symptom/sub_symptom
+#   emergency_hourly  one row per hour x emergency reason
+# Triggers on prescriptions update them inside the same transaction as the
+# write, so every writer (the write-behind queue, add_emergency, imports)
+# keeps them current, and a rolled-back write leaves them untouched.
+# Times come from created_at (emergencies were backfilled from dosage by
+# database._migrate); rows from before created_at existed land in day ''.
+#
+# Usage: python analytics.py rebuild [--db clinic.db]    (recompute from raw rows)
+#        python analytics.py report [--db clinic.db] [--days 7]
+
+import argparse
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import database
+import metrics
+
+_ensured = set()
+_ensure_lock = threading.Lock()
+
+# Same key expressions in the triggers and in rebuild()
+_DAY = "substr({row}.created_at, 1, 10)"
+_HOUR = "substr({row}.created_at, 1, 13)"
+_DISPENSED = "{row}.symptom != 'Emergency'"
+_EMERGENCY = "{row}.symptom = 'Emergency'"
+
+
+def _trigger(name, event, row, delta):
+    day, hour = _DAY.format(row=row), _HOUR.format(row=row)
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON prescriptions BEGIN
+        INSERT INTO dispense_daily (day, bin, medicine, symptom, sub_symptom, n)
+        SELECT {day}, {row}.bin, {row}.medicine, {row}.symptom, {row}.sub_symptom, {delta}
+        WHERE {_DISPENSED.format(row=row)}
+        ON CONFLICT DO UPDATE SET n = n + excluded.n;
+        INSERT INTO emergency_hourly (hour, reason, n)
+        SELECT {hour}, {row}.sub_symptom, {delta}
+        WHERE {_EMERGENCY.format(row=row)}
+        ON CONFLICT DO UPDATE SET n = n + excluded.n;
+    END
+    """
+
+
+ANALYTICS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS dispense_daily (
+        day TEXT NOT NULL,
+        bin INTEGER NOT NULL,
+        medicine TEXT NOT NULL,
+        symptom TEXT NOT NULL,
+        sub_symptom TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (day, bin, medicine, symptom, sub_symptom)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS emergency_hourly (
+        hour TEXT NOT NULL,
+        reason TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (hour, reason)
+    ) WITHOUT ROWID
+    """,
+    _trigger("prescriptions_analytics_ai", "INSERT", "new", 1),
+    _trigger("prescriptions_analytics_ad", "DELETE", "old", -1),
+    # An edit moves the row from its old buckets to its new ones
+    _trigger("prescriptions_analytics_au_old", "UPDATE", "old", -1),
+    _trigger("prescriptions_analytics_au_new", "UPDATE", "new", 1),
+)
+
+
+def _rebuild(conn):
+    # Caller holds the transaction
+    conn.execute("DELETE FROM dispense_daily")
+    conn.execute("DELETE FROM emergency_hourly")
+    conn.execute(
+        f"""
+        INSERT INTO dispense_daily (day, bin, medicine, symptom, sub_symptom, n)
+        SELECT {_DAY.format(row='p')} AS day, p.bin, p.medicine, p.symptom, p.sub_symptom, count(*)
+        FROM prescriptions p WHERE {_DISPENSED.format(row='p')}
+        GROUP BY day, p.bin, p.medicine, p.symptom, p.sub_symptom
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO emergency_hourly (hour, reason, n)
+        SELECT {_HOUR.format(row='p')} AS hour, p.sub_symptom, count(*)
+        FROM prescriptions p WHERE {_EMERGENCY.format(row='p')}
+        GROUP BY hour, p.sub_symptom
+        """
+    )
+
+
+def ensure_analytics(db_path=None):
+    """Create the summary tables and triggers (once per path), filling them from history."""
+    db_path = db_path or database.DB_PATH
+    if db_path in _ensured:
+        return
+
+    with _ensure_lock:
+        if db_path in _ensured:
+            return
+        with database.transaction(db_path) as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'prescriptions_analytics_ai'"
+            ).fetchone()
+            for statement in ANALYTICS_SCHEMA:
+                conn.execute(statement)
+            if not exists:
+                # Same transaction as the triggers: no write can slip in between
+                _rebuild(conn)
+        _ensured.add(db_path)
+
+
+def rebuild(db_path=None):
+    """Recompute every aggregate from the raw prescriptions; returns seconds taken."""
+    ensure_analytics(db_path)
+    start = time.perf_counter()
+    with database.transaction(db_path) as conn:
+        _rebuild(conn)
+    return time.perf_counter() - start
+
+
+# ==================================================
+# 📊 QUERIES (read only the aggregates)
+# ==================================================
+
+BinUsage = namedtuple("BinUsage", ["bin", "medicine", "units"])
+MedicineCount = namedtuple("MedicineCount", ["symptom", "medicine", "units"])
+HourCount = namedtuple("HourCount", ["hour", "emergencies"])
+DayCount = namedtuple("DayCount", ["day", "units"])
+
+
+def _day_range(since, until):
+    """Clauses for day-keyed tables; since/until are dates, inclusive."""
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("day >= ?")
+        params.append(str(since))
+    if until is not None:
+        clauses.append("day <= ?")
+        params.append(str(until))
+    return clauses, params
+
+
+def _query(sql, params, db_path):
+    with metrics.timed("analytics_query_seconds"), database.connection(db_path) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def bin_usage(since=None, until=None, db_path=None):
+    """Units dispensed from each Bin (and what it holds), lowest Bin first."""
+    ensure_analytics(db_path)
+    clauses, params = _day_range(since, until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = _query(
+        f"SELECT bin, medicine, sum(n) FROM dispense_daily {where}"
+        " GROUP BY bin, medicine HAVING sum(n) > 0 ORDER BY bin, medicine",
+        params, db_path,
+    )
+    return [BinUsage(*row) for row in rows]
+
+
+def top_medicines(symptom=None, limit=3, since=None, until=None, db_path=None):
+    """The `limit` most dispensed medicines per symptom (or for one symptom)."""
+    ensure_analytics(db_path)
+    clauses, params = _day_range(since, until)
+    if symptom is not None:
+        clauses.append("symptom = ?")
+        params.append(symptom)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = _query(
+        f"""
+        SELECT symptom, medicine, units FROM (
+            SELECT symptom, medicine, sum(n) AS units,
+                   row_number() OVER (PARTITION BY symptom ORDER BY sum(n) DESC, medicine) AS rank
+            FROM dispense_daily {where}
+            GROUP BY symptom, medicine
+        )
+        WHERE rank <= ? AND units > 0 ORDER BY symptom, units DESC
+        """,
+        params + [limit], db_path,
+    )
+    return [MedicineCount(*row) for row in rows]
+
+
+def dispensed_per_day(since=None, until=None, db_path=None):
+    ensure_analytics(db_path)
+    clauses, params = _day_range(since, until)
+    clauses.append("day != ''")
+    rows = _query(
+        f"SELECT day, sum(n) FROM dispense_daily WHERE {' AND '.join(clauses)}"
+        " GROUP BY day ORDER BY day",
+        params, db_path,
+    )
+    return [DayCount(*row) for row in rows]
+
+
+def emergencies_per_hour(since=None, until=None, reason=None, db_path=None):
+    """Emergencies per 'YYYY-MM-DD HH' hour (hours without any are omitted)."""
+    ensure_analytics(db_path)
+    clauses, params = ["hour != ''"], []
+    if since is not None:
+        clauses.append("hour >= ?")
+        params.append(str(since))
+    if until is not None:
+        # An inclusive end date covers its last hour, 'YYYY-MM-DD 23'
+        clauses.append("hour <= ?")
+        params.append(f"{until} 23")
+    if reason is not None:
+        clauses.append("reason = ?")
+        params.append(reason)
+    rows = _query(
+        f"SELECT hour, sum(n) FROM emergency_hourly WHERE {' AND '.join(clauses)}"
+        " GROUP BY hour HAVING sum(n) > 0 ORDER BY hour",
+        params, db_path,
+    )
+    return [HourCount(*row) for row in rows]
+
+
+def bucket_counts(db_path=None):
+    """Rows in each summary table: what a dashboard query reads at most."""
+    ensure_analytics(db_path)
+    with database.connection(db_path) as conn:
+        return {
+            table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            for table in ("dispense_daily", "emergency_hourly")
+        }
+
+
+# ==================================================
+# 🖥 COMMAND LINE
+# ==================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Clinic analytics aggregates")
+    parser.add_argument("command", choices=("rebuild", "report"))
+    parser.add_argument("--db", default=database.DB_PATH)
+    parser.add_argument("--days", type=int, default=7, help="report window")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        seconds = rebuild(args.db)
+        print(f"✅ Rebuilt analytics in {seconds:.2f}s: {bucket_counts(args.db)}")
+        return 0
+
+    since = (datetime.now() - timedelta(days=args.days - 1)).date()
+    print(f"Last {args.days} days (since {since})\n\nBin  units  medicine")
+    for row in bin_usage(since, db_path=args.db):
+        print(f"{row.bin:3d} {row.units:6d}  {row.medicine}")
+    print("\nTop medicines per symptom")
+    for row in top_medicines(since=since, db_path=args.db):
+        print(f"  {row.symptom:<20} {row.units:6d}  {row.medicine}")
+    hours = emergencies_per_hour(since, db_path=args.db)
+    print(f"\nEmergencies: {sum(h.emergencies for h in hours)} in {len(hours)} hours")
+    for row in hours[-24:]:
+        print(f"  {row.hour}:00  {row.emergencies}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
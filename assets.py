@@ -0,0 +1,158 @@
+# assets.py - Static Image Assets (resized WebP/JPEG variants, served by URL)
+#
+# The page background used to travel inline as a base64 data URI inside a
+# st.markdown block, i.e. in every rerun's delta to every browser. Here it
+# is resized and re-encoded once into static/ under content-hashed names,
+# served by Streamlit's static file serving (.streamlit/config.toml) and
+# referenced from the CSS by URL, so a rerun carries a few hundred bytes of
+# CSS and the browser fetches each image once.
+#
+# Usage: python assets.py [--source background.jpeg]
+# (pre-generates the variants for a deployment and prints the payload report)
+
+import argparse
+import base64
+import hashlib
+import os
+import sys
+from collections import namedtuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Streamlit serves <app dir>/static/<name> at app/static/<name>
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL = "app/static"
+
+# Target widths; never upscaled past the source. Phones get the small one.
+WIDTHS = (480, 960)
+SMALL_SCREEN_PX = 640
+FORMATS = (("webp", "image/webp", {"quality": 75, "method": 6}),
+           ("jpg", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}))
+
+Variant = namedtuple("Variant", "width fmt mime path url bytes")
+
+
+def content_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def build_variants(source, static_dir=STATIC_DIR, widths=WIDTHS):
+    """
+    Write every width x format variant of `source` into static_dir, named
+    <stem>-<sha>-<width>.<ext>, and return them. Existing files are reused
+    (the name changes with the content, so they are never stale) and
+    variants of earlier versions of the same image are removed.
+    """
+    from PIL import Image   # Pillow ships with Streamlit
+
+    stem = os.path.splitext(os.path.basename(source))[0]
+    digest = content_hash(source)
+    os.makedirs(static_dir, exist_ok=True)
+
+    variants = []
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        targets = sorted({min(width, image.width) for width in widths})
+        for width in targets:
+            height = round(image.height * width / image.width)
+            resized = None
+            for ext, mime, options in FORMATS:
+                name = f"{stem}-{digest}-{width}.{ext}"
+                path = os.path.join(static_dir, name)
+                if not os.path.exists(path):
+                    if resized is None:
+                        resized = (image if width == image.width
+                                   else image.resize((width, height), Image.LANCZOS))
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    resized.save(tmp, format="JPEG" if ext == "jpg" else ext.upper(), **options)
+                    os.replace(tmp, path)   # concurrent workers never see half a file
+                variants.append(Variant(width, ext, mime, path, f"{STATIC_URL}/{name}",
+                                        os.path.getsize(path)))
+
+    current = {os.path.basename(v.path) for v in variants}
+    for name in os.listdir(static_dir):
+        if name.startswith(f"{stem}-") and name not in current and not name.endswith(".tmp"):
+            os.remove(os.path.join(static_dir, name))
+    return variants
+
+
+def _image_set(variants, width):
+    return "image-set(" + ", ".join(
+        f'url("{v.url}") type("{v.mime}")' for v in variants if v.width == width) + ")"
+
+
+def background_css(variants):
+    """CSS for the page background: WebP where supported, JPEG otherwise."""
+    widths = sorted({v.width for v in variants})
+    small, large = widths[0], widths[-1]
+    jpeg = {v.width: v.url for v in variants if v.fmt == "jpg"}
+    # The plain url() line is for browsers without image-set() type() support
+    return f"""
+        <style>
+        .stApp {{
+            background-image: url("{jpeg[large]}");
+            background-image: {_image_set(variants, large)};
+            background-size: cover;
+            background-position: center;
+            background-attachment: fixed;
+        }}
+        @media (max-width: {SMALL_SCREEN_PX}px) {{
+            .stApp {{
+                background-image: url("{jpeg[small]}");
+                background-image: {_image_set(variants, small)};
+            }}
+        }}
+        </style>
+        """
+
+
+def inline_background_css(source):
+    """The previous approach: the original file as a base64 data URI."""
+    with open(source, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode()
+    return f"""
+        <style>
+        .stApp {{
+            background-image: url("data:image/jpeg;base64,{encoded}");
+            background-size: cover;
+            background-position: center;
+            background-attachment: fixed;
+        }}
+        </style>
+        """
+
+
+def payload_report(source, static_dir=STATIC_DIR):
+    """Bytes per rerun (the CSS markdown) and per first visit, inline vs static."""
+    variants = build_variants(source, static_dir)
+    inline = len(inline_background_css(source).encode())
+    by_url = len(background_css(variants).encode())
+    largest = max(v.width for v in variants)
+    return {
+        "inline_rerun_bytes": inline,
+        "static_rerun_bytes": by_url,
+        "source_bytes": os.path.getsize(source),
+        # A desktop WebP browser fetches one file, once
+        "first_visit_bytes": next(v.bytes for v in variants
+                                  if v.width == largest and v.fmt == "webp"),
+        "variants": variants,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build static image variants")
+    parser.add_argument("--source", default=os.path.join(BASE_DIR, "background.jpeg"))
+    args = parser.parse_args()
+
+    report = payload_report(args.source)
+    for v in report["variants"]:
+        print(f"{os.path.relpath(v.path, BASE_DIR):<48} {v.width:5d}px {v.bytes:8,} bytes")
+    print(f"\nsource image:               {report['source_bytes']:8,} bytes")
+    print(f"per rerun, inline base64:   {report['inline_rerun_bytes']:8,} bytes")
+    print(f"per rerun, by URL:          {report['static_rerun_bytes']:8,} bytes")
+    print(f"first visit image download: {report['first_visit_bytes']:8,} bytes (cached afterwards)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
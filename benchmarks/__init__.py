@@ -0,0 +1,5 @@
+# benchmarks - Reproducible micro/macro benchmarks for the clinic app
+#
+# Usage: python -m benchmarks [--quick] [--only PATTERN] [--save-baseline]
+# The bench_*.py scripts alongside are standalone deep-dives into one
+# component each and still run on their own.
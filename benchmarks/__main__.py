@@ -0,0 +1,90 @@
+# __main__.py - Benchmark suite runner
+#
+# Usage: python -m benchmarks [--quick] [--only 'db_*' ...] [--group ai db ...]
+#                             [--baseline benchmarks/baseline.json] [--save-baseline]
+#                             [--threshold 0.25] [--metric p50] [--output results.json]
+# Exits 1 when any benchmark regressed past --threshold against the baseline,
+# or when a baseline benchmark is missing from a full run (no --only/--group).
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks import cases  # noqa: F401  (registers the cases)
+from benchmarks.harness import (
+    CASES, Runner, compare, format_comparison, format_header, load_results, missing_from,
+    save_results,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def main():
+    groups = sorted({group for group, _ in CASES})
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--quick", action="store_true", help="fewer samples, no 1M-row database")
+    parser.add_argument("--only", nargs="+", default=None, help="benchmark name patterns (fnmatch)")
+    parser.add_argument("--group", nargs="+", choices=groups, default=None)
+    parser.add_argument("--db-sizes", type=int, nargs="+", default=None)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write this run as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument("--metric", choices=["p50", "p95", "p99"], default="p50")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many ms")
+    parser.add_argument("--output", default=None, help="also write this run's results here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="clinic-bench-")
+    runner = Runner(workdir, quick=args.quick, only=args.only, db_sizes=args.db_sizes)
+    print(format_header())
+    try:
+        runner.run(args.group)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        save_results(args.output, runner.results, runner.skipped)
+
+    if args.save_baseline:
+        save_results(args.baseline, runner.results, runner.skipped)
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    baseline = load_results(args.baseline)
+    rows = compare(runner.results, baseline["results"], args.threshold,
+                   args.metric, args.min_delta_ms / 1e3)
+    print(f"\nvs baseline from {baseline['created']}:")
+    print(format_comparison(rows, args.metric))
+
+    failed = False
+    missing = missing_from(runner.results, baseline["results"])
+    if missing:
+        # A narrowed run is expected to leave most of the baseline out
+        narrowed = args.only or args.group
+        mark = "⚠️" if narrowed else "❌"
+        print(f"\n{mark} {len(missing)} baseline benchmark(s) not run: " + ", ".join(missing))
+        if runner.skipped:
+            print("   skipped: " + ", ".join(f"{name} ({why})" for name, why in runner.skipped.items()))
+        failed = not narrowed
+
+    regressions = [row.name for row in rows if row.regressed]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}: "
+              + ", ".join(regressions))
+        failed = True
+    else:
+        print(f"\n✅ no regressions beyond {args.threshold:.0%}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# bench_analytics.py - Dashboard queries: summary tables vs full scans of prescriptions
+#
+# Usage: python benchmarks/bench_analytics.py [--rows 100000 1000000] [--days 365]
+# For each size: seeds a scratch database (the real diagnosis tree, ~2%
+# emergencies spread over --days), times the rebuild, the same three
+# dashboard questions answered from the aggregates and by scanning the raw
+# rows, and what the triggers add to a write.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+import database  # noqa: E402
+from logic import DIAGNOSIS_TREE  # noqa: E402
+
+CHOICES = [(symptom, sub, entry["Medicine"], entry["Dosage"], entry["Bin"])
+           for symptom, options in DIAGNOSIS_TREE.items() for sub, entry in options.items()]
+
+
+def seed(path, rows, days):
+    rng = random.Random(rows)
+    end = datetime(2026, 1, 1)
+    span = days * 86400
+
+    def row():
+        when = end - timedelta(seconds=rng.random() * span)
+        if rng.random() < 0.02:
+            return database.new_emergency("p", rng.choice(["Chest Pain", "Fainting", "Breathing"]), when)
+        symptom, sub, medicine, dosage, b = rng.choice(CHOICES)
+        return database.Prescription(str(uuid.UUID(int=rng.getrandbits(128), version=4)), "p",
+                                     symptom, sub, medicine, dosage, b,
+                                     when.strftime(database.TIMESTAMP_FORMAT))
+
+    database.init_db(path)
+    with database.transaction(path) as conn:
+        conn.executemany(
+            "INSERT INTO prescriptions"
+            " (id, patient_id, symptom, sub_symptom, medicine, dosage, bin, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (row() for _ in range(rows)),
+        )
+    return end.date()
+
+
+def best(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - begin)
+    return min(times) * 1e3
+
+
+def scans(conn, since):
+    """The same answers computed from raw rows, as the app would without aggregates."""
+    return {
+        "units per Bin": lambda: conn.execute(
+            "SELECT bin, medicine, count(*) FROM prescriptions"
+            " WHERE symptom != 'Emergency' AND created_at >= ? GROUP BY bin, medicine",
+            (str(since),)).fetchall(),
+        "top medicines per symptom": lambda: conn.execute(
+            "SELECT symptom, medicine, count(*) AS c FROM prescriptions"
+            " WHERE symptom != 'Emergency' AND created_at >= ?"
+            " GROUP BY symptom, medicine ORDER BY symptom, c DESC", (str(since),)).fetchall(),
+        "emergencies per hour": lambda: conn.execute(
+            "SELECT substr(created_at, 1, 13) AS h, count(*) FROM prescriptions"
+            " WHERE symptom = 'Emergency' AND created_at >= ? GROUP BY h", (str(since),)).fetchall(),
+    }
+
+
+def write_cost(path, rows=2000):
+    """ms per single-row commit and per row inside one batch transaction."""
+    rng = random.Random(1)
+
+    def make():
+        symptom, sub, medicine, dosage, b = rng.choice(CHOICES)
+        return database.new_prescription("p", symptom, sub, medicine, dosage, b)
+
+    begin = time.perf_counter()
+    for _ in range(rows // 10):
+        with database.transaction(path) as conn:
+            database.insert_prescription(conn, make())
+    single = (time.perf_counter() - begin) / (rows // 10) * 1e3
+    begin = time.perf_counter()
+    with database.transaction(path) as conn:
+        for _ in range(rows):
+            database.insert_prescription(conn, make())
+    batched = (time.perf_counter() - begin) / rows * 1e3
+    return single, batched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory(prefix="clinic-analytics-") as workdir:
+            path = os.path.join(workdir, "clinic.db")
+            print(f"\n=== {rows:,} prescriptions over {args.days} days ===", flush=True)
+            end = seed(path, rows, args.days)
+            before = write_cost(path)
+
+            start = time.perf_counter()
+            analytics.ensure_analytics(path)
+            print(f"initial build (ensure_analytics): {time.perf_counter() - start:.2f}s, "
+                  f"buckets {analytics.bucket_counts(path)}")
+            print(f"rebuild command:                  {analytics.rebuild(path):.2f}s")
+
+            conn = database.open_connection(path)
+            print(f"\n{'question':<28} {'window':>8} {'aggregates ms':>14} {'scan ms':>10}")
+            for days in (7, 365):
+                since = end - timedelta(days=days)
+                fast = {
+                    "units per Bin": lambda: analytics.bin_usage(since, db_path=path),
+                    "top medicines per symptom": lambda: analytics.top_medicines(since=since, db_path=path),
+                    "emergencies per hour": lambda: analytics.emergencies_per_hour(since, db_path=path),
+                }
+                for name, scan in scans(conn, since).items():
+                    print(f"{name:<28} {days:7d}d {best(fast[name]):14.3f} {best(scan, 3):10.1f}")
+
+            after = write_cost(path)
+            print(f"\nwrite cost ms/row           {'1-row commit':>14} {'in a batch':>10}")
+            print(f"{'without triggers':<28} {before[0]:14.3f} {before[1]:10.4f}")
+            print(f"{'with triggers':<28} {after[0]:14.3f} {after[1]:10.4f}")
+            conn.close()
+            database.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# bench_bundle.py - Model load time: checksummed bundle vs the three pickles
+#
+# Usage: python benchmarks/bench_bundle.py [--rows 20000] [--trees 100] [--repeat 5]
+# Trains one forest on generated data, writes it both ways into a temp
+# directory, then times each load path in a fresh interpreter (imports
+# included, as on a cold Streamlit start) and again warm in this process.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import generate_data  # noqa: E402
+import train_brain  # noqa: E402
+from bundle import BUNDLE_FILE, load_bundle  # noqa: E402
+
+COLD = {
+    "three pickles": (
+        "import joblib\n"
+        "model = joblib.load('medical_model.pkl')\n"
+        "scaler = joblib.load('scaler.pkl')\n"
+        "encoder = joblib.load('encoder.pkl')\n"
+    ),
+    "bundle (mmap, verified)": (
+        "from bundle import load_bundle\n"
+        f"load_bundle('{BUNDLE_FILE}', mmap=True, verify=True)\n"
+    ),
+    "bundle (mmap, unverified)": (
+        "from bundle import load_bundle\n"
+        f"load_bundle('{BUNDLE_FILE}', mmap=True, verify=False)\n"
+    ),
+}
+
+
+def cold_load(code, workdir):
+    # Time inside the child so interpreter start-up is not counted
+    script = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        "start = time.perf_counter()\n"
+        + code +
+        "print(time.perf_counter() - start)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", script], cwd=workdir,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def warm_load(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import joblib
+
+    with tempfile.TemporaryDirectory(prefix="clinic-bundle-") as workdir:
+        data_path = os.path.join(workdir, "data.parquet")
+        generate_data.write_dataset(data_path, args.rows, seed=7)
+        data = train_brain.load_dataset(data_path)
+        model = train_brain.train_model(data.X_train, data.y_train, n_estimators=args.trees)
+        artifacts = train_brain.save_artifacts(model, data.scaler, data.encoder, workdir, legacy=True)
+
+        pickle_bytes = sum(artifacts[k]["bytes"] for k in ("model", "scaler", "encoder"))
+        print(f"{args.trees} trees on {len(data.X_train):,} rows: "
+              f"bundle {artifacts['bundle']['bytes'] / 1e6:.2f} MB, "
+              f"pickles {pickle_bytes / 1e6:.2f} MB")
+
+        print(f"\n{'cold (fresh process, imports included)':<40} {'median ms':>10}")
+        for name, code in COLD.items():
+            times = sorted(cold_load(code, workdir) for _ in range(args.repeat))
+            print(f"{name:<40} {times[len(times) // 2] * 1e3:10.1f}")
+
+        def pickles():
+            for name in ("medical_model.pkl", "scaler.pkl", "encoder.pkl"):
+                joblib.load(os.path.join(workdir, name))
+
+        bundle_path = os.path.join(workdir, BUNDLE_FILE)
+        warm = {
+            "three pickles": pickles,
+            "bundle (mmap, verified)": lambda: load_bundle(bundle_path),
+            "bundle (mmap, unverified)": lambda: load_bundle(bundle_path, verify=False),
+            "bundle (in memory, verified)": lambda: load_bundle(bundle_path, mmap=False),
+        }
+        print(f"\n{'warm (modules already imported)':<40} {'best ms':>10}")
+        for name, fn in warm.items():
+            print(f"{name:<40} {warm_load(fn, args.repeat) * 1e3:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench_forest.py - Compiled forest latency vs sklearn
+#
+# Usage: python benchmarks/bench_forest.py
+# Bit-for-bit parity with sklearn is checked by tests/test_forest.py.
+# Uses medical_model.pkl / scaler.pkl from the repo root when present,
+# otherwise fits a 100-tree forest on synthetic vitals.
+
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from forest import CompiledForest, export_forest  # noqa: E402
+
+
+def synthetic_vitals(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(18, 91, n),            # Age
+        rng.integers(0, 2, n),              # Gender
+        rng.normal(37.2, 1.1, n).round(1),  # Temp
+        rng.integers(50, 150, n),           # HR
+        rng.integers(70, 160, n),           # Sys
+        rng.integers(80, 100, n),           # SpO2
+        rng.normal(8.5, 4.0, n).round(1),   # WBC
+        rng.exponential(25.0, n).round(1),  # CRP
+        rng.normal(14.0, 1.5, n).round(1),  # Hb
+    ]).astype(np.float64)
+
+
+def load_or_fit():
+    model_path = os.path.join(ROOT, "medical_model.pkl")
+    scaler_path = os.path.join(ROOT, "scaler.pkl")
+    if os.path.exists(model_path) and os.path.exists(scaler_path):
+        return joblib.load(model_path), joblib.load(scaler_path)
+
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    X = synthetic_vitals(5000, seed=1)
+    y = (X[:, 2] > 38).astype(int) + 2 * (X[:, 5] < 90) + (X[:, 7] > 40)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(scaler.transform(X), y)
+    return model, scaler
+
+
+def sklearn_predict(model, scaler, X, proba=False):
+    # Same arithmetic as scaler.transform, without the feature-name warning
+    scaled = (X - scaler.mean_) / scaler.scale_
+    return model.predict_proba(scaled) if proba else model.predict(scaled)
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    model, scaler = load_or_fit()
+    compiled = CompiledForest(**export_forest(model, scaler))
+
+    print(f"{'batch':>8} {'sklearn (ms)':>14} {'compiled (ms)':>14} {'speedup':>8}")
+    for batch in (1, 100, 1000, 10000, 100000):
+        Xb = synthetic_vitals(batch, seed=3)
+        repeat = 20 if batch == 1 else 3
+        t_sk = timeit(lambda: sklearn_predict(model, scaler, Xb), repeat)
+        t_cf = timeit(lambda: compiled.predict(Xb), repeat)
+        print(f"{batch:>8} {t_sk * 1e3:>14.3f} {t_cf * 1e3:>14.3f} {t_sk / t_cf:>7.1f}x")
+
+    # Traversal block size (CompiledForest.block_rows) at 100k rows
+    default = compiled.block_rows
+    for block in (256, 512, 1024, 2048, 4096):
+        compiled.block_rows = block
+        print(f"block_rows {block:>5}{'*' if block == default else ' '} "
+              f"{timeit(lambda: compiled.predict(Xb), 3) * 1e3:>10.3f} ms")
+    compiled.block_rows = default
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# bench_history.py - Prescription history: keyset vs OFFSET pages, export memory
+#
+# Usage: python benchmarks/bench_history.py [--rows 1000000] [--patients 1000]
+# Seeds a scratch database, times the first and a deep page both ways
+# (clinic-wide and for one patient), then exports every row to CSV and
+# Parquet in a child process and reports its peak RSS next to a naive
+# fetchall() + write of the same rows.
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+import history  # noqa: E402
+
+
+def seed(path, rows, patients):
+    rng = random.Random(0)
+    ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(patients)]
+    start = datetime(2023, 1, 1)
+    database.init_db(path)
+    with database.transaction(path) as conn:
+        conn.executemany(
+            "INSERT INTO prescriptions"
+            " (id, patient_id, symptom, sub_symptom, medicine, dosage, bin, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((str(uuid.UUID(int=rng.getrandbits(128), version=4)), rng.choice(ids),
+              "Fever", "Mild", "Paracetamol", "500mg", 1,
+              (start + timedelta(seconds=i * 30)).strftime(database.TIMESTAMP_FORMAT))
+             for i in range(rows)),
+        )
+    return ids
+
+
+def best(fn, repeat=20):
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - begin)
+    return min(times) * 1e3
+
+
+def offset_page(conn, page, patient_id=None):
+    where = "WHERE patient_id = ?" if patient_id else ""
+    params = [patient_id] if patient_id else []
+    return conn.execute(
+        f"SELECT * FROM prescriptions {where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+        params + [history.PAGE_SIZE, page * history.PAGE_SIZE],
+    ).fetchall()
+
+
+def keyset_cursor(page, patient_id, db_path):
+    """Walk to `page` once (untimed) and return its cursor."""
+    cursor = None
+    for _ in range(page):
+        cursor = history.prescription_page(patient_id, cursor=cursor, db_path=db_path).next_cursor
+    return cursor
+
+
+EXPORT_CHILD = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+import history
+start = time.perf_counter()
+if {naive!r}:
+    import csv, database
+    rows = database.open_connection({db!r}).execute(
+        "SELECT * FROM prescriptions ORDER BY created_at, id").fetchall()
+    with open({out!r}, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+    n = len(rows)
+else:
+    n = history.export_prescriptions({out!r}, db_path={db!r})
+print(n, time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def export_child(db, out, naive=False):
+    code = EXPORT_CHILD.format(root=ROOT, db=db, out=out, naive=naive)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    rows, seconds, rss_kb = result.stdout.split()
+    return int(rows), float(seconds), int(rss_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="clinic-history-") as workdir:
+        db = os.path.join(workdir, "clinic.db")
+        print(f"seeding {args.rows:,} prescriptions for {args.patients:,} patients...")
+        ids = seed(db, args.rows, args.patients)
+        conn = database.open_connection(db)
+        patient = ids[0]
+        per_patient = conn.execute(
+            "SELECT count(*) FROM prescriptions WHERE patient_id = ?", (patient,)).fetchone()[0]
+
+        print(f"\n{'page (20 rows)':<36} {'keyset ms':>10} {'OFFSET ms':>10}")
+        deep = args.rows // history.PAGE_SIZE - 1
+        deep_patient = max(per_patient // history.PAGE_SIZE - 1, 0)
+        for label, patient_id, page in (
+            ("clinic-wide, first page", None, 0),
+            (f"clinic-wide, page {deep:,}", None, deep),
+            ("one patient, first page", patient, 0),
+            (f"one patient, page {deep_patient:,}", patient, deep_patient),
+        ):
+            cursor = keyset_cursor(page, patient_id, db) if page else None
+            keyset = best(lambda: history.prescription_page(patient_id, cursor=cursor, db_path=db))
+            offset = best(lambda: offset_page(conn, page, patient_id), repeat=3 if page else 20)
+            print(f"{label:<36} {keyset:10.3f} {offset:10.3f}")
+
+        print(f"\n{'export (child process)':<36} {'rows':>10} {'seconds':>8} {'peak RSS MB':>12}")
+        for label, name, naive in (
+            ("streaming CSV", "audit.csv", False),
+            ("streaming Parquet", "audit.parquet", False),
+            ("fetchall() + CSV", "naive.csv", True),
+        ):
+            rows, seconds, rss = export_child(db, os.path.join(workdir, name), naive)
+            print(f"{label:<36} {rows:10,} {seconds:8.2f} {rss:12.1f}")
+        conn.close()
+        database.close_all()
+
+
+if __name__ == "__main__":
+    main()
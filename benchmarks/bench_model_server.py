@@ -0,0 +1,138 @@
+# bench_model_server.py - Model server load test: micro-batching on vs off
+#
+# Usage: python benchmarks/bench_model_server.py [--clients 4] [--threads 16]
+#                                                [--seconds 5] [--max-wait-ms 2]
+# Starts model_server.py in a subprocess, then --clients processes x
+# --threads threads each send single-row diagnoses in a closed loop (the
+# shape of many Streamlit sessions) for --seconds. Reports requests/s and
+# latency percentiles for: batching on, batching off (--max-batch 1), and
+# in-process inference in every client (no server). A last run with a tiny
+# queue shows backpressure: refused requests come back at once.
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def client_process(address, threads, seconds, seed):
+    """Runs in a child process; returns (latencies, overloaded, errors)."""
+    sys.path.insert(0, ROOT)
+    import generate_data
+
+    frame = generate_data.generate_chunk(1000, seed)
+    rows = frame[generate_data.COLUMNS[:-1]].to_numpy(dtype=np.float64)
+
+    if address:
+        from model_server import ModelClient, Overloaded
+        client = ModelClient(address, timeout=10)
+
+        def call(row):
+            try:
+                client.predict(row)
+                return 0
+            except Overloaded:
+                return 1
+    else:
+        import logic
+        logic.warm_up()
+
+        def call(row):
+            logic.get_ai_diagnosis(row)
+            return 0
+
+    results = [([], [0]) for _ in range(threads)]
+    start_at = time.perf_counter() + 0.2
+    stop_at = start_at + seconds
+
+    def work(index):
+        latencies, overloaded = results[index]
+        i = index
+        while time.perf_counter() < start_at:
+            time.sleep(0.001)
+        while time.perf_counter() < stop_at:
+            begin = time.perf_counter()
+            overloaded[0] += call(rows[i % len(rows)])
+            latencies.append(time.perf_counter() - begin)
+            i += threads
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [x for lat, _ in results for x in lat], sum(o[0] for _, o in results)
+
+
+def wait_for(address, timeout=60):
+    from model_server import parse_address
+    family, sockaddr = parse_address(address)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.connect(sockaddr)
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"model server did not come up on {address}")
+
+
+def run(label, args, address=None, server_args=None):
+    server = None
+    if server_args is not None:
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "model_server.py"), "--address", address]
+            + server_args, cwd=ROOT, stdout=subprocess.DEVNULL)
+        wait_for(address)
+    try:
+        with ProcessPoolExecutor(args.clients) as pool:
+            futures = [pool.submit(client_process, address, args.threads, args.seconds, seed)
+                       for seed in range(args.clients)]
+            results = [f.result() for f in futures]
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    latencies = np.sort(np.concatenate([np.array(r[0]) for r in results]))
+    overloaded = sum(r[1] for r in results)
+    p50, p95, p99 = (np.percentile(latencies, q) * 1e3 for q in (50, 95, 99))
+    print(f"{label:<34} {len(latencies) / args.seconds:10,.0f} {p50:8.2f} {p95:8.2f} "
+          f"{p99:8.2f} {overloaded / len(latencies):9.1%}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--threads", type=int, default=16, help="threads per client process")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    address = f"unix:{os.path.join(tempfile.gettempdir(), f'clinic-bench-{os.getpid()}.sock')}"
+    print(f"{args.clients} client processes x {args.threads} threads, {args.seconds:g}s each run, "
+          f"{os.cpu_count()} CPUs")
+    print(f"\n{'mode':<34} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'refused':>9}")
+    run(f"server, batch ≤ {args.max_batch}, wait {args.max_wait_ms:g} ms", args, address,
+        ["--max-batch", str(args.max_batch), "--max-wait-ms", str(args.max_wait_ms)])
+    run("server, batching off", args, address, ["--max-batch", "1"])
+    run("in-process (model per client)", args)
+    run("server, queue of 8 (backpressure)", args, address,
+        ["--max-batch", str(args.max_batch), "--max-wait-ms", str(args.max_wait_ms),
+         "--max-queue", "8"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_rerun.py - Streamlit rerun wall time for APP.py (headless AppTest)
+#
+# Usage: python benchmarks/bench_rerun.py [--reruns 50]
+# Runs inside a scratch directory so clinic.db is never touched.
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRIPT_TIMES = []
+
+
+def _time_script_exec():
+    """
+    AppTest polls for completion with sleeps, which swamps a ~10 ms rerun.
+    Time the script body itself by wrapping the exec() the runner uses.
+    """
+    import builtins
+    from streamlit.runtime.scriptrunner import script_runner
+
+    def timed_exec(code, globals_=None, locals_=None):
+        start = time.perf_counter()
+        try:
+            return builtins.exec(code, globals_, locals_)
+        finally:
+            SCRIPT_TIMES.append(time.perf_counter() - start)
+
+    script_runner.exec = timed_exec
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    print(
+        f"{label}: n={len(timings)} "
+        f"mean={statistics.mean(timings) * 1e3:.2f} ms "
+        f"p50={timings[len(timings) // 2] * 1e3:.2f} ms "
+        f"p95={timings[max(int(len(timings) * 0.95) - 1, 0)] * 1e3:.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=50)
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    _time_script_exec()
+
+    workdir = tempfile.mkdtemp(prefix="clinic-rerun-")
+    shutil.copy(os.path.join(ROOT, "background.jpeg"), workdir)
+    os.chdir(workdir)
+
+    try:
+        at = AppTest.from_file(os.path.join(ROOT, "APP.py"), default_timeout=30)
+        start = time.perf_counter()
+        at.run()
+        first = time.perf_counter() - start
+
+        # Simulate typing into the Name field: one rerun per keystroke
+        timings = []
+        name = "keystroke patient"
+        for i in range(args.reruns):
+            at.text_input(key="register_name").input(name[: i % len(name) + 1])
+            start = time.perf_counter()
+            at.run()
+            timings.append(time.perf_counter() - start)
+
+        print(f"first run: {first * 1e3:.1f} ms (script {SCRIPT_TIMES[0] * 1e3:.1f} ms)")
+        summarize("rerun wall (AppTest)", timings)
+        summarize("rerun script body", SCRIPT_TIMES[1:])
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
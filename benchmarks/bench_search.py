@@ -0,0 +1,109 @@
+# bench_search.py - Patient search latency at 100k patients
+#
+# Usage: python benchmarks/bench_search.py [--patients 100000]
+# Builds a scratch database; compares the indexed search with the old
+# exact-name lookup and a naive LIKE '%...%' scan.
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+from search import PatientSearch  # noqa: E402
+
+FIRST = ["John", "Mary", "Aarav", "Fatima", "Wei", "Olu", "Priya", "Carlos", "Anna", "Kwame",
+         "Sofia", "Ahmed", "Liam", "Chen", "Noah", "Amara", "Ravi", "Elena", "Yusuf", "Mei"]
+LAST = ["Smith", "Okafor", "Sharma", "Garcia", "Nguyen", "Kim", "Mensah", "Ivanova", "Haddad",
+        "Kowalski", "Tanaka", "Silva", "Abebe", "Murphy", "Rossi", "Khan", "Dubois", "Li"]
+
+
+def populate(db_path, n, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        names.add(f"{rng.choice(FIRST)} {rng.choice(LAST)} {rng.randint(1, 10**6)}")
+    names = sorted(names)
+    with database.transaction(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO patients (id, name, dob, age, gender) VALUES (?, ?, ?, ?, ?)",
+            ((str(uuid.uuid4()), name, "1990-01-01", 36, "Female") for name in names),
+        )
+    return names
+
+
+def typo(name, rng):
+    i = rng.randrange(1, len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def measure(label, fn, queries):
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(
+        f"{label:<34} p50={timings[len(timings) // 2] * 1e3:7.3f} ms "
+        f"p95={timings[int(len(timings) * 0.95)] * 1e3:7.3f} ms "
+        f"max={timings[-1] * 1e3:7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="clinic-search-"), "clinic.db")
+    start = time.perf_counter()
+    names = populate(db_path, args.patients)
+    print(f"inserted {len(names)} patients in {time.perf_counter() - start:.1f} s")
+
+    searcher = PatientSearch(db_path, timeout_ms=200)
+    start = time.perf_counter()
+    searcher.search("warm up")
+    print(f"built trigram index in {time.perf_counter() - start:.1f} s")
+
+    sample = rng.sample(names, args.queries)
+    conn = database.open_connection(db_path)
+
+    # Every keystroke of typing a name, lower-cased
+    keystrokes = [name.lower()[:k] for name in sample[:30] for k in range(1, len(name) + 1)]
+
+    measure("old: exact name = ?", lambda q: conn.execute(
+        "SELECT id FROM patients WHERE name = ?", (q,)).fetchone(), sample)
+    measure("naive: LIKE '%q%' scan", lambda q: conn.execute(
+        "SELECT id FROM patients WHERE name LIKE ? LIMIT 5", (f"%{q}%",)).fetchall(),
+        [q.lower()[:8] for q in sample])
+    conn.close()
+
+    searcher = PatientSearch(db_path, cache_size=0, timeout_ms=200)
+    measure("search: keystrokes (no cache)", searcher.search, keystrokes)
+    measure("search: full lower-case names", searcher.search, [q.lower() for q in sample])
+    measure("search: one-typo names", searcher.search, [typo(q, rng) for q in sample])
+
+    found = sum(
+        1 for q in sample if any(p.name == q for p, _ in searcher.search(typo(q, rng)))
+    )
+    print(f"typo recall@5: {found / len(sample):.0%}")
+
+    cached = PatientSearch(db_path, timeout_ms=200)
+    for q in keystrokes:
+        cached.search(q)
+    measure("search: keystrokes (LRU warm)", cached.search, keystrokes)
+    print("cache:", cached.stats())
+
+
+if __name__ == "__main__":
+    main()
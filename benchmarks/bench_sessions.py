@@ -0,0 +1,412 @@
+# bench_sessions.py - Concurrent patient sessions against APP.py: load steps and soak (headless AppTest)
+#
+# Usage: python benchmarks/bench_sessions.py [--sessions 1 2 4 8 16] [--duration 30]
+#                                            [--soak 1800 --soak-sessions 8] [--report sessions.json]
+# Each simulated session is its own process driving a stock AppTest through
+# whole patient visits: type the name keystroke by keystroke, register,
+# Diagnose & Dispense a few times, run the AI diagnosis and sometimes log an
+# emergency. Every action is one script rerun and is timed on its own. All
+# sessions share one clinic.db in a scratch directory, so SQLite contention
+# is real; process-wide caches (writer, search, model) are per session, as
+# with several server processes behind a load balancer.
+#
+# Reading the report: throughput (actions/s) should grow with the session
+# count until the CPUs are busy; the first step where it stops growing (or
+# where p99 blows up) is reported as the saturation point, next to the CPU
+# count it was measured on. Errors are split in two: app errors are script
+# exceptions and unexpected st.error messages; harness faults are failures
+# of the driver itself (runner timeout, a widget the flow expects is
+# missing, a session process that died) and are not timed. db_lock_wait is
+# how long BEGIN IMMEDIATE queued behind other writers; rss_slope_mb_per_min
+# from a soak run should stay near zero once the caches are warm.
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.harness import environment, percentile  # noqa: E402
+
+ACTIONS = ("load", "keystroke", "register", "symptom", "dispense", "ai_diagnosis", "emergency")
+EMERGENCY_REASONS = ("Chest Pain", "Breathing Difficulty", "High Fever", "Seizure")
+# st.error messages the app shows on purpose, not failures
+EXPECTED_ERRORS = ("EMERGENCY ACTIVATED", "EMERGENCY DETECTED", "Critical Risk Detected")
+# A step saturates when throughput gains less than this over the previous
+# step, or when its p99 is this many times the single-session p99
+MIN_SCALING = 0.10
+P99_BLOWUP = 5.0
+
+# Seconds a session process may run past the step before it counts as hung
+GRACE = 120.0
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class MissingWidget(Exception):
+    pass
+
+
+def _widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label or (label.endswith("…") and widget.label.startswith(label[:-1])):
+            return widget
+    raise MissingWidget(label)
+
+
+def _unexpected_errors(at):
+    if at.exception:
+        return [str(e.value) for e in at.exception]
+    return [e.value for e in at.error if not any(text in e.value for text in EXPECTED_ERRORS)]
+
+
+class Session:
+    """One simulated front desk: patient visits back to back until the deadline."""
+
+    def __init__(self, number, seed, think, sample_every=None):
+        self.number = number
+        self.rng = random.Random(seed * 1000 + number)
+        self.think = think
+        self.sample_every = sample_every
+        self.deadline = None
+        self.begin = None
+        self.samples = []  # (action, seconds, outcome): "ok", "app_error" or "harness"
+        self.errors = []   # (kind, action, message)
+        self.rss = []      # (seconds since start, MB)
+        self.visits = 0
+
+    def fault(self, action, message, seconds=0.0):
+        self.samples.append((action, seconds, "harness"))
+        self.errors.append(("harness", action, message[:200]))
+
+    def act(self, at, action):
+        start = time.perf_counter()
+        try:
+            at.run()
+        except Exception as exc:  # the runner itself timed out or crashed
+            self.fault(action, f"{type(exc).__name__}: {exc}", time.perf_counter() - start)
+            return False
+        seconds = time.perf_counter() - start
+        problems = _unexpected_errors(at)
+        self.samples.append((action, seconds, "app_error" if problems else "ok"))
+        if problems:
+            self.errors.append(("app", action, problems[0][:200]))
+        if self.sample_every and self.rss and \
+                time.monotonic() - self.begin - self.rss[-1][0] >= self.sample_every:
+            self.rss.append((time.monotonic() - self.begin, rss_mb()))
+        if self.think:
+            time.sleep(self.rng.uniform(0, 2 * self.think))
+        return not problems
+
+    def visit(self, at):
+        rng = self.rng
+        if not self.act(at, "load"):
+            return
+
+        # Unique across sessions and steps, so every visit registers a new patient
+        name = f"Load {os.getpid()}-{self.visits} {rng.choice('ABCDEFGH')}{rng.randrange(10**6)}"
+        for i in range(1, len(name) + 1):
+            at.text_input(key="register_name").input(name[:i])
+            if not self.act(at, "keystroke") or time.monotonic() > self.deadline:
+                return
+
+        gender = _widget(at.selectbox, "Gender")
+        gender.set_value(rng.choice(gender.options))
+        _widget(at.button, "Register Patient").click()
+        if not self.act(at, "register"):
+            return
+
+        for _ in range(rng.randint(1, 3)):
+            main = _widget(at.selectbox, "Main Symptom")
+            main.set_value(rng.choice(main.options))
+            if not self.act(at, "symptom"):
+                return
+            sub = _widget(at.selectbox, "Sub Symptom")
+            sub.set_value(rng.choice(sub.options))
+            _widget(at.button, "Diagnose & Dispense").click()
+            if not self.act(at, "dispense"):
+                return
+
+        _widget(at.number_input, "🌡 Temperature (°C)").set_value(round(rng.uniform(36.0, 40.5), 1))
+        _widget(at.number_input, "💓 Heart Rate (BPM)").set_value(rng.randint(55, 140))
+        _widget(at.number_input, "🫁 SpO₂ (%)").set_value(rng.randint(85, 100))
+        _widget(at.button, "🧠…").click()
+        if not self.act(at, "ai_diagnosis"):
+            return
+
+        if rng.random() < 0.2:
+            _widget(at.selectbox, "Emergency Reason").set_value(
+                rng.choice(EMERGENCY_REASONS))
+            _widget(at.button, "🚨…").click()
+            self.act(at, "emergency")
+
+    def run(self, duration):
+        from streamlit.testing.v1 import AppTest
+
+        self.begin = time.monotonic()
+        self.deadline = self.begin + duration
+        while time.monotonic() < self.deadline:
+            at = AppTest.from_file(os.path.join(ROOT, "APP.py"), default_timeout=60)
+            try:
+                self.visit(at)
+            except MissingWidget as exc:  # the page is not what the flow expects
+                self.fault("visit", f"missing widget {exc}")
+            except Exception as exc:  # setting a widget value failed
+                self.fault("visit", f"{type(exc).__name__}: {exc}")
+            self.visits += 1
+            if not self.rss:  # RSS growth is measured from the end of the first visit
+                self.rss.append((time.monotonic() - self.begin, rss_mb()))
+        self.rss.append((time.monotonic() - self.begin, rss_mb()))
+
+
+def _session_main(number, seed, think, sample_every, duration, ready, go, results):
+    """Entry point of one session process."""
+    import metrics
+    from streamlit.runtime.scriptrunner_utils import script_run_context
+    from streamlit.testing.v1 import AppTest
+
+    # AppTest() sets session state outside a script run, which Streamlit
+    # logs as "missing ScriptRunContext" for every new session. A filter,
+    # because Streamlit resets its loggers' levels when it loads config.
+    logging.getLogger(script_run_context.__name__).addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage())
+    metrics.configure(True)
+
+    # Warm the imports, model and schema so the step is not charged for them
+    AppTest.from_file(os.path.join(ROOT, "APP.py"), default_timeout=120).run()
+    metrics.reset()
+
+    ready.put(number)
+    go.wait()
+    session = Session(number, seed, think, sample_every)
+    session.run(duration)
+
+    import writer
+
+    writer.close_all()
+    lock_wait = metrics.summary("db_lock_wait_seconds")
+    results.put({
+        "number": number,
+        "samples": session.samples,
+        "errors": session.errors,
+        "rss": session.rss,
+        "visits": session.visits,
+        "lock_wait": lock_wait,
+        "lock_timeouts": metrics.counter_total("db_lock_timeouts_total"),
+    })
+
+
+def _run_sessions(sessions, duration, seed, think, sample_every):
+    """Start one process per session, release them together, collect their results."""
+    ctx = multiprocessing.get_context("spawn")
+    ready, results, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = [
+        ctx.Process(target=_session_main, name=f"session-{i}", daemon=True,
+                    args=(i, seed, think, sample_every, duration, ready, go, results))
+        for i in range(sessions)
+    ]
+    for p in procs:
+        p.start()
+
+    def exited(i):
+        faults.append(("harness", "session", f"session {i} exited with code {procs[i].exitcode}"))
+        lost.add(i)
+
+    faults, lost, started = [], set(), set()
+    deadline = time.monotonic() + GRACE
+    while len(started | lost) < sessions and time.monotonic() < deadline:
+        try:
+            started.add(ready.get(timeout=1.0))
+        except queue.Empty:
+            pass
+        for i, p in enumerate(procs):
+            if i not in started and i not in lost and p.exitcode is not None:
+                exited(i)
+
+    begin = time.monotonic()
+    go.set()
+    reports = []
+    deadline = begin + duration + GRACE
+    while len(reports) + len(lost) < sessions and time.monotonic() < deadline:
+        try:
+            reports.append(results.get(timeout=1.0))
+        except queue.Empty:
+            # A clean exit may still have its result in flight; only a crash is lost
+            done = {r["number"] for r in reports}
+            for i, p in enumerate(procs):
+                if i not in done and i not in lost and p.exitcode not in (None, 0):
+                    exited(i)
+    elapsed = time.monotonic() - begin
+
+    done = {r["number"] for r in reports}
+    for i, p in enumerate(procs):
+        p.join(timeout=5)
+        if p.is_alive():
+            p.terminate()
+            p.join()
+            faults.append(("harness", "session", f"session {i} hung and was terminated"))
+        elif i not in done and i not in lost:
+            exited(i)
+    return reports, faults, elapsed
+
+
+def run_level(sessions, duration, seed, think, sample_every=None):
+    """Run `sessions` concurrent session processes for `duration` seconds; returns one report entry."""
+    reports, faults, elapsed = _run_sessions(sessions, duration, seed, think, sample_every)
+
+    samples = [s for r in reports for s in r["samples"]]
+    errors = faults + [tuple(e) for r in reports for e in r["errors"]]
+    timed = [(a, seconds, outcome) for a, seconds, outcome in samples if outcome != "harness"]
+    actions = {}
+    for action in ACTIONS:
+        timings = sorted(seconds for a, seconds, _ in timed if a == action)
+        if timings:
+            actions[action] = {
+                "n": len(timings),
+                "p50_ms": percentile(timings, 50) * 1e3,
+                "p95_ms": percentile(timings, 95) * 1e3,
+                "p99_ms": percentile(timings, 99) * 1e3,
+            }
+    all_timings = sorted(seconds for _, seconds, _ in timed)
+    lock_count = sum(r["lock_wait"]["count"] for r in reports)
+    lock_sum = sum(r["lock_wait"]["sum"] for r in reports)
+    rss = [r["rss"] for r in reports if r["rss"]]
+
+    return {
+        "sessions": sessions,
+        "seconds": elapsed,
+        "visits": sum(r["visits"] for r in reports),
+        "actions": len(timed),
+        "actions_per_second": len(timed) / elapsed if elapsed else 0.0,
+        "p99_ms": percentile(all_timings, 99) * 1e3 if all_timings else 0.0,
+        "error_rate": sum(1 for *_, outcome in timed if outcome == "app_error") / len(timed)
+        if timed else 0.0,
+        "harness_faults": len(faults) + sum(1 for *_, outcome in samples if outcome == "harness"),
+        "errors": errors[:20],
+        "per_action": actions,
+        "db_lock_wait": {
+            "count": lock_count,
+            "mean_ms": lock_sum / lock_count * 1e3 if lock_count else 0.0,
+            # Bucket bounds do not merge across processes: the worst session's
+            "p99_le_ms": max((r["lock_wait"]["p99"] for r in reports), default=0.0) * 1e3,
+            "timeouts": sum(r["lock_timeouts"] for r in reports),
+        },
+        # Per session process: mean start/end, worst peak and worst slope
+        "rss_mb": {
+            "start": sum(points[0][1] for points in rss) / len(rss) if rss else 0.0,
+            "peak": max((mb for points in rss for _, mb in points), default=0.0),
+            "end": sum(points[-1][1] for points in rss) / len(rss) if rss else 0.0,
+            "slope_mb_per_min": max((_slope(points) * 60 for points in rss), default=0.0),
+        },
+    }
+
+
+def _slope(points):
+    """Least-squares slope of (t, y) points; y units per second."""
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    return sum((t - mean_t) * (y - mean_y) for t, y in points) / var if var else 0.0
+
+
+def saturation(levels):
+    """First session count whose step no longer pays off, or None if all scaled."""
+    if not levels:
+        return None
+    base_p99 = levels[0]["p99_ms"]
+    for previous, level in zip(levels, levels[1:]):
+        gain = level["actions_per_second"] / previous["actions_per_second"] - 1 \
+            if previous["actions_per_second"] else 0.0
+        if gain < MIN_SCALING:
+            return {"sessions": level["sessions"], "reason": f"throughput {gain:+.0%} over "
+                    f"{previous['sessions']} sessions", "max_useful_sessions": previous["sessions"]}
+        if base_p99 and level["p99_ms"] > P99_BLOWUP * base_p99:
+            return {"sessions": level["sessions"], "reason": f"p99 {level['p99_ms']:.0f} ms is "
+                    f"{level['p99_ms'] / base_p99:.1f}x single-session",
+                    "max_useful_sessions": previous["sessions"]}
+    return None
+
+
+def format_level(level):
+    lines = [
+        f"\n=== {level['sessions']} sessions, {level['seconds']:.0f}s: {level['visits']} visits, "
+        f"{level['actions_per_second']:.1f} actions/s, app errors {level['error_rate']:.2%}, "
+        f"harness faults {level['harness_faults']} ===",
+        f"{'action':<14} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+    ]
+    for action, s in level["per_action"].items():
+        lines.append(f"{action:<14} {s['n']:6d} {s['p50_ms']:9.1f} {s['p95_ms']:9.1f} {s['p99_ms']:9.1f}")
+    lock, rss = level["db_lock_wait"], level["rss_mb"]
+    lines.append(f"db lock wait: {lock['count']} txns, mean {lock['mean_ms']:.2f} ms, "
+                 f"p99 <= {lock['p99_le_ms']:.1f} ms, {lock['timeouts']} timeouts")
+    lines.append(f"rss per session: {rss['start']:.0f} -> {rss['end']:.0f} MB (peak {rss['peak']:.0f}), "
+                 f"{rss['slope_mb_per_min']:+.2f} MB/min")
+    for kind, action, error in level["errors"][:3]:
+        lines.append(f"  {kind} error in {action}: {error}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per load step")
+    parser.add_argument("--soak", type=float, default=0.0, help="seconds of soak after the steps")
+    parser.add_argument("--soak-sessions", type=int, default=4)
+    parser.add_argument("--sample", type=float, default=10.0, help="soak RSS sampling interval")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between actions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", help="write the full report as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="clinic-sessions-")
+    shutil.copy(os.path.join(ROOT, "background.jpeg"), workdir)
+    os.environ["CLINIC_DB_PATH"] = os.path.join(workdir, "clinic.db")
+    os.chdir(workdir)
+    try:
+        levels = []
+        for sessions in args.sessions:
+            levels.append(run_level(sessions, args.duration, args.seed, args.think))
+            print(format_level(levels[-1]), flush=True)
+
+        soak = None
+        if args.soak:
+            soak = run_level(args.soak_sessions, args.soak, args.seed, args.think, args.sample)
+            print("\n--- soak ---" + format_level(soak), flush=True)
+
+        point = saturation(levels)
+        print("\nsaturation: " + (f"{point['sessions']} sessions ({point['reason']}); "
+                                  f"use at most {point['max_useful_sessions']}"
+                                  if point else "not reached") + f" on {os.cpu_count()} CPUs")
+        if any(level["harness_faults"] for level in levels):
+            print("warning: harness faults in some steps; their throughput undercounts the app")
+
+        if args.report:
+            with open(os.path.join(ROOT, args.report) if not os.path.isabs(args.report)
+                      else args.report, "w") as f:
+                json.dump({"environment": environment(), "levels": levels, "soak": soak,
+                           "saturation": point}, f, indent=2)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
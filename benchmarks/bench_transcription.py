@@ -0,0 +1,106 @@
+# bench_transcription.py - Transcription pool throughput vs worker count
+#
+# Usage: python benchmarks/bench_transcription.py [--workers 1 2 4] [--jobs 16]
+#                                                  [--seconds 5] [--model tiny | --fake 0.5]
+# Submits --jobs clips of --seconds of synthetic speech-like audio at once
+# and reports wall time, clips/s and per-job queue wait for each pool size.
+# --fake swaps Whisper for a CPU-burning stand-in that takes that many
+# seconds per clip, so scaling can be measured without model downloads.
+# Throughput only scales up to the number of physical cores.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import voice  # noqa: E402
+from transcriber import DONE, TranscriptionService  # noqa: E402
+
+
+class FakeModel:
+    """Burns CPU for a fixed time per clip, like Whisper would."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def transcribe(self, samples, fp16=False):
+        end = time.process_time() + self.seconds
+        x = 0.0
+        while time.process_time() < end:
+            x += float(np.sum(samples[:4096] ** 2))
+        return {"text": "fake transcript"}
+
+
+def fake_loader(name):
+    # name is "fake:<seconds>"; must be top level so spawned workers can import it
+    return FakeModel(float(name.split(":", 1)[1]))
+
+
+def make_clip(seconds, seed=0):
+    # Bursts of tone-modulated noise separated by silence, so the VAD keeps some of it
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * voice.SAMPLE_RATE)) / voice.SAMPLE_RATE
+    envelope = (np.sin(2 * np.pi * 0.7 * t) > 0).astype(np.float32)
+    speech = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))
+    return (envelope * speech + 0.001 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def run(workers, clips, model_name, loader):
+    service = TranscriptionService(workers=workers, model_name=model_name,
+                                   model_loader=loader, max_queue=len(clips))
+    try:
+        # Wait for every worker to finish loading before the clock starts
+        while service.stats()["ready_workers"] < workers:
+            if service.load_error:
+                raise SystemExit(f"model load failed: {service.load_error}")
+            time.sleep(0.05)
+
+        start = time.perf_counter()
+        jobs = [service.submit(clip) for clip in clips]
+        results = [service.result(job) for job in jobs]
+        wall = time.perf_counter() - start
+    finally:
+        service.close()
+
+    ok = sum(r.state == DONE for r in results)
+    waits = sorted(r.wait_seconds for r in results)
+    return wall, ok, waits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--model", default=voice.DEFAULT_MODEL)
+    parser.add_argument("--fake", type=float, default=None,
+                        help="use a stand-in model taking this many CPU seconds per clip")
+    args = parser.parse_args()
+
+    if args.fake is not None:
+        model_name, loader = f"fake:{args.fake}", fake_loader
+    else:
+        model_name, loader = args.model, voice.load_model
+
+    clips = [make_clip(args.seconds, seed=i) for i in range(args.jobs)]
+    print(f"{args.jobs} clips x {args.seconds:.0f}s, model={model_name}, cpus={os.cpu_count()}")
+
+    baseline = None
+    for workers in args.workers:
+        wall, ok, waits = run(workers, clips, model_name, loader)
+        rate = args.jobs / wall
+        baseline = baseline or rate
+        print(
+            f"workers={workers:<2}  wall {wall:6.2f}s  {rate:6.2f} clips/s  "
+            f"x{rate / baseline:4.2f}  wait p50 {waits[len(waits) // 2]:5.2f}s "
+            f"max {waits[-1]:5.2f}s  ok {ok}/{args.jobs}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench_vitals.py - Streaming vitals ingestion throughput
+#
+# Usage: python benchmarks/bench_vitals.py [--patients 500] [--seconds 60]
+#                                          [--rate 4] [--batch 1.0] [--threads 4]
+# Simulates --patients bedside monitors (5 vitals each) for --seconds of
+# signal at --rate Hz, pushing --batch seconds of readings per call from
+# --threads threads, and reports readings/s, per-push latency and alert
+# counts. Also times the scalar hardware.classify loop against
+# classify_array on the same readings.
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hardware import classify, classify_array, get_vital_limits  # noqa: E402
+from vitals import SimulatedDevice, VitalsMonitor  # noqa: E402
+
+
+def prepare(patients, seconds, rate, batch):
+    """Pre-generate every batch so only ingestion is timed."""
+    batches = []
+    for pid in range(patients):
+        device = SimulatedDevice(f"p{pid:05d}", rate_hz=rate, seed=pid)
+        steps = max(1, int(seconds / batch))
+        batches.append([(device.patient_id, device.read(batch)) for _ in range(steps)])
+    return batches
+
+
+def ingest(monitor, batches, threads):
+    # Each thread owns a slice of the patients, like one socket per monitor
+    latencies = [[] for _ in range(threads)]
+
+    def work(index):
+        out = latencies[index]
+        for device_batches in batches[index::threads]:
+            for patient_id, readings in device_batches:
+                for vital, (times, values) in readings.items():
+                    start = time.perf_counter()
+                    monitor.push(patient_id, vital, values, times)
+                    out.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, np.concatenate([np.array(x) for x in latencies])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--rate", type=float, default=4.0, help="samples per second per vital")
+    parser.add_argument("--batch", type=float, default=1.0, help="seconds of readings per push")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=1024)
+    args = parser.parse_args()
+
+    print(f"generating {args.patients} patients x 5 vitals x {args.seconds:g}s at {args.rate:g} Hz...")
+    batches = prepare(args.patients, args.seconds, args.rate, args.batch)
+
+    monitor = VitalsMonitor(capacity=args.capacity)
+    wall, latencies = ingest(monitor, batches, args.threads)
+    latencies.sort()
+    print(f"\n{monitor.stream_count()} streams, {monitor.readings:,} readings "
+          f"in {wall:.2f}s = {monitor.readings / wall:,.0f} readings/s "
+          f"({len(latencies) / wall:,.0f} pushes/s, {args.threads} threads)")
+    print(f"push latency p50 {latencies[len(latencies) // 2] * 1e6:.1f} us, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us")
+    raised = sum(1 for a in monitor.alerts if a.state == "raised")
+    print(f"alerts: {raised} raised, {len(monitor.alerts) - raised} cleared, "
+          f"{len(monitor.active_alerts())} still active")
+
+    start = time.perf_counter()
+    for pid in range(min(args.patients, 100)):
+        monitor.stats(f"p{pid:05d}", "heart_rate", seconds=60)
+    print(f"stats(60s window): {(time.perf_counter() - start) / min(args.patients, 100) * 1e6:.1f} us")
+
+    start = time.perf_counter()
+    monitor.latest()
+    print(f"latest() over all streams: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    # Scalar vs vectorized classification of the same window
+    low, high = get_vital_limits()["heart_rate"]
+    _, values = monitor.window("p00000", "heart_rate")
+    values = np.tile(values, max(1, 100_000 // max(len(values), 1)))
+    start = time.perf_counter()
+    scalar = [classify(v, low, high) for v in values.tolist()]
+    scalar_s = time.perf_counter() - start
+    start = time.perf_counter()
+    codes = classify_array(values, low, high)
+    vector_s = time.perf_counter() - start
+    assert scalar.count("High") == int((codes == 2).sum())
+    print(f"\nclassify {len(values):,} readings: scalar {scalar_s * 1e3:.1f} ms, "
+          f"classify_array {vector_s * 1e3:.2f} ms ({scalar_s / vector_s:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# bench_vitals_store.py - Vitals history: daily ingest and 30-day trend queries
+#
+# Usage: python benchmarks/bench_vitals_store.py [--days 30] [--per-day 1000000]
+#                                                [--patients 200] [--repeat 50]
+# Writes --days days of readings (--per-day a day, spread over --patients
+# x 5 metrics, delivered in hourly batches per series) into a scratch
+# database, then times a 30-day downsample (200 buckets), a 1-day raw
+# range query and a retention pass. With --rows-baseline it also loads one
+# day into a plain one-row-per-reading table for comparison.
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+from vitals_store import VitalsStore  # noqa: E402
+
+METRICS = ("heart_rate", "spo2", "bp_systolic", "bp_diastolic", "temperature")
+DAY = 86400.0
+
+
+def day_batches(day, start, per_series, patients, rng):
+    """Hourly (patient_id, metric, times, values) batches for one day."""
+    for hour in range(24):
+        begin = start + day * DAY + hour * 3600
+        n = per_series // 24 + (1 if hour < per_series % 24 else 0)
+        times = begin + np.sort(rng.random(n)) * 3600
+        for pid in range(patients):
+            for metric in METRICS:
+                yield f"p{pid:04d}", metric, times, 70 + rng.normal(0, 5, n)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1 if len(samples) > 1 else 0]
+
+
+def rows_baseline(path, start, per_series, patients, rng):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("CREATE TABLE readings (patient_id TEXT, metric TEXT, ts REAL, value REAL)")
+    conn.execute("CREATE INDEX idx_readings ON readings (patient_id, metric, ts)")
+    begin = time.perf_counter()
+    conn.execute("BEGIN")
+    for patient_id, metric, times, values in day_batches(0, start, per_series, patients, rng):
+        conn.executemany("INSERT INTO readings VALUES (?, ?, ?, ?)",
+                         zip([patient_id] * len(times), [metric] * len(times),
+                             times.tolist(), values.tolist()))
+    conn.execute("COMMIT")
+    ingest = time.perf_counter() - begin
+    size = os.path.getsize(path) + os.path.getsize(path + "-wal")
+
+    def query():
+        conn.execute(
+            "SELECT CAST((ts - ?) / 3600 AS INTEGER) AS b, count(*), min(value), max(value), avg(value)"
+            " FROM readings WHERE patient_id = 'p0000' AND metric = 'heart_rate'"
+            " AND ts >= ? AND ts < ? GROUP BY b", (start, start, start + DAY)).fetchall()
+
+    return ingest, size, timed(query, 20)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--rows-baseline", action="store_true")
+    args = parser.parse_args()
+
+    series = args.patients * len(METRICS)
+    per_series = args.per_day // series
+    rng = np.random.default_rng(0)
+    start = 1_700_000_000.0 - args.days * DAY   # hour-aligned epoch
+
+    with tempfile.TemporaryDirectory(prefix="clinic-vitals-") as workdir:
+        path = os.path.join(workdir, "vitals.db")
+        store = VitalsStore(path)
+        print(f"{args.days} days x {per_series * series:,} readings/day "
+              f"({series} series, hourly batches)")
+
+        day_seconds = []
+        for day in range(args.days):
+            begin = time.perf_counter()
+            for patient_id, metric, times, values in day_batches(day, start, per_series,
+                                                                 args.patients, rng):
+                store.append(patient_id, metric, values, times)
+            store.flush()
+            day_seconds.append(time.perf_counter() - begin)
+        day_seconds.sort()
+        stats = store.stats()
+        print(f"ingest: median {day_seconds[len(day_seconds) // 2]:.2f} s/day "
+              f"({per_series * series / day_seconds[len(day_seconds) // 2]:,.0f} readings/s, "
+              f"data generation included)")
+        print(f"stored {stats['readings']:,} readings in {stats['blocks']:,} blocks, "
+              f"{stats['bytes_per_reading']:.1f} B/reading payload, "
+              f"db file {os.path.getsize(path) / 1e6:.1f} MB")
+
+        end = start + args.days * DAY
+        cycle = iter(range(10**9))
+
+        def trend():
+            store.downsample(f"p{next(cycle) % args.patients:04d}", "heart_rate",
+                             end - 30 * DAY, end, buckets=200)
+
+        def one_day():
+            store.range(f"p{next(cycle) % args.patients:04d}", "spo2", end - DAY, end)
+
+        for name, fn in ((f"30-day trend, 200 buckets ({30 * per_series:,} raw)", trend),
+                         (f"1-day raw range ({per_series:,} readings)", one_day)):
+            p50, p99 = timed(fn, args.repeat)
+            print(f"{name:<48} p50 {p50 * 1e3:7.2f} ms  p99 {p99 * 1e3:7.2f} ms")
+
+        begin = time.perf_counter()
+        removed = store.expire(max_age_days=args.days - 1, now=end)
+        print(f"retention: rolled up and removed {removed:,} readings in "
+              f"{time.perf_counter() - begin:.2f} s")
+        p50, p99 = timed(trend, args.repeat)
+        print(f"{'30-day trend after retention (rollups + raw)':<48} "
+              f"p50 {p50 * 1e3:7.2f} ms  p99 {p99 * 1e3:7.2f} ms")
+        database.close_all()
+
+        if args.rows_baseline:
+            ingest, size, (p50, p99) = rows_baseline(
+                os.path.join(workdir, "rows.db"), start, per_series, args.patients, rng)
+            print(f"\nrow-per-reading table, 1 day: ingest {ingest:.2f} s, {size / 1e6:.1f} MB, "
+                  f"1-day hourly GROUP BY p50 {p50 * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# cases.py - The benchmark cases: AI, rules, database, voice and a full rerun
+#
+# Every input is generated from a fixed seed inside the run's scratch
+# directory, so runs are reproducible, offline, and never touch clinic.db.
+
+import os
+import random
+import shutil
+import sys
+import uuid
+import wave
+
+import numpy as np
+
+from benchmarks.harness import Skip, case
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DB_SIZES = (1_000, 100_000, 1_000_000)
+QUICK_DB_SIZES = (1_000, 100_000)
+
+
+def vitals(n, seed=0):
+    import generate_data
+    frame = generate_data.generate_chunk(n, seed)
+    return frame[generate_data.COLUMNS[:-1]].to_numpy(dtype=np.float64)
+
+
+# ==================================================
+# 🤖 AI & RULES
+# ==================================================
+
+@case("ai")
+def ai_diagnosis(bench):
+    import logic
+    if logic.registry.get() is None:
+        raise Skip("no model artifacts (run train_brain.py)")
+
+    rows = vitals(10_000, seed=1)
+    single = [list(row) for row in rows[:256]]
+    cycle = iter(range(10**9))
+
+    # Model cost first, with the prediction cache out of the way
+    size = logic.prediction_cache.max_entries
+    logic.prediction_cache.configure(0)
+    try:
+        bench.time("ai_single", lambda: logic.get_ai_diagnosis(single[next(cycle) % 256]), repeat=500)
+        bench.time("ai_batch_1k", lambda: logic.get_ai_diagnosis_batch(rows[:1000]), repeat=50)
+        bench.time("ai_batch_10k", lambda: logic.get_ai_diagnosis_batch(rows), repeat=10, warmup=1)
+    finally:
+        logic.prediction_cache.configure(max(size, 10_000))
+
+    # Repeats: the same 256 vitals over and over, and a re-scored batch
+    logic.get_ai_diagnosis_batch(single)
+    bench.time("ai_single_cached", lambda: logic.get_ai_diagnosis(single[next(cycle) % 256]),
+               repeat=500)
+    bench.time("ai_batch_10k_cached", lambda: logic.get_ai_diagnosis_batch(rows), repeat=10, warmup=1)
+    logic.prediction_cache.configure(size)
+
+
+@case("rules")
+def rule_diagnosis(bench):
+    import logic
+    pairs = [(main, sub) for main in logic.get_all_main_symptoms()
+             for sub in logic.get_sub_options(main)]
+    cycle = iter(range(10**9))
+
+    def one():
+        main, sub = pairs[next(cycle) % len(pairs)]
+        return logic.get_diagnosis(main, sub)
+
+    bench.time("rules_get_diagnosis", one, repeat=500, number=20)
+
+
+@case("rules")
+def emergency_detection(bench):
+    import logic
+    phrases = [
+        "i have a headache and a mild fever",
+        "my father has chest pain and is sweating",
+        "no problems just a routine checkup",
+        "she collapsed and is not breathing properly",
+    ]
+    rng = random.Random(3)
+    words = " ".join(phrases).split()
+    note = " ".join(rng.choice(words) for _ in range(400))  # ~2 KB transcript
+    cycle = iter(range(10**9))
+
+    bench.time("rules_detect_emergency",
+               lambda: logic.detect_emergency(phrases[next(cycle) % 4]), repeat=500, number=20)
+    bench.time("rules_detect_emergency_2kb", lambda: logic.detect_emergency(note), repeat=300)
+
+
+# ==================================================
+# 🗄 DATABASE
+# ==================================================
+
+def _seed_db(path, rows, seed=0):
+    """rows patients and rows prescriptions, with uuid4-shaped keys like the app's."""
+    import database
+
+    rng = random.Random(seed)
+    ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(rows)]
+    database.init_db(path)
+    with database.transaction(path) as conn:
+        conn.executemany(
+            "INSERT INTO patients (id, name, dob, age, gender) VALUES (?, ?, ?, ?, ?)",
+            ((pid, f"patient {i:07d}", "1980-01-01", 18 + i % 70, "Female" if i % 2 else "Male")
+             for i, pid in enumerate(ids)),
+        )
+        conn.executemany(
+            "INSERT INTO prescriptions (id, patient_id, symptom, sub_symptom, medicine, dosage, bin)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((str(uuid.UUID(int=rng.getrandbits(128), version=4)), rng.choice(ids),
+              "Fever", "Mild", "Paracetamol", "500mg", 1) for _ in range(rows)),
+        )
+    return ids
+
+
+@case("db")
+def database_ops(bench):
+    import database
+
+    sizes = bench.db_sizes or (QUICK_DB_SIZES if bench.quick else DB_SIZES)
+    for size in sizes:
+        label = f"{size // 1000}k" if size < 1_000_000 else f"{size // 1_000_000}m"
+        names = [f"db_{op}_{label}" for op in
+                 ("patient_insert", "patient_by_name", "patient_by_id",
+                  "prescription_insert", "prescriptions_by_patient")]
+        if not any(bench.selected(name) for name in names):
+            continue
+
+        path = os.path.join(bench.workdir, f"bench_{label}.db")
+        print(f"  seeding {size:,} patients + prescriptions...", flush=True)
+        ids = _seed_db(path, size)
+        rng = random.Random(size)
+        counter = iter(range(10**9))
+
+        conn = database.open_connection(path)
+        bench.time(names[0], lambda: database.add_patient(
+            f"new patient {next(counter)}", "1990-05-05", 36, "Female", db_path=path))
+        bench.time(names[1], lambda: database.find_patient_by_name(
+            f"patient {rng.randrange(size):07d}", db_path=path), repeat=500)
+        bench.time(names[2], lambda: database.get_patient(rng.choice(ids), db_path=path), repeat=500)
+        bench.time(names[3], lambda: database.add_prescription(
+            rng.choice(ids), "Cough", "Dry", "Syrup", "10ml", 2, db_path=path))
+        bench.time(names[4], lambda: conn.execute(
+            "SELECT id, symptom, medicine, dosage FROM prescriptions WHERE patient_id = ?",
+            (rng.choice(ids),)).fetchall(), repeat=500)
+
+        conn.close()
+        database.close_all()
+        os.remove(path)
+
+
+# ==================================================
+# 💓 STREAMING VITALS
+# ==================================================
+
+@case("vitals")
+def vitals_ingest(bench):
+    from vitals import STREAM_VITALS, SimulatedDevice, VitalsMonitor
+
+    monitor = VitalsMonitor()
+    devices = [SimulatedDevice(f"p{i:03d}", seed=i) for i in range(200)]
+    readings = [(d.patient_id, d.read(1.0)) for d in devices for _ in range(5)]
+    cycle = iter(range(10**9))
+
+    def push_second():
+        patient_id, batch = readings[next(cycle) % len(readings)]
+        for vital, (times, values) in batch.items():
+            monitor.push(patient_id, vital, values, times + next(cycle))
+
+    bench.time("vitals_push_1s_5_vitals", push_second, repeat=500, number=10)
+    bench.time("vitals_stats_60s", lambda: monitor.stats(
+        devices[next(cycle) % 200].patient_id, STREAM_VITALS[0], seconds=60), repeat=500)
+    bench.time("vitals_latest_1000_streams", monitor.latest, repeat=50)
+
+
+# ==================================================
+# 🎙 VOICE
+# ==================================================
+
+def _fixture_wav(path, seconds, seed):
+    """Speech-like bursts between silences, 16-bit mono 16 kHz."""
+    rng = np.random.default_rng(seed)
+    rate = 16000
+    t = np.arange(int(seconds * rate)) / rate
+    envelope = (np.sin(2 * np.pi * 0.5 * t) > 0.2).astype(np.float64)
+    signal = envelope * (0.3 * np.sin(2 * np.pi * 180 * t) + 0.05 * rng.standard_normal(len(t)))
+    signal += 0.002 * rng.standard_normal(len(t))
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes())
+    return path
+
+
+def _whisper_cached(name):
+    try:
+        import whisper  # noqa: F401
+    except ImportError:
+        return False
+    cache = os.path.join(os.path.expanduser("~"), ".cache", "whisper", f"{name}.pt")
+    return os.path.exists(cache)
+
+
+@case("voice")
+def voice_pipeline(bench):
+    import voice
+
+    names = [f"voice_{kind}_{seconds}s" for kind in ("decode_trim", "recognize") for seconds in (3, 10)]
+    if not any(bench.selected(name) for name in names):
+        return
+
+    fixtures = {
+        seconds: _fixture_wav(os.path.join(bench.workdir, f"fixture_{seconds}s.wav"), seconds, seconds)
+        for seconds in (3, 10)
+    }
+    payloads = {seconds: open(path, "rb").read() for seconds, path in fixtures.items()}
+
+    # Decode + VAD is everything before Whisper; always runnable
+    for seconds, data in payloads.items():
+        bench.time(f"voice_decode_trim_{seconds}s",
+                   lambda data=data: voice.trim_silence(voice.decode_audio(data)), repeat=100)
+
+    if not _whisper_cached(voice.DEFAULT_MODEL):
+        raise Skip(f"whisper or its '{voice.DEFAULT_MODEL}' model is not available offline")
+    for seconds, data in payloads.items():
+        bench.time(f"voice_recognize_{seconds}s",
+                   lambda data=data: voice.recognize_audio(data), repeat=10, warmup=1)
+
+
+# ==================================================
+# 🖥 FULL APP RERUN
+# ==================================================
+
+@case("app")
+def app_rerun(bench):
+    if not any(bench.selected(n) for n in ("app_first_run", "app_rerun_keystroke")):
+        return
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        raise Skip("streamlit is not installed")
+    import time
+
+    import database
+
+    appdir = os.path.join(bench.workdir, "app")
+    os.makedirs(appdir, exist_ok=True)
+    shutil.copy(os.path.join(ROOT, "background.jpeg"), appdir)
+    previous_dir, previous_db = os.getcwd(), database.DB_PATH
+    os.chdir(appdir)
+    database.DB_PATH = os.path.join(appdir, "clinic.db")
+
+    try:
+        at = AppTest.from_file(os.path.join(ROOT, "APP.py"), default_timeout=60)
+        start = time.perf_counter()
+        at.run()
+        bench.record("app_first_run", [time.perf_counter() - start])
+
+        # One rerun per keystroke in the registration form, as in real use
+        name = "keystroke patient"
+        samples = []
+        for i in range(10 if bench.quick else 40):
+            at.text_input(key="register_name").input(name[: i % len(name) + 1])
+            start = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - start)
+        bench.record("app_rerun_keystroke", samples)
+    finally:
+        os.chdir(previous_dir)
+        database.DB_PATH = previous_db
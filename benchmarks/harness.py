@@ -0,0 +1,193 @@
+# harness.py - Timing, percentiles and baseline comparison for the suite
+
+import gc
+import json
+import math
+import os
+import platform
+import time
+from collections import namedtuple
+from fnmatch import fnmatch
+
+Result = namedtuple("Result", ["name", "n", "p50", "p95", "p99", "mean"])
+Comparison = namedtuple("Comparison", ["name", "baseline", "current", "change", "regressed", "gated"])
+
+# Fewer samples than this (e.g. app_first_run's one cold start) are reported
+# but never fail a run: a single timing is mostly noise
+MIN_GATED_SAMPLES = 5
+
+CASES = []
+
+
+class Skip(Exception):
+    """Raised by a case that cannot run here (missing optional dependency, etc.)."""
+
+
+def case(group):
+    """Register a benchmark function under a group name."""
+    def register(fn):
+        CASES.append((group, fn))
+        return fn
+    return register
+
+
+def percentile(ordered, q):
+    # Nearest-rank on an already sorted list
+    return ordered[min(max(math.ceil(q / 100 * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+def summarize(name, samples):
+    ordered = sorted(samples)
+    return Result(
+        name=name,
+        n=len(ordered),
+        p50=percentile(ordered, 50),
+        p95=percentile(ordered, 95),
+        p99=percentile(ordered, 99),
+        mean=sum(ordered) / len(ordered),
+    )
+
+
+class Runner:
+    """
+    Collects results for the selected cases. Each timed call runs with the
+    garbage collector paused, after `warmup` untimed calls, so one stray
+    collection does not land in the tail percentiles.
+    """
+
+    def __init__(self, workdir, quick=False, only=None, db_sizes=None):
+        self.workdir = workdir
+        self.quick = quick
+        self.only = only or []
+        self.db_sizes = db_sizes
+        self.results = {}
+        self.skipped = {}
+
+    def selected(self, name):
+        return not self.only or any(fnmatch(name, pattern) for pattern in self.only)
+
+    def time(self, name, fn, repeat=200, warmup=5, number=1):
+        """Time fn(); samples are seconds per call, averaged over `number` calls."""
+        if not self.selected(name):
+            return None
+        if self.quick:
+            repeat = max(5, repeat // 4)
+
+        for _ in range(warmup):
+            fn()
+
+        samples = []
+        gc.collect()
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in range(number):
+                    fn()
+                samples.append((time.perf_counter() - start) / number)
+        finally:
+            if enabled:
+                gc.enable()
+
+        result = summarize(name, samples)
+        self.results[name] = result
+        print(format_result(result), flush=True)
+        return result
+
+    def record(self, name, samples):
+        """Add externally timed samples (seconds), e.g. from a subprocess."""
+        if not self.selected(name):
+            return None
+        result = summarize(name, samples)
+        self.results[name] = result
+        print(format_result(result), flush=True)
+        return result
+
+    def run(self, groups=None):
+        for group, fn in CASES:
+            if groups and group not in groups:
+                continue
+            try:
+                fn(self)
+            except Skip as e:
+                self.skipped[fn.__name__] = str(e)
+                print(f"{fn.__name__:<40} skipped: {e}", flush=True)
+
+
+# ==================================================
+# 📏 REPORTING & BASELINES
+# ==================================================
+
+def _ms(seconds):
+    return f"{seconds * 1e3:10.3f}"
+
+
+def format_header():
+    return f"{'benchmark':<40} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"
+
+
+def format_result(r):
+    return f"{r.name:<40} {r.n:5d} {_ms(r.p50)} {_ms(r.p95)} {_ms(r.p99)}"
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save_results(path, results, skipped=None):
+    payload = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "results": {name: r._asdict() for name, r in sorted(results.items())},
+        "skipped": skipped or {},
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        payload = json.load(f)
+    payload["results"] = {name: Result(**r) for name, r in payload["results"].items()}
+    return payload
+
+
+def compare(results, baseline, threshold=0.25, metric="p50", min_delta=50e-6):
+    """
+    Compare against a baseline's results. A benchmark regresses when the
+    metric grew by more than `threshold` (a fraction) AND by more than
+    `min_delta` seconds, so microsecond-scale jitter never fails a run.
+    Benchmarks with fewer than MIN_GATED_SAMPLES samples are not gated.
+    """
+    rows = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        before, after = getattr(base, metric), getattr(result, metric)
+        change = (after - before) / before if before else 0.0
+        gated = min(base.n, result.n) >= MIN_GATED_SAMPLES
+        regressed = gated and change > threshold and after - before > min_delta
+        rows.append(Comparison(name, before, after, change, regressed, gated))
+    return rows
+
+
+def missing_from(results, baseline):
+    """Baseline benchmarks this run did not produce (skipped, renamed or broken)."""
+    return sorted(set(baseline) - set(results))
+
+
+def format_comparison(rows, metric):
+    lines = [f"{'benchmark':<40} {'base ' + metric:>10} {'now ' + metric:>10} {'change':>8}"]
+    for row in rows:
+        flag = "  REGRESSION" if row.regressed else "" if row.gated else "  (not gated)"
+        lines.append(
+            f"{row.name:<40} {_ms(row.baseline)} {_ms(row.current)} {row.change:+8.1%}{flag}"
+        )
+    return "\n".join(lines)
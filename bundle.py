@@ -0,0 +1,171 @@
+# bundle.py - Versioned, Checksummed Model Bundle (one file per training run)
+
+import hashlib
+import os
+import re
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+
+from forest import CompiledForest, _npz_members, export_forest
+
+SCHEMA_VERSION = 1
+# Boosted bundles carry a bias and are combined with softmax; a reader that
+# only knows version 1 must refuse them rather than average their scores
+BOOSTED_SCHEMA_VERSION = 2
+BUNDLE_FILE = "medical_bundle.npz"
+# Compressed variants from `train_brain.py --compress`: medical_bundle.<name>.npz
+VARIANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+FOREST_MEMBERS = (
+    "feature", "threshold", "children", "value", "roots", "classes", "n_features", "max_depth",
+)
+OPTIONAL_FOREST_MEMBERS = ("bias",)
+META_MEMBERS = ("labels", "feature_columns", "scaler_mean", "scaler_scale", "schema_version")
+# A variant records the sha256 of the full bundle it was derived from
+PARENT_MEMBER = "parent_sha256"
+
+ModelBundle = namedtuple(
+    "ModelBundle",
+    ["forest", "labels", "feature_columns", "scaler_mean", "scaler_scale",
+     "schema_version", "sha256", "path", "parent_sha256"],
+)
+
+
+class BundleError(Exception):
+    pass
+
+
+def variant_file(name=None):
+    """Bundle file name for a compressed variant; None is the full model."""
+    if name is None:
+        return BUNDLE_FILE
+    if not VARIANT_NAME.match(name):
+        raise BundleError(f"invalid model variant name {name!r}")
+    stem, ext = os.path.splitext(BUNDLE_FILE)
+    return f"{stem}.{name}{ext}"
+
+
+def list_variants(directory):
+    """Names of the compressed variants saved in directory."""
+    stem, ext = os.path.splitext(BUNDLE_FILE)
+    names = []
+    for entry in sorted(os.listdir(directory)):
+        if entry.startswith(stem + ".") and entry.endswith(ext) and entry != BUNDLE_FILE:
+            name = entry[len(stem) + 1:-len(ext)]
+            if VARIANT_NAME.match(name):
+                names.append(name)
+    return names
+
+
+def remove_variants(directory):
+    """Delete every variant bundle in directory; they belong to the full model being replaced."""
+    removed = list_variants(directory)
+    for name in removed:
+        os.remove(os.path.join(directory, variant_file(name)))
+    return removed
+
+
+def bundle_sha256(path):
+    """The content hash a bundle was saved with, read without loading or verifying the rest."""
+    with np.load(path, allow_pickle=False) as data:
+        if "sha256" not in data.files:
+            raise BundleError(f"{path}: missing sha256")
+        return str(data["sha256"])
+
+
+def build_bundle(model, scaler, encoder, feature_columns, forest=None, parent_sha256=None):
+    """
+    Everything inference needs from one training run: the compiled forest
+    (scaler already folded into its thresholds), the scaler statistics,
+    the label names in class order and the feature order. forest takes
+    already-exported arrays (a pruned, distilled or boosted model), whose
+    full bundle's hash goes in parent_sha256.
+    """
+    arrays = dict(forest) if forest is not None else export_forest(model, scaler)
+    arrays.update(
+        labels=np.asarray(encoder.classes_, dtype=str),
+        feature_columns=np.asarray(feature_columns, dtype=str),
+        scaler_mean=np.asarray(scaler.mean_, dtype=np.float64),
+        scaler_scale=np.asarray(scaler.scale_, dtype=np.float64),
+        schema_version=np.int64(BOOSTED_SCHEMA_VERSION if "bias" in arrays else SCHEMA_VERSION),
+    )
+    if parent_sha256 is not None:
+        arrays[PARENT_MEMBER] = np.asarray(parent_sha256)
+    return arrays
+
+
+def content_hash(arrays):
+    """sha256 over every member's name, dtype, shape and bytes, in name order."""
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        if name == "sha256":
+            continue
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape};".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def save_bundle(path, arrays):
+    """Write the bundle uncompressed (so it can be memory-mapped); returns its hash."""
+    sha256 = content_hash(arrays)
+    np.savez(path, sha256=np.asarray(sha256), **arrays)
+    return sha256
+
+
+def load_bundle(path, mmap=True, verify=True):
+    """
+    Load and validate a bundle in one pass over the archive. Node arrays
+    are memory-mapped when mmap is set; verify recomputes the content hash
+    (this touches every page once, which is cheap next to unpickling).
+    """
+    try:
+        if mmap:
+            arrays = dict(_npz_members(path))
+        else:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {key: data[key] for key in data.files}
+    except (zipfile.BadZipFile, ValueError, EOFError) as e:
+        # Damage the archive layer notices first (CRC, truncation, bad headers)
+        raise BundleError(f"{path}: unreadable archive ({e})") from None
+
+    missing = [m for m in FOREST_MEMBERS + META_MEMBERS + ("sha256",) if m not in arrays]
+    if missing:
+        raise BundleError(f"{path}: missing {', '.join(missing)}")
+
+    version = int(arrays["schema_version"])
+    if version not in (SCHEMA_VERSION, BOOSTED_SCHEMA_VERSION):
+        raise BundleError(f"{path}: schema version {version}, expected "
+                          f"{SCHEMA_VERSION} or {BOOSTED_SCHEMA_VERSION}")
+    if (version == BOOSTED_SCHEMA_VERSION) != ("bias" in arrays):
+        raise BundleError(f"{path}: schema version {version} does not match its members")
+
+    sha256 = str(arrays["sha256"])
+    if verify and content_hash(arrays) != sha256:
+        raise BundleError(f"{path}: content hash mismatch (corrupt or partially written)")
+
+    labels = np.asarray(arrays["labels"])
+    feature_columns = [str(c) for c in arrays["feature_columns"]]
+    forest = CompiledForest(**{name: arrays[name] for name in FOREST_MEMBERS + OPTIONAL_FOREST_MEMBERS
+                               if name in arrays})
+
+    if forest.n_features != len(feature_columns):
+        raise BundleError(f"{path}: forest has {forest.n_features} features, "
+                          f"bundle lists {len(feature_columns)}")
+    if forest.value.shape[1] != len(labels):
+        raise BundleError(f"{path}: forest has {forest.value.shape[1]} classes, "
+                          f"bundle lists {len(labels)} labels")
+
+    return ModelBundle(
+        forest=forest,
+        labels=labels,
+        feature_columns=feature_columns,
+        scaler_mean=np.asarray(arrays["scaler_mean"]),
+        scaler_scale=np.asarray(arrays["scaler_scale"]),
+        schema_version=version,
+        sha256=sha256,
+        path=path,
+        parent_sha256=str(arrays[PARENT_MEMBER]) if PARENT_MEMBER in arrays else None,
+    )
@@ -1,19 +1,395 @@
+# database.py - Clinic Data-Access Layer (SQLite, WAL, connection pool)
+
+import os
+import queue
 import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+import metrics
+
+DB_PATH = os.environ.get("CLINIC_DB_PATH", "clinic.db")
+
+# Applied to every new connection. journal_mode=WAL is persistent and is
+# set once in init_db; the rest are per-connection settings.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",      # WAL + NORMAL: durable across app crashes, 1 fsync per checkpoint
+    "PRAGMA busy_timeout = 10000",      # wait for a writer instead of raising "database is locked"
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",        # ~8 MB page cache per connection
+    "PRAGMA mmap_size = 67108864",      # read through a shared 64 MB mapping
+)
+
+Patient = namedtuple("Patient", ["id", "name", "age", "gender", "dob"])
+Prescription = namedtuple(
+    "Prescription",
+    ["id", "patient_id", "symptom", "sub_symptom", "medicine", "dosage", "bin", "created_at"],
+)
+
+# Local time, sortable as text; rows from before created_at existed hold ""
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+# ==================================================
+# 🔌 CONNECTION POOL (bounded, shared by all threads)
+# ==================================================
+
+# Connections per database file. Streamlit runs every rerun on a fresh
+# thread, so connections are borrowed and returned rather than tied to
+# the thread that opened them.
+POOL_SIZE = int(os.environ.get("CLINIC_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = 10.0
+
+_pools = {}
+_pools_lock = threading.Lock()
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def _connect(db_path):
+    # Autocommit mode: transactions are opened explicitly by transaction().
+    # A pooled connection is used by one borrower at a time, on any thread.
+    conn = sqlite3.connect(
+        db_path, timeout=10, isolation_level=None, check_same_thread=False
+    )
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Up to `size` reusable connections to one database file.
+
+    Connections are opened on demand, lent to one borrower at a time and
+    put back afterwards, so a rerun reuses a warm connection (page cache,
+    PRAGMAs already applied) instead of opening a new one. When all of
+    them are lent out, acquire() waits up to `timeout` seconds.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()     # most recently used first: warmest cache
+        self._connections = []
+        self._opened = 0                   # includes connections still being opened
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Reserve a slot, then connect outside the lock
+        with self._lock:
+            grow = self._opened < self.size
+            if grow:
+                self._opened += 1
+        if grow:
+            try:
+                conn = _connect(self.db_path)
+            except BaseException:
+                with self._lock:
+                    self._opened -= 1
+                raise
+            with self._lock:
+                self._connections.append(conn)
+            metrics.count("db_connections_opened_total")
+            return conn
+
+        waited = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            metrics.count("db_pool_timeouts_total")
+            raise sqlite3.OperationalError(
+                f"no free connection to {self.db_path} after {self.timeout:.0f}s"
+            ) from None
+        metrics.observe("db_pool_wait_seconds", time.perf_counter() - waited)
+        return conn
+
+    def release(self, conn):
+        try:
+            # A borrower that left a transaction open must not hand it on
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        except sqlite3.ProgrammingError:
+            return                          # closed by close_all() meanwhile
+        self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._opened = 0
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            opened = self._opened
+        idle = self._idle.qsize()
+        return {"size": self.size, "open": opened, "idle": idle, "in_use": opened - idle}
+
+
+def get_pool(db_path=None):
+    db_path = db_path or DB_PATH
+    with _pools_lock:
+        pool = _pools.get(db_path)
+    if pool is None:
+        init_db(db_path)
+        with _pools_lock:
+            pool = _pools.setdefault(db_path, ConnectionPool(db_path))
+    return pool
+
+
+@contextmanager
+def connection(db_path=None):
+    """Borrow a pooled connection to db_path for the duration of the block."""
+    pool = get_pool(db_path)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def open_connection(db_path=None):
+    """An unpooled connection for long reads (exports); the caller closes it."""
+    db_path = db_path or DB_PATH
+    init_db(db_path)
+    return _connect(db_path)
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+@contextmanager
+def transaction(db_path=None, durable=False):
+    """
+    BEGIN IMMEDIATE ... COMMIT; takes the write lock up front so two
+    writers never deadlock upgrading from a read lock. durable=True
+    fsyncs the WAL on this commit (synchronous=FULL) instead of at the
+    next checkpoint.
+    """
+    with connection(db_path) as conn:
+        if durable:
+            conn.execute("PRAGMA synchronous = FULL")
+        try:
+            # BEGIN IMMEDIATE is where a writer queues behind another (busy_timeout)
+            waited = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                metrics.count("db_lock_timeouts_total")
+                raise
+            metrics.observe("db_lock_wait_seconds", time.perf_counter() - waited)
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                # Also reached when COMMIT itself fails (e.g. SQLITE_BUSY),
+                # which leaves the transaction open on the connection
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            if durable:
+                conn.execute("PRAGMA synchronous = NORMAL")
+
+
+# ==================================================
+# 🗂 SCHEMA
+# ==================================================
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS patients (
+        id TEXT PRIMARY KEY,
+        name TEXT UNIQUE,
+        age INTEGER,
+        gender TEXT,
+        dob TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS prescriptions (
+        id TEXT PRIMARY KEY,
+        patient_id TEXT,
+        symptom TEXT,
+        sub_symptom TEXT,
+        medicine TEXT,
+        dosage TEXT,
+        bin INTEGER,
+        created_at TEXT NOT NULL DEFAULT ''
+    )
+    """,
+    # patients.name lookups are already served by the UNIQUE constraint's index
+    # Keyset pagination over history (history.py): newest-first per patient or
+    # clinic-wide. The first also serves every lookup by patient_id alone
+    "CREATE INDEX IF NOT EXISTS idx_prescriptions_patient_created"
+    " ON prescriptions (patient_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_prescriptions_created ON prescriptions (created_at, id)",
+    # Vitals history (see vitals_store.py): raw readings packed into blocks of
+    # uint32 millisecond offsets + float32 values, one row per block
+    """
+    CREATE TABLE IF NOT EXISTS vitals_blocks (
+        patient_id TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        start_ms INTEGER NOT NULL,
+        end_ms INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        times BLOB NOT NULL,
+        vals BLOB NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_vitals_blocks_series ON vitals_blocks (patient_id, metric, end_ms)",
+    # Hourly min/max/sum/count of raw readings that aged out of vitals_blocks
+    """
+    CREATE TABLE IF NOT EXISTS vitals_rollups (
+        patient_id TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        bucket_ms INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        vmin REAL NOT NULL,
+        vmax REAL NOT NULL,
+        vsum REAL NOT NULL,
+        PRIMARY KEY (patient_id, metric, bucket_ms)
+    ) WITHOUT ROWID
+    """,
+)
+
+
+def _migrate(conn):
+    """Bring databases created by earlier versions up to SCHEMA."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(prescriptions)")}
+    if columns and "created_at" not in columns:
+        conn.execute("ALTER TABLE prescriptions ADD COLUMN created_at TEXT NOT NULL DEFAULT ''")
+        # Emergencies already carry their time in dosage as DD-MM-YYYY HH:MM:SS
+        conn.execute(
+            """
+            UPDATE prescriptions
+            SET created_at = substr(dosage, 7, 4) || '-' || substr(dosage, 4, 2) || '-'
+                             || substr(dosage, 1, 2) || ' ' || substr(dosage, 12, 8)
+            WHERE symptom = 'Emergency'
+              AND dosage GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+            """
+        )
+    # Its leading column is covered by idx_prescriptions_patient_created;
+    # keeping both only doubled the index work on every insert
+    conn.execute("DROP INDEX IF EXISTS idx_prescriptions_patient_id")
+
+
+def init_db(db_path=None):
+    """Create tables and indexes and switch the file to WAL. Runs once per path."""
+    db_path = db_path or DB_PATH
+    if db_path in _initialized:
+        return
+
+    with _init_lock:
+        if db_path in _initialized:
+            return
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = _connect(db_path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("BEGIN IMMEDIATE")
+            _migrate(conn)
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        _initialized.add(db_path)
+
+
+# ==================================================
+# 🧍 PATIENTS
+# ==================================================
+
+def find_patient_by_name(name, db_path=None):
+    with connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT id, name, age, gender, dob FROM patients WHERE name = ?", (name,)
+        ).fetchone()
+    return Patient(*row) if row else None
+
+
+def get_patient(patient_id, db_path=None):
+    with connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT id, name, age, gender, dob FROM patients WHERE id = ?", (patient_id,)
+        ).fetchone()
+    return Patient(*row) if row else None
+
+
+def add_patient(name, dob, age, gender, db_path=None):
+    patient = Patient(str(uuid.uuid4()), name, age, gender, str(dob))
+    with transaction(db_path) as conn:
+        conn.execute(
+            "INSERT INTO patients (id, name, dob, age, gender) VALUES (?, ?, ?, ?, ?)",
+            (patient.id, patient.name, patient.dob, patient.age, patient.gender),
+        )
+    return patient
+
+
+# ==================================================
+# 💊 PRESCRIPTIONS & EMERGENCIES
+# ==================================================
+
+def new_prescription(patient_id, symptom, sub_symptom, medicine, dosage, bin, when=None):
+    when = when or datetime.now()
+    return Prescription(
+        str(uuid.uuid4()), patient_id, symptom, sub_symptom, medicine, dosage, bin,
+        when.strftime(TIMESTAMP_FORMAT)
+    )
+
+
+def new_emergency(patient_id, reason, when=None):
+    """Emergencies live in prescriptions; dosage repeats the timestamp for display."""
+    when = when or datetime.now()
+    return new_prescription(
+        patient_id, "Emergency", reason, "N/A", when.strftime("%d-%m-%Y %H:%M:%S"), 0, when
+    )
+
+
+def insert_prescription(conn, prescription):
+    """Insert inside a transaction the caller already holds."""
+    conn.execute(
+        """
+        INSERT INTO prescriptions
+        (id, patient_id, symptom, sub_symptom, medicine, dosage, bin, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        prescription,
+    )
+
+
+def add_prescription(patient_id, symptom, sub_symptom, medicine, dosage, bin, db_path=None):
+    prescription = new_prescription(patient_id, symptom, sub_symptom, medicine, dosage, bin)
+    with transaction(db_path) as conn:
+        insert_prescription(conn, prescription)
+    return prescription
+
 
-def init_db():
-    # Connects to the file. Creates it if it doesn't exist.
-    conn = sqlite3.connect('data/patients.db')
-    c = conn.cursor()
-    # Create the table
-    c.execute('''CREATE TABLE IF NOT EXISTS users 
-                 (id INTEGER PRIMARY KEY, name TEXT, thumbprint_id TEXT, history TEXT)''')
-    conn.commit()
-    conn.close()
-
-def save_patient(name, thumb_id, history):
-    conn = sqlite3.connect('data/patients.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO users (name, thumbprint_id, history) VALUES (?, ?, ?)", 
-              (name, thumb_id, history))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+def add_emergency(patient_id, reason, when=None, db_path=None):
+    emergency = new_emergency(patient_id, reason, when)
+    with transaction(db_path, durable=True) as conn:
+        insert_prescription(conn, emergency)
+    return emergency
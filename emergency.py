@@ -1,8 +1,10 @@
 import streamlit as st
-import uuid
 from datetime import datetime
 
-def show_emergency(c, conn, patient_id):
+import metrics
+from writer import get_writer
+
+def show_emergency(patient_id, db_path=None):
     # ---------------------------
     # Emergency Section
     # ---------------------------
@@ -30,7 +32,8 @@ def show_emergency(c, conn, patient_id):
         ambulance_number = "108 / 112"
 
         # 3️⃣ Emergency Timestamp
-        emergency_time = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+        emergency_now = datetime.now()
+        emergency_time = emergency_now.strftime("%d-%m-%Y %H:%M:%S")
 
         st.error("🚨 EMERGENCY ACTIVATED")
         st.warning(f"🕒 Time: {emergency_time}")
@@ -54,19 +57,10 @@ def show_emergency(c, conn, patient_id):
         """)
 
         # Save Emergency in Database
-        c.execute("""
-            INSERT INTO prescriptions
-            (id, patient_id, symptom, sub_symptom, medicine, dosage, bin)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            str(uuid.uuid4()),
-            patient_id,
-            "Emergency",
-            emergency_reason,
-            "N/A",
-            emergency_time,
-            0
-        ))
-        conn.commit()
+        # Bypasses the write-behind batch: committed and fsynced before we report success
+        with metrics.timed("db_write_seconds", site="emergency"):
+            get_writer(db_path).submit_emergency(
+                patient_id, emergency_reason, when=emergency_now, immediate=True
+            ).result()
 
         st.success("✅ Emergency event saved successfully")
\ No newline at end of file
@@ -0,0 +1,386 @@
+# forest.py - Compiled Array-Backed Tree-Ensemble Inference (forests, boosted trees)
+
+import struct
+import zipfile
+
+import numpy as np
+
+# ==================================================
+# 📦 EXPORT (sklearn ➜ flat arrays)
+# ==================================================
+
+_TREE_LEAF = -1
+
+
+def _float_key(values):
+    """Map float64 values to int64 keys with the same ordering."""
+    bits = np.asarray(values, dtype=np.float64).view(np.int64)
+    return bits ^ ((bits >> 63) & np.int64(0x7FFFFFFFFFFFFFFF))
+
+
+def _key_float(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return (keys ^ ((keys >> 63) & np.int64(0x7FFFFFFFFFFFFFFF))).view(np.float64)
+
+
+def _scaled_goes_left(raw, thresholds, mean, scale):
+    # Exactly what sklearn sees: StandardScaler output cast to float32
+    scaled = ((raw - mean) / scale).astype(np.float32).astype(np.float64)
+    return scaled <= thresholds
+
+
+def _fold_thresholds(thresholds, mean, scale):
+    """
+    Return raw-space thresholds T such that, for every float64 x,
+    x <= T  <=>  float32((x - mean) / scale) <= threshold.
+
+    The scaled comparison is monotone in x, so the boundary is found by
+    bisecting over the ordered float64 bit patterns around t*scale + mean.
+    """
+    guess = thresholds * scale + mean
+    width = np.abs(guess) * 1e-5 + np.abs(scale) * 1e-5 + 1e-9
+
+    lo = guess - width
+    hi = guess + width
+    for _ in range(64):
+        bad_lo = ~_scaled_goes_left(lo, thresholds, mean, scale)
+        bad_hi = _scaled_goes_left(hi, thresholds, mean, scale)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        width = np.where(bad_lo | bad_hi, width * 16, width)
+        lo = np.where(bad_lo, guess - width, lo)
+        hi = np.where(bad_hi, guess + width, hi)
+    else:
+        raise ValueError("could not bracket folded split thresholds")
+
+    lo_key, hi_key = _float_key(lo), _float_key(hi)
+    # Invariant: lo goes left, hi goes right
+    while True:
+        open_ = hi_key - lo_key > 1
+        if not open_.any():
+            break
+        mid_key = lo_key + (hi_key - lo_key) // 2
+        left = _scaled_goes_left(_key_float(mid_key), thresholds, mean, scale)
+        lo_key = np.where(open_ & left, mid_key, lo_key)
+        hi_key = np.where(open_ & ~left, mid_key, hi_key)
+
+    return _key_float(lo_key)
+
+
+def _leaf_proba(tree):
+    value = np.array(tree.value[:, 0, :], dtype=np.float64)
+    totals = value.sum(axis=1)
+    # Older sklearn stores weighted counts; newer stores fractions already
+    if not np.allclose(totals, 1.0):
+        totals[totals == 0.0] = 1.0
+        value /= totals[:, np.newaxis]
+    return value
+
+
+def _breadth_first(tree, max_depth=None):
+    """
+    Renumber a tree's nodes breadth-first so each split's right child sits
+    right after its left child. The evaluator then only needs one child
+    array: next = left + (x > threshold). With max_depth, nodes at that
+    depth are not expanded and become leaves (pruning).
+    """
+    order = [0]
+    depth = [0]
+    for i, node in enumerate(order):
+        if tree.children_left[node] != _TREE_LEAF and (max_depth is None or depth[i] < max_depth):
+            order.append(tree.children_left[node])
+            order.append(tree.children_right[node])
+            depth += [depth[i] + 1, depth[i] + 1]
+    order = np.asarray(order, dtype=np.int64)
+    new_id = np.full(tree.node_count, -1, dtype=np.int64)
+    new_id[order] = np.arange(len(order))
+    # A kept node is a leaf when neither of its children was kept
+    is_leaf = (tree.children_left[order] == _TREE_LEAF) | (new_id[tree.children_left[order]] < 0)
+    return order, new_id, is_leaf, max(depth)
+
+
+def _flatten_tree(tree, offset, mean=None, scale=None, max_depth=None):
+    """One tree's (feature, threshold, child, node order, depth), ids offset for concatenation."""
+    order, new_id, is_leaf, depth = _breadth_first(tree, max_depth)
+    split = ~is_leaf
+
+    feature = np.where(is_leaf, 0, tree.feature[order]).astype(np.intp)
+    threshold = tree.threshold[order].astype(np.float64)
+    if mean is not None:
+        threshold[split] = _fold_thresholds(
+            threshold[split], mean[feature[split]], scale[feature[split]]
+        )
+    # Leaves never move: x > inf is always False and they point at themselves
+    threshold[is_leaf] = np.inf
+
+    child = np.arange(len(order)) + offset
+    child[split] = new_id[tree.children_left[order][split]] + offset
+    return feature, threshold, child.astype(np.intp), order, depth
+
+
+def _scaler_stats(scaler, n_features):
+    if scaler is None:
+        return None, None
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    return mean, scale
+
+
+def _pack(features, thresholds, children, values, roots, classes, n_features, max_depth):
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "children": np.concatenate(children),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.intp),
+        "classes": np.asarray(classes),
+        "n_features": np.int64(n_features),
+        "max_depth": np.int64(max_depth),
+    }
+
+
+def export_forest(model, scaler=None, max_depth=None, n_trees=None):
+    """
+    Flatten a fitted RandomForestClassifier (or a single
+    DecisionTreeClassifier) into contiguous arrays.
+
+    When a fitted StandardScaler is given, its mean/scale are folded into
+    the split thresholds so the compiled forest takes raw feature values
+    and still reproduces scaler.transform + model.predict exactly.
+    max_depth and n_trees prune the export: the first n_trees trees, each
+    cut at max_depth (a cut node predicts its training class mix).
+    """
+    n_features = model.n_features_in_
+    mean, scale = _scaler_stats(scaler, n_features)
+    estimators = getattr(model, "estimators_", [model])[:n_trees]
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    deepest = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        feature, threshold, child, order, depth = _flatten_tree(tree, offset, mean, scale, max_depth)
+        features.append(feature)
+        thresholds.append(threshold)
+        children.append(child)
+        values.append(_leaf_proba(tree)[order])
+        roots.append(offset)
+        offset += len(order)
+        deepest = max(deepest, depth)
+
+    return _pack(features, thresholds, children, values, roots, model.classes_, n_features, deepest)
+
+
+def export_boosted(model, scaler=None):
+    """
+    Flatten a fitted GradientBoostingClassifier. Each stage's per-class
+    regression tree becomes a tree whose leaves score only its class
+    (learning rate applied); "bias" holds the initial raw scores, so
+    softmax(bias + sum of trees) is the model's predict_proba.
+    """
+    n_features = model.n_features_in_
+    n_classes = len(model.classes_)
+    mean, scale = _scaler_stats(scaler, n_features)
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    deepest = 0
+    for stage in model.estimators_:
+        for k, estimator in enumerate(stage):
+            tree = estimator.tree_
+            feature, threshold, child, order, depth = _flatten_tree(tree, offset, mean, scale)
+            value = np.zeros((len(order), n_classes))
+            # Binary models grow one tree per stage, scoring the positive class
+            value[:, k if n_classes > 2 else 1] = tree.value[order, 0, 0] * model.learning_rate
+            features.append(feature)
+            thresholds.append(threshold)
+            children.append(child)
+            values.append(value)
+            roots.append(offset)
+            offset += len(order)
+            deepest = max(deepest, depth)
+
+    arrays = _pack(features, thresholds, children, values, roots, model.classes_, n_features, deepest)
+    # The initial estimate is whatever decision_function adds on top of the
+    # trees; read it off one row rather than relying on sklearn internals
+    # (the all-zero scaled row, which is the scaler mean in raw units)
+    raw = np.asarray(model.decision_function(np.zeros((1, n_features), dtype=np.float32)),
+                     dtype=np.float64).reshape(-1)
+    if n_classes == 2:
+        raw = np.array([0.0, raw[0]])
+    row = np.zeros((1, n_features)) if mean is None else mean.reshape(1, -1).copy()
+    arrays["bias"] = raw - CompiledForest(**arrays)._sum_block(row)[0]
+    return arrays
+
+
+def save_forest(path, arrays):
+    np.savez(path, **arrays)
+
+
+def _npz_members(path):
+    """
+    Yield (name, array) for every member of an uncompressed .npz, with
+    non-empty arrays memory-mapped read-only straight out of the archive.
+    np.load ignores mmap_mode for .npz, so the offsets are resolved here.
+    """
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    yield name, np.lib.format.read_array(member, allow_pickle=False)
+                continue
+
+            # Local file header: 30 fixed bytes + file name + extra field
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if dtype.hasobject:
+                raise ValueError(f"{name}: object arrays cannot be memory-mapped")
+            if not shape or 0 in shape:
+                yield name, np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+                continue
+
+            yield name, np.memmap(
+                path, dtype=dtype, mode="r", offset=f.tell(),
+                shape=shape, order="F" if fortran else "C",
+            )
+
+
+def load_forest(path, mmap=False):
+    """
+    Load a compiled forest. With mmap=True the node arrays are mapped
+    read-only from the file, so every process on the box serving the same
+    export shares one copy through the page cache.
+    """
+    if mmap:
+        return CompiledForest(**dict(_npz_members(path)))
+    with np.load(path, allow_pickle=False) as data:
+        return CompiledForest(**{key: data[key] for key in data.files})
+
+
+# ==================================================
+# ⚡ EVALUATOR
+# ==================================================
+
+class CompiledForest:
+    # Rows per traversal block; bounds the (n_trees x rows) work arrays.
+    # Past ~1k rows bigger blocks only fall out of cache (bench_forest.py)
+    block_rows = 1024
+
+    def __init__(self, feature, threshold, children, value, roots,
+                 classes, n_features, max_depth, bias=None):
+        arrays = (feature, threshold, children, value, roots)
+        self._mapped_nbytes = sum(a.nbytes for a in arrays if isinstance(a, np.memmap))
+        # Plain ndarray views over the same buffers skip memmap's subclass hooks
+        self.feature, self.threshold, self.children, self.value, self.roots = (
+            np.asarray(a) for a in arrays
+        )
+        self.classes_ = classes
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+        self.n_trees = len(roots)
+        self.is_leaf = np.isposinf(threshold)
+        # Boosted ensembles: leaves hold raw class scores, added to bias and
+        # put through softmax. Without bias the leaves are averaged (forest).
+        self.bias = None if bias is None else np.asarray(bias, dtype=np.float64)
+
+    def _check(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("input contains NaN or infinity")
+        return X
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_trees, n_rows)."""
+        n = len(X)
+        flat = X.ravel()
+        feature, children, threshold, is_leaf = self.feature, self.children, self.threshold, self.is_leaf
+
+        # Level 0: every row of a tree starts at its root, so the first
+        # split is one column gather per tree instead of a per-entry lookup
+        x = X.T.take(feature.take(self.roots), axis=0)
+        node = (children.take(self.roots)[:, np.newaxis]
+                + (x > threshold.take(self.roots)[:, np.newaxis])).ravel()
+        # One entry per (tree, row), tree-major; base is the row's offset in flat
+        base = np.tile(np.arange(0, n * self.n_features, self.n_features), self.n_trees)
+        leaves, entry = node, None
+        done = is_leaf.take(node)
+
+        # np.take on native-int index arrays is the cheapest gather numpy has
+        for _ in range(1, self.max_depth):
+            # Finished entries are stable; compacting costs a few passes, so
+            # only drop them once they are at least half of what is left
+            if np.count_nonzero(done) * 2 >= len(node):
+                keep = np.flatnonzero(~done)
+                if entry is None:
+                    leaves, entry = node, keep
+                else:
+                    leaves[entry] = node
+                    entry = entry.take(keep)
+                node, base = node.take(keep), base.take(keep)
+                if not len(node):
+                    break
+            x = flat.take(base + feature.take(node))
+            node = children.take(node) + (x > threshold.take(node))
+            done = is_leaf.take(node)
+
+        if entry is None:
+            leaves = node
+        else:
+            leaves[entry] = node
+        return leaves.reshape(self.n_trees, n)
+
+    def _sum_block(self, X):
+        # Reducing over the tree axis adds trees one after another, in
+        # estimator order, which is how sklearn accumulates them
+        return self.value.take(self.apply(X), axis=0).sum(axis=0)
+
+    def _proba_block(self, X):
+        total = self._sum_block(X)
+        if self.bias is None:
+            return total / self.n_trees
+        total += self.bias
+        total -= total.max(axis=1, keepdims=True)
+        np.exp(total, out=total)
+        total /= total.sum(axis=1, keepdims=True)
+        return total
+
+    def predict_proba(self, X):
+        X = self._check(X)
+        if len(X) <= self.block_rows:
+            return self._proba_block(X)
+        return np.concatenate([
+            self._proba_block(X[start:start + self.block_rows])
+            for start in range(0, len(X), self.block_rows)
+        ])
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    @property
+    def nbytes(self):
+        return sum(
+            a.nbytes for a in (self.feature, self.threshold, self.children,
+                               self.value, self.roots)
+        ) + (self.bias.nbytes if self.bias is not None else 0)
+
+    @property
+    def mapped_nbytes(self):
+        """Bytes backed by a shared file mapping rather than private memory."""
+        return self._mapped_nbytes
@@ -1,11 +1,15 @@
 # hardware.py – Manual Vitals & Blood Test Input (Safe Ranges)
 
+import numpy as np
+
+
 def get_vital_limits():
     return {
         "temperature": (35.0, 42.0),        # °C
         "heart_rate": (30, 200),            # BPM
         "bp_systolic": (70, 200),            # mmHg
         "bp_diastolic": (40, 130),           # mmHg
+        "spo2": (94, 100),                   # %
         "glucose": (50, 400),                # mg/dL
         "rbc": (3.5, 6.5),                   # million/µL
         "wbc": (3000, 20000),                # cells/µL
@@ -23,3 +27,14 @@ def classify(value, low, high):
     elif value > high:
         return "High"
     return "Normal"
+
+
+# Codes returned by classify_array, index into CLASS_LABELS
+LOW, NORMAL, HIGH = 0, 1, 2
+CLASS_LABELS = ("Low", "Normal", "High")
+
+
+def classify_array(values, low, high):
+    """Vectorized classify: int8 codes (LOW/NORMAL/HIGH) for a whole array."""
+    values = np.asarray(values)
+    return (NORMAL + (values > high).astype(np.int8) - (values < low)).astype(np.int8)
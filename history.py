@@ -0,0 +1,177 @@
+# history.py - Prescription History (keyset pagination, streaming export)
+#
+# Pages are keyed on (created_at, id) rather than OFFSET, so page 500 costs
+# the same index seek as page 1 and rows inserted meanwhile never shift or
+# duplicate a page. Exports walk the same index with one SQLite cursor and
+# write fixed-size batches, so memory stays flat however many rows there are.
+#
+# Usage: python history.py export audit.csv [--patient ID] [--since 2024-01-01]
+#                                           [--until 2024-02-01] [--format parquet]
+
+import argparse
+import csv
+import os
+import time
+from collections import namedtuple
+
+import database
+import metrics
+
+PAGE_SIZE = 20
+EXPORT_BATCH = 5000
+
+COLUMNS = database.Prescription._fields
+
+# rows: Prescription tuples, newest first. next_cursor: pass back to fetch
+# the following (older) page; None on the last page.
+Page = namedtuple("Page", ["rows", "next_cursor"])
+
+
+def _where(patient_id, since, until):
+    """WHERE clause and parameters for the optional patient and [since, until) filters."""
+    clauses, params = [], []
+    if patient_id is not None:
+        clauses.append("patient_id = ?")
+        params.append(patient_id)
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(str(since))
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(str(until))
+    return clauses, params
+
+
+# ==================================================
+# 📜 PAGES
+# ==================================================
+
+def prescription_page(patient_id=None, since=None, until=None, cursor=None,
+                      limit=PAGE_SIZE, db_path=None):
+    """
+    One page of prescriptions, newest first, for a patient and/or a
+    created_at range (ISO date or datetime strings, until exclusive).
+    """
+    clauses, params = _where(patient_id, since, until)
+    if cursor is not None:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    with metrics.timed("history_page_seconds"), database.connection(db_path) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM prescriptions {where}"
+            " ORDER BY created_at DESC, id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+
+    # One extra row tells us whether another page exists without a COUNT(*)
+    more = len(rows) > limit
+    rows = [database.Prescription(*row) for row in rows[:limit]]
+    next_cursor = (rows[-1].created_at, rows[-1].id) if more else None
+    return Page(rows, next_cursor)
+
+
+# ==================================================
+# 📤 STREAMING EXPORT
+# ==================================================
+
+def iter_batches(patient_id=None, since=None, until=None, batch_size=EXPORT_BATCH, db_path=None):
+    """
+    Yield lists of row tuples, oldest first. SQLite steps the cursor on
+    demand, so only one batch is ever in memory.
+    """
+    clauses, params = _where(patient_id, since, until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    # A private connection: the export's long read must not hold the
+    # caller's pooled connection (or its transaction state) for minutes
+    conn = database.open_connection(db_path)
+    try:
+        cursor = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM prescriptions {where} ORDER BY created_at, id",
+            params,
+        )
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+    finally:
+        conn.close()
+
+
+def _write_csv(path, batches):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for batch in batches:
+            writer.writerows(batch)
+            yield len(batch)
+
+
+def _write_parquet(path, batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+
+    schema = pa.schema([(name, pa.int64() if name == "bin" else pa.string()) for name in COLUMNS])
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            # Columnar transpose of one batch; one row group per batch
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield len(batch)
+
+
+def export_prescriptions(path, fmt=None, patient_id=None, since=None, until=None,
+                         batch_size=EXPORT_BATCH, db_path=None):
+    """Write matching prescriptions to CSV or Parquet; returns the row count."""
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    writers = {"csv": _write_csv, "parquet": _write_parquet}
+    if fmt not in writers:
+        raise ValueError(f"unknown export format {fmt!r}")
+
+    batches = iter_batches(patient_id, since, until, batch_size, db_path)
+    # Write next to the target and rename, so a failed export never
+    # leaves a truncated file that looks complete
+    tmp = f"{path}.{os.getpid()}.tmp"
+    rows = 0
+    try:
+        for written in writers[fmt](tmp, batches):
+            rows += written
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prescription history tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="stream prescriptions to CSV or Parquet")
+    export.add_argument("output")
+    export.add_argument("--format", choices=["csv", "parquet"], default=None,
+                        help="default: from the output file extension")
+    export.add_argument("--patient", default=None, help="patient id")
+    export.add_argument("--since", default=None, help="created_at lower bound, e.g. 2024-01-01")
+    export.add_argument("--until", default=None, help="created_at upper bound (exclusive)")
+    export.add_argument("--batch-size", type=int, default=EXPORT_BATCH)
+    export.add_argument("--db", default=None, help="database path (default: CLINIC_DB_PATH)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = export_prescriptions(args.output, args.format, args.patient, args.since, args.until,
+                                args.batch_size, args.db)
+    seconds = time.perf_counter() - start
+    print(f"✅ Exported {rows:,} prescriptions to '{args.output}' "
+          f"in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,296 @@
 # logic.py - AI + Rule-Based Physician Engine
 
-import joblib
-import pandas as pd
 import numpy as np
 import os
+import threading
+import time
+
+import metrics
+from bundle import BundleError, bundle_sha256, list_variants, load_bundle, variant_file
+from forest import load_forest
+from matcher import Term, TermMatcher
+from prediction_cache import PredictionCache
 
 # ==================================================
 # 🧠 AI MODEL LOADING (DEPLOYMENT SAFE)
 # ==================================================
 
-MODEL_AVAILABLE = False
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# No model ships with the code: a deployment trains its own with
+# train_brain.py, and until it has, AI diagnosis is switched off
+AI_DISABLED_MESSAGE = ("AI diagnosis is disabled: no trained model is installed "
+                       "(run generate_data.py, then train_brain.py)")
+# Name of a compressed variant (medical_bundle.<name>.npz) to serve instead
+# of the full model; see `train_brain.py --compress`
+MODEL_VARIANT = os.environ.get("CLINIC_MODEL_VARIANT") or None
+
+
+def _process_memory():
+    """Resident set size of this process, split into file-backed and anonymous."""
+    stats = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    stats[key] = int(value.split()[0]) * 1024
+    except OSError:
+        import resource
+        stats["VmRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return stats
+
+
+class LoadedModel:
+    def __init__(self, encoder=None, forest=None, model=None, scaler=None, labels=None):
+        self.encoder = encoder
+        self.forest = forest
+        self.model = model
+        self.scaler = scaler
+        self.labels = labels
+
+    @property
+    def classes_(self):
+        return self.forest.classes_ if self.forest is not None else self.model.classes_
+
+    def decode(self, codes):
+        """Class codes to diagnosis names."""
+        if self.labels is not None:
+            return self.labels.take(codes)
+        return self.encoder.inverse_transform(codes)
+
+    def predict(self, X, return_proba):
+        if self.forest is not None:
+            proba = self.forest.predict_proba(X)
+            labels = self.decode(self.classes_.take(np.argmax(proba, axis=1)))
+            return labels, (proba if return_proba else None)
+
+        # Same arithmetic as StandardScaler.transform, minus the pandas round-trip
+        scaled = (X - self.scaler.mean_) / self.scaler.scale_
+        if return_proba:
+            proba = self.model.predict_proba(scaled)
+            labels = self.decode(self.classes_.take(np.argmax(proba, axis=1)))
+            return labels, proba
+        return self.decode(self.model.predict(scaled)), None
+
+
+class ModelRegistry:
+    """
+    Loads the AI artifacts on first use instead of at import time.
+
+    The checksummed bundle from train_brain.py is preferred; the older
+    compiled-forest and three-pickle layouts are still read when no
+    bundle exists. Large arrays are memory-mapped read-only (mmap=True),
+    so several Streamlit workers on one box share the same physical pages.
+    With a variant name, only that compressed bundle is loaded.
+    """
+
+    def __init__(self, base_dir=BASE_DIR, mmap=True, variant=None):
+        self.base_dir = base_dir
+        self.variant = variant
+        self.bundle_path = self._variant_path(variant)
+        self.model_path = os.path.join(base_dir, "medical_model.pkl")
+        self.scaler_path = os.path.join(base_dir, "scaler.pkl")
+        self.encoder_path = os.path.join(base_dir, "encoder.pkl")
+        self.forest_path = os.path.join(base_dir, "medical_forest.npz")
+        self.mmap = mmap
+
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._attempted = False
+        self.source = None
+        self.sha256 = None
+        self.load_seconds = None
+        self.error = None
+        self.memory_before = {}
+        self.memory_after = {}
+
+    def get(self):
+        """Return the LoadedModel, or None when no usable artifacts exist."""
+        if not self._attempted:
+            with self._lock:
+                if not self._attempted:
+                    self._load()
+                    self._attempted = True
+        return self._loaded
+
+    def reset(self):
+        with self._lock:
+            self._loaded = None
+            self._attempted = False
+
+    def _variant_path(self, variant):
+        try:
+            return os.path.join(self.base_dir, variant_file(variant))
+        except BundleError:
+            return None   # reported by _load, like any other unusable artifact
+
+    def select(self, variant):
+        """Serve a compressed variant by name (None = the full model) from the next get()."""
+        path = self._variant_path(variant)
+        with self._lock:
+            self.variant = variant
+            self.bundle_path = path
+            self._loaded = None
+            self._attempted = False
+            self.source = self.sha256 = self.error = None
+
+    def _check_parent(self, bundle):
+        # A variant left over from an earlier training run must not be served
+        full_path = os.path.join(self.base_dir, variant_file(None))
+        if not os.path.exists(full_path):
+            raise BundleError(f"model variant {self.variant!r} has no full bundle to match")
+        current = bundle_sha256(full_path)
+        if bundle.parent_sha256 != current:
+            built_from = bundle.parent_sha256[:12] if bundle.parent_sha256 else "an unrecorded model"
+            raise BundleError(
+                f"model variant {self.variant!r} was built from {built_from}, not the "
+                f"installed full model {current[:12]} (rerun train_brain.py --compress)"
+            )
+
+    def _load(self):
+        mmap_mode = "r" if self.mmap else None
+        self.memory_before = _process_memory()
+        start = time.perf_counter()
+
+        try:
+            if self.bundle_path is None:
+                variant_file(self.variant)   # raises the naming error
+            if self.variant is not None and not os.path.exists(self.bundle_path):
+                # A named variant never falls back to another model
+                raise BundleError(f"model variant {self.variant!r} not found "
+                                  f"(have: {', '.join(list_variants(self.base_dir)) or 'none'})")
+            if os.path.exists(self.bundle_path):
+                # One file, validated (schema, shapes, content hash) as it loads.
+                # A bad bundle is an error, not a cue to fall back to stale pickles
+                bundle = load_bundle(self.bundle_path, mmap=self.mmap)
+                if bundle.feature_columns != FEATURE_COLUMNS:
+                    raise BundleError(
+                        f"bundle feature order {bundle.feature_columns} does not match "
+                        f"{FEATURE_COLUMNS}"
+                    )
+                if self.variant is not None:
+                    self._check_parent(bundle)
+                self._loaded = LoadedModel(forest=bundle.forest, labels=bundle.labels)
+                self.source = self.bundle_path
+                self.sha256 = bundle.sha256
+                variant = f"variant {self.variant}, " if self.variant else ""
+                print(f"✅ AI Model Loaded Successfully ({variant}bundle {bundle.sha256[:12]})")
+            elif os.path.exists(self.forest_path) and os.path.exists(self.encoder_path):
+                # Legacy layouts only: joblib (and sklearn under it) is not
+                # imported unless one of them is actually loaded
+                import joblib
+                # Compiled forest has the scaler folded in, so raw vitals go straight in
+                self._loaded = LoadedModel(
+                    encoder=joblib.load(self.encoder_path),
+                    forest=load_forest(self.forest_path, mmap=self.mmap),
+                )
+                self.source = self.forest_path
+                print("✅ AI Model Loaded Successfully (compiled forest)")
+            elif (
+                os.path.exists(self.model_path)
+                and os.path.exists(self.scaler_path)
+                and os.path.exists(self.encoder_path)
+            ):
+                import joblib
+                self._loaded = LoadedModel(
+                    encoder=joblib.load(self.encoder_path),
+                    model=joblib.load(self.model_path, mmap_mode=mmap_mode),
+                    scaler=joblib.load(self.scaler_path),
+                )
+                self.source = self.model_path
+                print("✅ AI Model Loaded Successfully")
+            else:
+                print(f"⚠ {AI_DISABLED_MESSAGE}")
+
+        except Exception as e:
+            self._loaded = None
+            self.error = str(e)
+            print("❌ Error loading AI model:", e)
+
+        self.load_seconds = time.perf_counter() - start
+        self.memory_after = _process_memory()
+
+    def state(self):
+        """
+        "ready" (loaded), "available" (artifacts on disk, not loaded yet),
+        "error" (loading failed) or "disabled" (no trained model installed).
+        Only looks at the disk; never triggers a load.
+        """
+        if self._loaded is not None:
+            return "ready"
+        if self._attempted:
+            return "error" if self.error is not None else "disabled"
+        if self.variant is not None or os.path.exists(self.bundle_path):
+            return "available"   # a missing variant is reported by the load itself
+        legacy = (self.forest_path, self.encoder_path), (self.model_path, self.scaler_path,
+                                                           self.encoder_path)
+        if any(all(os.path.exists(p) for p in paths) for paths in legacy):
+            return "available"
+        return "disabled"
+
+    def stats(self):
+        loaded = self._loaded
+        forest = loaded.forest if loaded is not None else None
+        before = self.memory_before.get("VmRSS", 0)
+        after = self.memory_after.get("VmRSS", 0)
+        return {
+            "loaded": loaded is not None,
+            "state": self.state(),
+            "variant": self.variant,
+            "source": self.source,
+            "sha256": self.sha256,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "mmap": self.mmap,
+            "model_bytes": forest.nbytes if forest is not None else None,
+            "shared_bytes": forest.mapped_nbytes if forest is not None else 0,
+            "rss_growth_bytes": after - before if self._attempted else None,
+            "process": _process_memory(),
+        }
+
 
-try:
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+registry = ModelRegistry(variant=MODEL_VARIANT)
 
-    model_path = os.path.join(BASE_DIR, "medical_model.pkl")
-    scaler_path = os.path.join(BASE_DIR, "scaler.pkl")
-    encoder_path = os.path.join(BASE_DIR, "encoder.pkl")
 
-    if (
-        os.path.exists(model_path)
-        and os.path.exists(scaler_path)
-        and os.path.exists(encoder_path)
-    ):
-        model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
-        encoder = joblib.load(encoder_path)
-        MODEL_AVAILABLE = True
-        print("✅ AI Model Loaded Successfully")
-    else:
-        print("⚠ AI model files not found.")
+def warm_up():
+    """Load the AI model now rather than on the first diagnosis request."""
+    return registry.get() is not None
 
-except Exception as e:
-    MODEL_AVAILABLE = False
-    print("❌ Error loading AI model:", e)
+
+if os.environ.get("CLINIC_MODEL_EAGER") == "1":
+    warm_up()
+
+
+def get_model_stats():
+    return registry.stats()
+
+
+def get_ai_state():
+    """registry.state(), except that a model server can answer when no local model exists."""
+    state = registry.state()
+    if state == "disabled" and MODEL_SERVER:
+        return "available"
+    return state
+
+
+def available_model_variants():
+    """Compressed variants saved next to the app, by name."""
+    return list_variants(BASE_DIR)
+
+
+def use_model_variant(name):
+    """Switch to a compressed variant (None = full model); returns whether it loaded."""
+    global _version
+    registry.select(name)
+    _version = (None, 0.0)   # re-key the prediction cache now, not a second later
+    return registry.get() is not None
+
+
+def __getattr__(name):
+    # MODEL_AVAILABLE used to be set at import; keep it working, lazily
+    if name == "MODEL_AVAILABLE":
+        return registry.get() is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ==================================================
@@ -96,14 +353,72 @@ EMERGENCY_KEYWORDS = [
     "stroke"
 ]
 
-def detect_emergency(text):
-    text = text.lower()
+# Other ways people say the same emergency; each maps to its keyword above
+EMERGENCY_SYNONYMS = {
+    "chest pain": ["chest tightness", "pain in my chest", "pain in the chest"],
+    "breathing difficulty": [
+        "difficulty breathing", "trouble breathing", "shortness of breath",
+        "short of breath", "can't breathe", "cannot breathe"
+    ],
+    "unconscious": ["passed out", "unresponsive", "fainted"],
+    # Not "fitting": it is an everyday word ("the shoe is fitting fine")
+    "seizure": ["convulsion", "convulsing", "having a fit"],
+    "severe bleeding": ["heavy bleeding", "bleeding heavily"],
+    "heart attack": ["cardiac arrest"],
+    "stroke": ["face drooping", "slurred speech"]
+}
+
+# Spoken keywords ➜ main symptom
+SPEECH_SYMPTOM_MAP = {
+    "cough": "Cough",
+    "coughing": "Cough",
+    "fever": "Fever",
+    "feverish": "Fever",
+    "headache": "Headache",
+    "pain": "Pain",
+    "painful": "Pain",
+    "aching": "Pain",
+    "cold": "Cough",
+    "temperature": "Fever",
+    "breath": "Breathing Difficulty",
+    "breathing": "Breathing Difficulty",
+    "breathless": "Breathing Difficulty",
+}
+
+EMERGENCY_PRIORITY = 100
+SYMPTOM_PRIORITY = 10
+
+
+def _build_term_matcher():
+    terms = []
     for keyword in EMERGENCY_KEYWORDS:
-        if keyword in text:
-            return True, keyword
+        for phrase in [keyword] + EMERGENCY_SYNONYMS.get(keyword, []):
+            terms.append(Term(phrase, "emergency", keyword, EMERGENCY_PRIORITY))
+    for phrase, symptom in SPEECH_SYMPTOM_MAP.items():
+        terms.append(Term(phrase, "symptom", symptom, SYMPTOM_PRIORITY))
+    return TermMatcher(terms)
+
+
+TERM_MATCHER = _build_term_matcher()
+
+
+def match_clinical_terms(text):
+    """All emergency and symptom hits in text, as TermMatch spans in text order."""
+    return TERM_MATCHER.find_all(text)
+
+
+def detect_emergency(text):
+    match = TERM_MATCHER.first(text, kind="emergency")
+    if match is not None:
+        return True, match.label
     return False, None
 
 
+def detect_speech_symptom(text):
+    match = TERM_MATCHER.first(text, kind="symptom")
+    return match.label if match is not None else None
+
+
 # ==================================================
 # 💊 RULE-BASED DIAGNOSIS
 # ==================================================
@@ -127,28 +442,249 @@ def get_all_main_symptoms():
 # 🤖 AI-BASED DIAGNOSIS
 # ==================================================
 
+FEATURE_COLUMNS = [
+    "Age", "Gender", "Temp", "HR",
+    "Sys", "SpO2", "WBC", "CRP", "Hb"
+]
+
+# Finest difference worth a separate prediction, per feature (cache keys)
+FEATURE_RESOLUTION = {
+    "Age": 1, "Gender": 1, "Temp": 0.1, "HR": 1,
+    "Sys": 1, "SpO2": 1, "WBC": 0.1, "CRP": 0.1, "Hb": 0.1
+}
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+
+# CLINIC_PREDICTION_CACHE=0 disables; CLINIC_PREDICTION_CACHE_TTL in seconds
+prediction_cache = PredictionCache(
+    [FEATURE_RESOLUTION[name] for name in FEATURE_COLUMNS],
+    max_entries=int(os.environ.get("CLINIC_PREDICTION_CACHE", "10000")),
+    ttl=float(os.environ["CLINIC_PREDICTION_CACHE_TTL"])
+    if os.environ.get("CLINIC_PREDICTION_CACHE_TTL") else None,
+)
+
+_version_lock = threading.Lock()
+_version = (None, 0.0)   # (version, monotonic time it was read)
+
+
+def _model_version():
+    """
+    Identity of the in-process model: the loaded bundle's hash
+    plus the artifact file's size and mtime (stat'ed at most once a second),
+    so a retrained or replaced model never serves the old model's answers.
+    """
+    global _version
+    version, checked = _version
+    now = time.monotonic()
+    if now - checked < 1.0:
+        return version
+    path = registry.source or registry.bundle_path
+    try:
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+    except (OSError, TypeError):   # TypeError: no path (invalid variant name)
+        stamp = None
+    version = (registry.sha256, path, stamp)
+    with _version_lock:
+        _version = (version, now)
+    return version
+
+
+def get_prediction_cache_stats():
+    return prediction_cache.stats()
+
+
+def _as_feature_matrix(rows):
+    X = np.asarray(rows, dtype=np.float64)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.ndim != 2 or X.shape[1] != len(FEATURE_COLUMNS):
+        raise ValueError(
+            f"expected rows of {len(FEATURE_COLUMNS)} values "
+            f"({', '.join(FEATURE_COLUMNS)}), got shape {X.shape}"
+        )
+    return X
+
+
+def _iter_chunks(rows, chunk_size):
+    """Yield 2-D float64 blocks of at most chunk_size rows."""
+    if isinstance(rows, np.ndarray):
+        for start in range(0, len(rows), chunk_size):
+            yield _as_feature_matrix(rows[start:start + chunk_size])
+        return
+
+    block = []
+    for row in rows:
+        # An iterable of pre-built 2-D blocks is passed through as-is
+        if isinstance(row, np.ndarray) and row.ndim == 2:
+            if block:
+                yield _as_feature_matrix(block)
+                block = []
+            yield _as_feature_matrix(row)
+            continue
+        block.append(row)
+        if len(block) >= chunk_size:
+            yield _as_feature_matrix(block)
+            block = []
+    if block:
+        yield _as_feature_matrix(block)
+
+
+def iter_ai_diagnosis_batches(rows, return_proba=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Score rows chunk by chunk so memory stays bounded by chunk_size.
+
+    rows may be a 2-D array, an iterable of 9-value rows, or an iterable
+    of 2-D blocks (e.g. pandas/CSV chunks converted with .to_numpy()).
+    Yields labels, or (labels, probabilities) when return_proba is set.
+    """
+    loaded = registry.get()
+    if loaded is None:
+        raise ModelUnavailable("AI model not available")
+
+    for X in _iter_chunks(rows, chunk_size):
+        if return_proba:
+            yield loaded.predict(X, True)
+        elif prediction_cache.enabled and np.isfinite(X).all():
+            # Only rows missing from the cache (and only once each) reach the model
+            version = _model_version()
+            yield prediction_cache.predict(
+                X, version, lambda X_: (loaded.predict(X_, False)[0], version))
+        else:
+            yield loaded.predict(X, False)[0]
+
+
+def get_ai_diagnosis_batch(rows, return_proba=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Vectorized get_ai_diagnosis for many rows at once.
+
+    Returns an array of labels, or (labels, probabilities) when
+    return_proba is set. Probability columns follow get_ai_classes().
+    """
+    results = list(iter_ai_diagnosis_batches(rows, return_proba, chunk_size))
+
+    if not results:
+        labels = np.empty(0, dtype=object)
+        if return_proba:
+            return labels, np.empty((0, len(get_ai_classes())))
+        return labels
+
+    if return_proba:
+        labels = np.concatenate([r[0] for r in results])
+        proba = np.concatenate([r[1] for r in results])
+        return labels, proba
+    return np.concatenate(results)
+
+
+def get_ai_classes():
+    loaded = registry.get()
+    if loaded is None:
+        return []
+    return list(loaded.decode(loaded.classes_))
+
+
+# ---------------------------
+# Shared model server (model_server.py). When CLINIC_MODEL_SERVER is set,
+# single diagnoses go there; if it is down or overloaded they run here.
+MODEL_SERVER = os.environ.get("CLINIC_MODEL_SERVER")
+SERVER_RETRY_SECONDS = 5.0
+
+_server_client = None
+_server_retry_at = 0.0
+
+
+def _server():
+    """The model server client, or None while it is marked unreachable."""
+    global _server_client
+    if time.monotonic() < _server_retry_at:
+        return None
+    if _server_client is None:
+        from model_server import ModelClient
+        _server_client = ModelClient(MODEL_SERVER)
+    return _server_client
+
+
+def _server_unreachable():
+    # Stop trying for a while instead of paying a connect per call
+    global _server_retry_at
+    _server_retry_at = time.monotonic() + SERVER_RETRY_SECONDS
+    metrics.count("model_server_fallbacks_total", reason="unavailable")
+
+
+def _server_version(client):
+    # The server's model id arrives in the hello of each connection, so a
+    # restarted or retrained server is a different version from its first answer
+    return ("server", MODEL_SERVER, client.model_id())
+
+
+def _answering_version():
+    """Version of the model a single diagnosis would be answered by right now."""
+    client = _server() if MODEL_SERVER else None
+    if client is not None:
+        try:
+            return _server_version(client)
+        except OSError:
+            _server_unreachable()
+    return _model_version()
+
+
+def _remote_diagnosis(row):
+    """(label, version) from the model server, or None to fall back to in-process inference."""
+    client = _server()
+    if client is None:
+        return None
+    from model_server import Overloaded, ServerError
+
+    try:
+        label = client.predict(row)
+        return label, _server_version(client)
+    except ServerError as e:
+        raise RuntimeError(str(e)) from None
+    except Overloaded:
+        metrics.count("model_server_fallbacks_total", reason="overloaded")
+    except OSError:
+        _server_unreachable()
+    return None
+
+
+def _predict_labels(X):
+    """
+    (labels, version) for the rows of X: the model server for single rows
+    when configured, else here.
+    """
+    if MODEL_SERVER and len(X) == 1:
+        answer = _remote_diagnosis(X[0])
+        if answer is not None:
+            return [answer[0]], answer[1]
+    version = _model_version()
+    loaded = registry.get()
+    if loaded is None:
+        raise ModelUnavailable("AI model not available")
+    return loaded.predict(X, False)[0], version
+
+
+@metrics.timed("ai_diagnosis_seconds")
 def get_ai_diagnosis(input_data):
     """
     input_data format:
     [Age, Gender, Temp, HR, Sys, SpO2, WBC, CRP, Hb]
     """
 
-    if not MODEL_AVAILABLE:
+    if not MODEL_SERVER and registry.get() is None:
         return "AI model not available"
 
     try:
-        column_names = [
-            "Age", "Gender", "Temp", "HR",
-            "Sys", "SpO2", "WBC", "CRP", "Hb"
-        ]
-
-        df_input = pd.DataFrame([input_data], columns=column_names)
-
-        scaled_data = scaler.transform(df_input)
-        prediction_numeric = model.predict(scaled_data)
-        prediction_text = encoder.inverse_transform(prediction_numeric)[0]
-
-        return prediction_text
+        X = _as_feature_matrix(input_data)
+        if prediction_cache.enabled and np.isfinite(X).all():
+            return prediction_cache.predict(X, _answering_version(), _predict_labels)[0]
+        return _predict_labels(X)[0][0]
 
+    except ModelUnavailable as e:
+        return str(e)
     except Exception as e:
         return f"AI prediction error: {str(e)}"
@@ -0,0 +1,89 @@
+# matcher.py - Compiled Multi-Pattern Term Matcher for Free Text
+
+import re
+from collections import namedtuple
+
+Term = namedtuple("Term", ["phrase", "kind", "label", "priority"])
+TermMatch = namedtuple(
+    "TermMatch", ["start", "end", "text", "kind", "label", "priority"]
+)
+
+# Regular plurals: "seizure" also matches "seizures", "chest pain" "chest pains"
+_PLURAL = r"(?:e?s)?"
+# Transcripts often drop or curl the apostrophe: "can't", "cant", "can’t"
+_APOSTROPHE = r"['’]?"
+
+
+def _trie_pattern(node, groups):
+    """
+    Regex for a character trie of phrases. Sharing prefixes means the
+    engine follows one branch per character instead of retrying every
+    phrase at every position. Each phrase ends in an empty capture group;
+    `groups` records which term each group number belongs to.
+    """
+    parts = []
+    for char, child in node.items():
+        if char is None:
+            continue
+        if char == " ":
+            # Word break inside a phrase: plural-tolerant, any whitespace run
+            parts.append(_PLURAL + r"\s+" + _trie_pattern(child, groups))
+        elif char in "'’":
+            parts.append(_APOSTROPHE + _trie_pattern(child, groups))
+        else:
+            parts.append(re.escape(char) + _trie_pattern(child, groups))
+
+    # Ending here is tried last, so the longest phrase wins
+    if None in node:
+        groups.append(node[None])
+        parts.append(_PLURAL + r"\b()")
+
+    if len(parts) == 1:
+        return parts[0]
+    return "(?:" + "|".join(parts) + ")"
+
+
+class TermMatcher:
+    """
+    Finds every vocabulary term in a text in one left-to-right pass.
+
+    All phrases are compiled into one case-insensitive regex shaped like
+    a trie of their characters; the capture group that fired identifies
+    the term without a second lookup. Longer phrases are preferred, so
+    "chest pain" wins over "pain" at the same position. Matching is on
+    whole words only, so "pain" does not fire inside "painkiller"; other
+    word forms ("painful") have to be listed as phrases of their own.
+    """
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        trie = {}
+        for term in self.terms:
+            node = trie
+            for char in " ".join(term.phrase.lower().replace("’", "'").split()):
+                node = node.setdefault(char, {})
+            node.setdefault(None, term)
+
+        groups = []
+        self._pattern = re.compile(r"\b" + _trie_pattern(trie, groups), re.IGNORECASE)
+        self._group_terms = [None] + groups
+
+    def finditer(self, text):
+        group_terms = self._group_terms
+        for m in self._pattern.finditer(text):
+            term = group_terms[m.lastindex]
+            yield TermMatch(m.start(), m.end(), m.group(), term.kind, term.label, term.priority)
+
+    def find_all(self, text, kind=None):
+        """All non-overlapping hits in text order, optionally of one kind."""
+        return [m for m in self.finditer(text) if kind is None or m.kind == kind]
+
+    def first(self, text, kind=None):
+        """Highest-priority hit (earliest on ties), or None."""
+        best = None
+        for m in self.finditer(text):
+            if kind is not None and m.kind != kind:
+                continue
+            if best is None or m.priority > best.priority:
+                best = m
+        return best
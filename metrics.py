@@ -0,0 +1,352 @@
+# metrics.py - Hot-Path Instrumentation (latency histograms, counters, traces)
+#
+# Off unless CLINIC_METRICS=1. When off, a timed() call site costs one
+# boolean check plus a context-variable lookup. Export:
+#   CLINIC_METRICS_FILE=/path/metrics.prom  rewritten at most every few seconds
+#   CLINIC_METRICS_PORT=9464                Prometheus scrape endpoint on localhost
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from contextvars import ContextVar
+
+PREFIX = "clinic_"
+
+# Seconds; Prometheus-style upper bounds (le), +Inf is implied
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+HELP = {
+    "ai_diagnosis_seconds": "AI model inference per get_ai_diagnosis call",
+    "db_write_seconds": "Time the UI thread spends on a database write call site",
+    "db_commit_seconds": "SQLite commit time in the write-behind writer",
+    "db_commit_rows_total": "Rows committed by the write-behind writer",
+    "db_lock_wait_seconds": "Time BEGIN IMMEDIATE waited for SQLite's write lock",
+    "db_lock_timeouts_total": "Transactions that gave up waiting for the write lock",
+    "transcription_seconds": "Decode + VAD + Whisper time per clip",
+    "transcription_audio_seconds_total": "Seconds of audio transcribed",
+    "vitals_flush_seconds": "Vitals history flush (one transaction for all buffered series)",
+    "vitals_readings_written_total": "Raw vitals readings written to the history store",
+    "vitals_query_seconds": "Vitals history range / downsample query time",
+    "history_page_seconds": "One keyset page of prescription history",
+    "analytics_query_seconds": "One dashboard query against the analytics summary tables",
+    "model_server_batch_seconds": "Model server: one micro-batch predict call",
+    "model_server_queue_seconds": "Model server: request arrival to reply sent",
+    "model_server_requests_total": "Model server: requests answered",
+    "model_server_rejected_total": "Model server: requests refused because the queue was full",
+    "model_server_fallbacks_total": "Diagnoses run in-process because the model server was unusable",
+    "app_rerun_seconds": "Streamlit script run time (runs ended by st.stop/st.rerun excluded)",
+    "app_first_render_seconds": "Process start to the end of the first script run (once per process)",
+}
+
+Span = namedtuple("Span", ["name", "labels", "start_ms", "duration_ms", "error"])
+
+_enabled = os.environ.get("CLINIC_METRICS") == "1"
+_trace = ContextVar("clinic_trace", default=None)
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+def enabled():
+    return _enabled
+
+
+def configure(enable=None):
+    """Turn collection on or off at runtime (tests, benchmarks)."""
+    global _enabled
+    if enable is not None:
+        _enabled = bool(enable)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+# ==================================================
+# 📊 METRICS
+# ==================================================
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _histogram(key):
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(key, _Histogram(LATENCY_BUCKETS))
+    return histogram
+
+
+def observe(name, seconds, **labels):
+    """Record one latency sample (seconds)."""
+    if _enabled:
+        _histogram(_key(name, labels)).observe(seconds)
+
+
+def count(name, value=1, **labels):
+    if _enabled:
+        key = _key(name, labels)
+        with _lock:
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def _record(key, start, seconds, error):
+    if _enabled:
+        _histogram(key).observe(seconds)
+        if error:
+            name, labels = key
+            count(name.replace("_seconds", "") + "_errors_total", **dict(labels))
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(key[0], dict(key[1]), start, seconds, error)
+
+
+class timed:
+    """
+    Time a block or a function into the `name` histogram (and the active
+    trace, if any). Works both ways:
+
+        with metrics.timed("db_write_seconds", site="emergency"): ...
+
+        @metrics.timed("ai_diagnosis_seconds")
+        def get_ai_diagnosis(...): ...
+    """
+
+    __slots__ = ("key", "_start")
+
+    def __init__(self, name, **labels):
+        self.key = _key(name, labels)
+        self._start = None
+
+    def __enter__(self):
+        if _enabled or _trace.get() is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            _record(self.key, self._start, time.perf_counter() - self._start, exc_type is not None)
+            self._start = None
+        return False
+
+    def __call__(self, fn):
+        key = self.key
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled and _trace.get() is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            error = True
+            try:
+                result = fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _record(key, start, time.perf_counter() - start, error)
+
+        return wrapper
+
+
+def summary(name):
+    """
+    One histogram across all its label sets: count, sum and bucket-bound
+    p50/p95/p99 (the upper bound of the bucket holding the quantile).
+    """
+    with _lock:
+        histograms = [h for (n, _), h in _histograms.items() if n == name]
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    total = 0.0
+    for h in histograms:
+        with h.lock:
+            counts = [a + b for a, b in zip(counts, h.counts)]
+            total += h.sum
+    n = sum(counts)
+    result = {"count": n, "sum": total}
+    for q in (0.5, 0.95, 0.99):
+        cumulative, bound = 0, 0.0
+        for bound, c in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+            cumulative += c
+            if n and cumulative >= q * n:
+                break
+        result[f"p{round(q * 100)}"] = bound if n else 0.0
+    return result
+
+
+def counter_total(name):
+    with _lock:
+        return sum(v for (n, _), v in _counters.items() if n == name)
+
+
+# ==================================================
+# 🧵 PER-REQUEST TRACES
+# ==================================================
+
+class Trace:
+    """Spans timed in this thread/context since start_trace(), in start order."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, labels, start, seconds, error=False):
+        self.spans.append(Span(
+            name, labels, (start - self.origin) * 1e3, seconds * 1e3, error
+        ))
+
+    def total_ms(self):
+        return (time.perf_counter() - self.origin) * 1e3
+
+
+def start_trace():
+    """Begin collecting spans for the current request (one Streamlit run)."""
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+def stop_trace():
+    _trace.set(None)
+
+
+def current_trace():
+    return _trace.get()
+
+
+# ==================================================
+# 📤 PROMETHEUS EXPORT
+# ==================================================
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _header(lines, name, kind):
+    full = PREFIX + name
+    if name in HELP:
+        lines.append(f"# HELP {full} {HELP[name]}")
+    lines.append(f"# TYPE {full} {kind}")
+
+
+def export_prometheus():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), h in histograms:
+        if name not in seen:
+            _header(lines, name, "histogram")
+            seen.add(name)
+        with h.lock:
+            counts, total, n = list(h.counts), h.sum, h.count
+        cumulative = 0
+        for bound, c in zip(h.buckets + (float("inf"),), counts):
+            cumulative += c
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total!r}")
+        lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {n}")
+
+    for (name, labels), value in counters:
+        if name not in seen:
+            _header(lines, name, "counter")
+            seen.add(name)
+        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value!r}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically replace `path` with the current metrics (node_exporter textfile style)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(export_prometheus())
+    os.replace(tmp, path)
+
+
+_last_export = 0.0
+
+
+def maybe_export(path=None, interval=5.0):
+    """Write the metrics file if CLINIC_METRICS_FILE is set and `interval` has passed."""
+    global _last_export
+    path = path or os.environ.get("CLINIC_METRICS_FILE")
+    if not _enabled or not path:
+        return False
+    now = time.monotonic()
+    if now - _last_export < interval:
+        return False
+    _last_export = now
+    write_prometheus(path)
+    return True
+
+
+_server = None
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread (once per process); returns the server."""
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = export_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
+
+
+if _enabled and os.environ.get("CLINIC_METRICS_PORT"):
+    serve(int(os.environ["CLINIC_METRICS_PORT"]))
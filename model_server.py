@@ -0,0 +1,400 @@
+# model_server.py - Shared Inference Server (micro-batching, backpressure)
+#
+# One process holds the model; every Streamlit worker sends it rows over a
+# Unix socket (or localhost TCP) instead of loading its own copy. Requests
+# that arrive together are scored as one batch: the batcher takes what is
+# queued, waits at most max_wait for more, and stops at max_batch. When the
+# queue is full a request is refused at once with OVERLOADED rather than
+# left to time out.
+#
+# Usage: python model_server.py [--address unix:/tmp/clinic-model.sock | 127.0.0.1:8765]
+#                               [--max-batch 64] [--max-wait-ms 2] [--max-queue 1024]
+#                               [--variant NAME]
+# Clients: set CLINIC_MODEL_SERVER to the same address (see logic.get_ai_diagnosis).
+#
+# Wire format (little-endian, pipelining allowed; answers may come out of order):
+#   hello    a response with request_id 0, sent once on connect; its text is
+#            the served model's id (bundle sha256), which clients cache under
+#   request  Q request_id, 9 x d feature values                    80 bytes
+#   response Q request_id, B status, H length, <length> UTF-8 bytes (label or error)
+
+import argparse
+import itertools
+import os
+import queue
+import select
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+DEFAULT_ADDRESS = "unix:/tmp/clinic-model.sock"
+N_FEATURES = 9
+
+REQUEST = struct.Struct("<Q9d")
+RESPONSE = struct.Struct("<QBH")
+OK, OVERLOADED, ERROR = 0, 1, 2
+
+
+class Overloaded(Exception):
+    """The server's queue is full; the request was not run."""
+
+
+class ServerError(Exception):
+    """The server ran the request and it failed."""
+
+
+def parse_address(address):
+    """'unix:/path', a bare path, or 'host:port' -> (family, sockaddr)."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if "/" in address:
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+# ==================================================
+# 🖥 SERVER
+# ==================================================
+
+class _Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.alive = True
+
+    def send(self, data):
+        if not self.alive:
+            return
+        try:
+            with self.lock:
+                self.sock.sendall(data)
+        except OSError:
+            self.alive = False
+
+
+def _frame(request_id, status, text):
+    body = text.encode("utf-8")[:65535]
+    return RESPONSE.pack(request_id, status, len(body)) + body
+
+
+class ModelServer:
+    """
+    predict_batch(X) -> sequence of labels, for an (n, 9) float64 array.
+    max_batch=1 turns batching off (one predict call per request).
+    model_id names the model behind predict_batch in every client's hello.
+    """
+
+    def __init__(self, address, predict_batch, max_batch=64, max_wait=0.002, max_queue=1024,
+                 model_id=""):
+        self.address = address
+        self.predict_batch = predict_batch
+        self.model_id = model_id
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._listener = None
+        self._connections = set()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.errors = 0
+
+    # ---------------------------
+    # Network side
+    def start(self):
+        family, sockaddr = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(sockaddr):
+            os.remove(sockaddr)   # stale socket from a previous run
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(sockaddr)
+        self._listener.listen(128)
+
+        threading.Thread(target=self._accept_loop, name="model-accept", daemon=True).start()
+        threading.Thread(target=self._batch_loop, name="model-batcher", daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            if sock.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = _Connection(sock)
+            with self._stats_lock:
+                self._connections.add(conn)
+            conn.send(_frame(0, OK, self.model_id))
+            threading.Thread(target=self._read_loop, args=(conn,),
+                             name="model-conn", daemon=True).start()
+
+    def _read_loop(self, conn):
+        reader = conn.sock.makefile("rb")
+        try:
+            while not self._stopping.is_set():
+                data = reader.read(REQUEST.size)
+                if len(data) < REQUEST.size:
+                    return
+                request_id, *row = REQUEST.unpack(data)
+                try:
+                    self._queue.put_nowait((conn, request_id, row, time.perf_counter()))
+                except queue.Full:
+                    with self._stats_lock:
+                        self.rejected += 1
+                    metrics.count("model_server_rejected_total")
+                    conn.send(_frame(request_id, OVERLOADED, "server overloaded"))
+        except OSError:
+            pass
+        finally:
+            conn.alive = False
+            with self._stats_lock:
+                self._connections.discard(conn)
+            reader.close()
+            conn.sock.close()
+
+    # ---------------------------
+    # Batcher
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while not self._stopping.is_set():
+            batch = self._collect()
+            batch = [item for item in batch if item is not None and item[0].alive]
+            if not batch:
+                continue
+
+            X = np.array([item[2] for item in batch], dtype=np.float64)
+            try:
+                with metrics.timed("model_server_batch_seconds"):
+                    labels = self.predict_batch(X)
+                frames = [(item[0], _frame(item[1], OK, str(label)))
+                          for item, label in zip(batch, labels)]
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += len(batch)
+                frames = [(item[0], _frame(item[1], ERROR, str(e)))
+                          for item in batch]
+
+            # One write per connection per batch
+            by_conn = {}
+            for conn, frame in frames:
+                by_conn.setdefault(conn, []).append(frame)
+            for conn, parts in by_conn.items():
+                conn.send(b"".join(parts))
+
+            now = time.perf_counter()
+            for item in batch:
+                metrics.observe("model_server_queue_seconds", now - item[3])
+            metrics.count("model_server_requests_total", len(batch))
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.batches += 1
+
+    # ---------------------------
+    # Shutdown & stats
+    def close(self):
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.close()
+        # Clients see the same EOF as when the process exits
+        with self._stats_lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        try:
+            self._queue.put_nowait(None)   # wake the batcher
+        except queue.Full:
+            pass
+        family, sockaddr = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(sockaddr):
+            os.remove(sockaddr)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "queue_depth": self._queue.qsize(),
+            }
+
+
+# ==================================================
+# 📞 CLIENT
+# ==================================================
+
+class ModelClient:
+    """
+    Blocking client with one connection per calling thread (Streamlit
+    runs each session on its own thread). A broken connection is dropped
+    and reopened on the next call.
+    """
+
+    def __init__(self, address, timeout=2.0):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            family, sockaddr = parse_address(self.address)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(sockaddr)
+            except OSError:
+                sock.close()
+                raise
+            if family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                _, _, length = RESPONSE.unpack(_recv_exact(sock, RESPONSE.size))
+                self._local.model_id = _recv_exact(sock, length).decode("utf-8")
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def model_id(self):
+        """
+        Id of the model behind this thread's connection. A connection the
+        server has closed (restart) is reopened first, so the id is current.
+        """
+        sock = getattr(self._local, "sock", None)
+        # Nothing is owed between calls, so a readable socket is at EOF
+        if sock is not None and select.select([sock], [], [], 0)[0]:
+            self._drop()
+        self._socket()
+        return self._local.model_id
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def predict(self, row):
+        """Label for one 9-value row. Raises Overloaded, ServerError or OSError."""
+        request_id = next(self._ids)
+        try:
+            sock = self._socket()
+            sock.sendall(REQUEST.pack(request_id, *row))
+            reply_id, status, length = RESPONSE.unpack(_recv_exact(sock, RESPONSE.size))
+            text = _recv_exact(sock, length).decode("utf-8") if length else ""
+        except OSError:
+            self._drop()
+            raise
+        if reply_id != request_id:
+            self._drop()
+            raise ConnectionError(f"reply {reply_id} for request {request_id}")
+        if status == OVERLOADED:
+            raise Overloaded(text)
+        if status == ERROR:
+            raise ServerError(text)
+        return text
+
+    def close(self):
+        self._drop()
+
+
+# ==================================================
+# 🚀 ENTRY POINT
+# ==================================================
+
+def _local_predict_batch():
+    """(predict_batch, model id) for the model this process loads."""
+    import logic
+    loaded = logic.registry.get()
+    if loaded is None:
+        raise SystemExit(f"❌ No AI model to serve ({logic.registry.error or 'artifacts not found'})")
+
+    def predict_batch(X):
+        return loaded.predict(X, False)[0]
+
+    # Legacy pickles have no bundle hash; their path, size and mtime stand in
+    model_id = logic.registry.sha256 or repr(logic._model_version()[1:])
+    return predict_batch, model_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the AI model to every app worker")
+    parser.add_argument("--address", default=os.environ.get("CLINIC_MODEL_SERVER", DEFAULT_ADDRESS))
+    parser.add_argument("--max-batch", type=int, default=64, help="1 disables batching")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="how long a batch waits for more requests")
+    parser.add_argument("--max-queue", type=int, default=1024,
+                        help="queued requests before new ones are refused")
+    parser.add_argument("--variant", default=None,
+                        help="serve a compressed model variant (default: CLINIC_MODEL_VARIANT)")
+    args = parser.parse_args()
+
+    if args.variant:
+        import logic
+        logic.registry.select(args.variant)
+
+    predict_batch, model_id = _local_predict_batch()
+    server = ModelServer(args.address, predict_batch, args.max_batch,
+                         args.max_wait_ms / 1e3, args.max_queue, model_id).start()
+    print(f"✅ Model server listening on {args.address} "
+          f"(batch ≤ {args.max_batch}, wait ≤ {args.max_wait_ms:g} ms, queue {args.max_queue})",
+          flush=True)
+    # systemd / kill send SIGTERM; shut down the same way as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print(f"Model server stopped: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
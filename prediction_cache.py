@@ -0,0 +1,142 @@
+# prediction_cache.py - Memoized AI Diagnoses (quantized inputs, LRU + TTL)
+#
+# Rows are snapped to a per-feature resolution (0.1 °C, 1 bpm, ...) and the
+# snapped row is both the cache key and what the model scores, so a cached
+# answer is exactly what inference would have returned for that input.
+# Entries belong to one model version; a different version empties the
+# cache before it is used, and an answer from any other model than the one
+# the lookup was made for (e.g. a fallback) is returned but never stored.
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Per-entry bookkeeping beyond the key bytes: OrderedDict node, key and
+# value objects. Measured on CPython 3.11 with sys.getsizeof; an estimate.
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    """
+    Bounded LRU of quantized row -> label. max_entries=0 disables it;
+    ttl (seconds) expires entries on read.
+    """
+
+    def __init__(self, resolution, max_entries=10_000, ttl=None):
+        self.resolution = np.asarray(resolution, dtype=np.float64)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key bytes -> (label, expires_at)
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def configure(self, max_entries=None, ttl=False):
+        """Resize (0 disables) or change the TTL (None = no expiry)."""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+                while len(self._entries) > max(max_entries, 0):
+                    self._entries.popitem(last=False)
+            if ttl is not False:
+                self.ttl = ttl
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def quantize(self, X):
+        """Integer bucket of every value, (n, features) int64."""
+        return np.rint(X / self.resolution).astype(np.int64)
+
+    def _check_version(self, version):
+        # Caller holds the lock
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def predict(self, X, version, compute):
+        """
+        Labels for the rows of X. compute(X_snapped) scores only the
+        distinct snapped rows that are not cached, in one call, and
+        returns (labels, version of the model that produced them).
+        """
+        Q = self.quantize(X)
+        if len(Q) == 1:
+            unique, inverse = Q, np.zeros(1, dtype=np.intp)
+        else:
+            # Duplicates inside the batch are scored once as well
+            unique, inverse = np.unique(Q, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+
+        keys = [row.tobytes() for row in unique]
+        labels = np.empty(len(unique), dtype=object)
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entries = self._entries
+            for i, key in enumerate(keys):
+                entry = entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    entries.move_to_end(key)
+                    labels[i] = entry[0]
+                else:
+                    if entry is not None:
+                        del entries[key]
+                        self.expirations += 1
+                    missing.append(i)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            computed, answered_by = compute(unique[missing] * self.resolution)
+            expires = now + self.ttl if self.ttl else None
+            with self._lock:
+                # A concurrent reload may have moved the version on, or another
+                # model may have answered; then these labels are not kept
+                store = self.version == version == answered_by
+                for i, label in zip(missing, computed):
+                    label = str(label)
+                    labels[i] = label
+                    if store:
+                        self._entries[keys[i]] = (label, expires)
+                        self._entries.move_to_end(keys[i])
+                overflow = len(self._entries) - self.max_entries
+                for _ in range(max(overflow, 0)):
+                    self._entries.popitem(last=False)
+                self.evictions += max(overflow, 0)
+
+        return labels[inverse]
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+            lookups = self.hits + self.misses
+            key_bytes = len(self.resolution) * 8
+            return {
+                "enabled": self.enabled,
+                "entries": size,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "approx_bytes": size * (key_bytes + ENTRY_OVERHEAD_BYTES),
+                "model_version": self.version,
+            }
@@ -0,0 +1,259 @@
+# search.py - Incremental Patient Search (FTS5 trigram index + LRU)
+
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import database
+
+CANDIDATE_LIMIT = 200
+DEFAULT_TIMEOUT_MS = 50
+# Fuzzy matching splits the query into up to this many pieces and asks
+# for names containing any two of them intact; a typo or transposition
+# damages at most two adjacent pieces
+FUZZY_PIECES = 4
+
+_indexed = set()
+_index_lock = threading.Lock()
+
+# Trigram FTS5 gives case-insensitive substring and fuzzy (shared-trigram)
+# matching; the NOCASE index serves 1-2 character prefixes, which are too
+# short for trigrams. Triggers keep the index in step with patients.
+INDEX_SCHEMA = (
+    "CREATE INDEX IF NOT EXISTS idx_patients_name_nocase ON patients (name COLLATE NOCASE)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+        name, content='patients', content_rowid='rowid', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+        INSERT INTO patients_fts (rowid, name) VALUES (new.rowid, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+        INSERT INTO patients_fts (patients_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF name ON patients BEGIN
+        INSERT INTO patients_fts (patients_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+        INSERT INTO patients_fts (rowid, name) VALUES (new.rowid, new.name);
+    END
+    """,
+)
+
+
+def ensure_index(db_path=None):
+    """Create the search index (once per path), backfilling existing patients."""
+    db_path = db_path or database.DB_PATH
+    if db_path in _indexed:
+        return
+
+    with _index_lock:
+        if db_path in _indexed:
+            return
+        with database.transaction(db_path) as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'patients_fts'"
+            ).fetchone()
+            for statement in INDEX_SCHEMA:
+                conn.execute(statement)
+            if not exists:
+                conn.execute("INSERT INTO patients_fts (patients_fts) VALUES ('rebuild')")
+        _indexed.add(db_path)
+
+
+# ==================================================
+# 🔎 QUERY
+# ==================================================
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _score(query, name):
+    """Rank: exact > prefix > word prefix > substring, then trigram overlap."""
+    name = normalize(name)
+    if name == query:
+        bonus = 4.0
+    elif name.startswith(query):
+        bonus = 3.0
+    elif any(word.startswith(query) for word in name.split(" ")):
+        bonus = 2.0
+    elif query in name:
+        bonus = 1.0
+    else:
+        bonus = 0.0
+
+    a, b = _trigrams(query), _trigrams(name)
+    overlap = 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+    return bonus + overlap
+
+
+class _Deadline:
+    def __init__(self, timeout_ms):
+        self.expires = time.perf_counter() + timeout_ms / 1000
+        self.hit = False
+
+    def __call__(self):
+        # Returning non-zero makes SQLite abort the running statement
+        if time.perf_counter() > self.expires:
+            self.hit = True
+            return 1
+        return 0
+
+
+def _fuzzy_expression(query):
+    """FTS5 expression matching names that share most of the query."""
+    count = min(FUZZY_PIECES, len(query) // 3)
+    if count < 3:
+        # Too short to split usefully: any shared trigram
+        return " OR ".join(_fts_phrase(t) for t in sorted(_trigrams(query)))
+
+    bounds = [round(i * len(query) / count) for i in range(count + 1)]
+    pieces = [_fts_phrase(query[bounds[i]:bounds[i + 1]]) for i in range(count)]
+    return " OR ".join(
+        f"({pieces[i]} AND {pieces[j]})"
+        for i in range(count) for j in range(i + 1, count)
+    )
+
+
+_SELECT_FTS = (
+    "SELECT p.rowid, p.id, p.name, p.age, p.gender, p.dob "
+    "FROM patients_fts JOIN patients p ON p.rowid = patients_fts.rowid "
+    "WHERE patients_fts MATCH ? "
+)
+
+
+def _candidates(conn, query, limit, rows):
+    """
+    Cheapest-first candidate gathering, stopping as soon as there are
+    enough rows of a rank no later stage could beat: name prefixes, then
+    substrings anywhere in the name, then fuzzy matches ranked by bm25.
+    Rows are appended to `rows` as they arrive, so when the deadline aborts
+    a later stage the caller still has what the earlier ones found.
+    """
+    # LIKE is case-insensitive and uses the NOCASE index for prefixes
+    pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    rows += conn.execute(
+        "SELECT rowid, id, name, age, gender, dob FROM patients "
+        "WHERE name LIKE ? ESCAPE '\\' ORDER BY name COLLATE NOCASE LIMIT ?",
+        (pattern, CANDIDATE_LIMIT),
+    ).fetchall()
+    if len(rows) >= limit or len(query) < 3:
+        return
+
+    seen = {row[0] for row in rows}
+    for row in conn.execute(_SELECT_FTS + "LIMIT ?", (_fts_phrase(query), CANDIDATE_LIMIT)):
+        if row[0] not in seen:
+            rows.append(row)
+    if len(rows) >= limit:
+        return
+
+    fuzzy = _fuzzy_expression(query)
+    seen = {row[0] for row in rows}
+    for row in conn.execute(_SELECT_FTS + "ORDER BY rank LIMIT ?", (fuzzy, CANDIDATE_LIMIT)):
+        if row[0] not in seen:
+            rows.append(row)
+
+
+class PatientSearch:
+    """
+    Ranked, case-insensitive prefix/substring/fuzzy patient lookup with
+    an in-process LRU of recent results. Cached entries are tagged with
+    the highest patients rowid, so a new registration invalidates them.
+    """
+
+    def __init__(self, db_path=None, cache_size=512, timeout_ms=DEFAULT_TIMEOUT_MS):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.timeout_ms = timeout_ms
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+
+    def search(self, text, limit=5):
+        """Return up to `limit` (Patient, score) pairs, best first."""
+        query = normalize(text)
+        if not query:
+            return []
+
+        ensure_index(self.db_path)
+        with database.connection(self.db_path) as conn:
+            generation = conn.execute("SELECT max(rowid) FROM patients").fetchone()[0]
+            key = (query, limit)
+
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == generation:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached[1]
+                self.misses += 1
+
+            deadline = _Deadline(self.timeout_ms)
+            conn.set_progress_handler(deadline, 1000)
+            rows = []
+            try:
+                _candidates(conn, query, limit, rows)
+            except sqlite3.OperationalError:
+                # Out of time: rank whatever the finished stages gathered
+                if not deadline.hit:
+                    raise
+            finally:
+                conn.set_progress_handler(None, 0)
+
+        ranked = sorted(
+            ((database.Patient(*row[1:]), _score(query, row[2])) for row in rows),
+            key=lambda pair: (-pair[1], pair[0].name),
+        )[:limit]
+
+        # A timed-out (partial) answer is returned but never cached
+        if deadline.hit:
+            self.timeouts += 1
+            return ranked
+
+        with self._lock:
+            self._cache[key] = (generation, ranked)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return ranked
+
+    def stats(self):
+        return {
+            "cache_entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "timeouts": self.timeouts,
+        }
+
+
+_searchers = {}
+_searchers_lock = threading.Lock()
+
+
+def get_search(db_path=None):
+    db_path = db_path or database.DB_PATH
+    with _searchers_lock:
+        if db_path not in _searchers:
+            _searchers[db_path] = PatientSearch(db_path)
+        return _searchers[db_path]
+
+
+def search_patients(text, limit=5, db_path=None):
+    return get_search(db_path).search(text, limit)
@@ -0,0 +1,262 @@
+# startup.py - Cold-Start Profile (per-module import time, time to first render)
+#
+# Usage: python startup.py [--repeat 5] [--top 15]
+#                          [--budget benchmarks/startup_budget.json] [--save-budget]
+# Each sample runs in a fresh interpreter, like a rebooted kiosk or a newly
+# spawned Streamlit worker. Import times come from `python -X importtime`
+# over APP.py's own top-level imports; time to first render is process
+# spawn to the end of APP.py's first script run (under AppTest, with a
+# scratch database). Exits 1 when the budget is exceeded or a deferred
+# dependency (pandas, joblib, whisper, ...) is loaded by the first render.
+
+import argparse
+import ast
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BASE_DIR, "APP.py")
+DEFAULT_BUDGET = os.path.join(BASE_DIR, "benchmarks", "startup_budget.json")
+
+# Loaded only by the feature that needs them; none may appear at first render
+DEFERRED_MODULES = ("pandas", "pyarrow", "joblib", "sklearn", "torch", "whisper", "scipy")
+
+# Allowance over the measured numbers when --save-budget writes a budget
+BUDGET_HEADROOM = 0.5
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+# ==================================================
+# ⏱ IN-PROCESS (used by APP.py)
+# ==================================================
+
+def process_uptime():
+    """Seconds since this process started, or None where /proc is missing."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks after boot; comm
+            # (field 2) may contain spaces, so split after its ')'
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+_first_render = None
+_first_render_lock = threading.Lock()
+
+
+def mark_first_render():
+    """
+    Record process start -> end of the first script run, once per
+    process. Returns the seconds on the first call, None afterwards.
+    """
+    global _first_render
+    if _first_render is not None:
+        return None
+    with _first_render_lock:
+        if _first_render is not None:
+            return None
+        _first_render = process_uptime() or 0.0
+    return _first_render
+
+
+def first_render_seconds():
+    return _first_render
+
+
+# ==================================================
+# 🔬 PROFILING (fresh interpreters)
+# ==================================================
+
+def app_imports(app_path=APP_PATH):
+    """Top-level modules APP.py imports at module scope, in source order."""
+    with open(app_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def import_profile(modules):
+    """
+    Import `modules` in a fresh interpreter under -X importtime.
+    Returns ({module: cumulative seconds} for the requested modules the
+    statement actually loaded (os & co. are already in at startup),
+    [(name, self seconds, cumulative seconds)] for everything imported).
+    """
+    code = "import " + ", ".join(modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {modules} failed:\n{result.stderr[-2000:]}")
+
+    everything = []
+    top = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = match.groups()
+        everything.append((name, int(own) / 1e6, int(cumulative) / 1e6))
+        # Unindented lines are imports made by our statement, not their children
+        if not indent and name in modules:
+            top[name] = int(cumulative) / 1e6
+    return top, everything
+
+
+_RENDER_CHILD = """
+import json, os, sys
+sys.path.insert(0, {base!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+print(json.dumps({{
+    "exceptions": [e.value for e in at.exception],
+    "loaded": sorted(m for m in {deferred!r} if m in sys.modules),
+}}), flush=True)
+os._exit(0)
+"""
+
+
+def first_render(app_path=APP_PATH):
+    """(seconds from spawn to the first run finishing, deferred modules it loaded)."""
+    workdir = tempfile.mkdtemp(prefix="clinic-startup-")
+    try:
+        background = os.path.join(os.path.dirname(app_path), "background.jpeg")
+        if os.path.exists(background):
+            shutil.copy(background, workdir)
+        env = dict(os.environ, CLINIC_DB_PATH=os.path.join(workdir, "clinic.db"))
+        code = _RENDER_CHILD.format(base=os.path.dirname(app_path), app=app_path,
+                                    deferred=DEFERRED_MODULES)
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-c", code], cwd=workdir, env=env,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        report = None
+        for line in process.stdout:
+            if line.startswith("{"):
+                report = json.loads(line)
+                break
+        seconds = time.perf_counter() - start
+        _, stderr = process.communicate()
+        if report is None:
+            raise RuntimeError(f"APP.py did not render:\n{stderr[-2000:]}")
+        if report["exceptions"]:
+            raise RuntimeError(f"APP.py raised on first render: {report['exceptions']}")
+        return seconds, report["loaded"]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def profile(repeat=5, app_path=APP_PATH):
+    """Median of `repeat` cold samples of everything the budget covers."""
+    modules = app_imports(app_path)
+    imports = {}
+    renders, loaded, everything = [], set(), []
+    for _ in range(repeat):
+        top, everything = import_profile(modules)
+        for name, seconds in top.items():
+            imports.setdefault(name, []).append(seconds)
+        seconds, deferred = first_render(app_path)
+        renders.append(seconds)
+        loaded.update(deferred)
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2] if values else 0.0
+
+    return {
+        "first_render_ms": median(renders) * 1e3,
+        "import_ms": {name: median(v) * 1e3 for name, v in imports.items()},
+        "deferred_loaded": sorted(loaded),
+        "slowest": sorted(everything, key=lambda item: item[2], reverse=True),
+    }
+
+
+# ==================================================
+# 📏 BUDGET
+# ==================================================
+
+def make_budget(report, headroom=BUDGET_HEADROOM):
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "first_render_ms": round(report["first_render_ms"] * (1 + headroom), 1),
+        # Imports that cost under 5 ms get a flat 5 ms allowance; noise dominates them
+        "import_ms": {name: round(max(ms * (1 + headroom), 5.0), 1)
+                      for name, ms in report["import_ms"].items()},
+        "deferred_modules": list(DEFERRED_MODULES),
+    }
+
+
+def check_budget(report, budget):
+    """Human-readable violations; empty when within budget."""
+    problems = []
+    if report["first_render_ms"] > budget["first_render_ms"]:
+        problems.append(f"first render {report['first_render_ms']:.0f} ms "
+                        f"> budget {budget['first_render_ms']:.0f} ms")
+    for name, ms in report["import_ms"].items():
+        allowed = budget["import_ms"].get(name)
+        if allowed is None:
+            problems.append(f"import {name} ({ms:.1f} ms) has no budget; re-save the budget")
+        elif ms > allowed:
+            problems.append(f"import {name} {ms:.1f} ms > budget {allowed:.1f} ms")
+    for name in report["deferred_loaded"]:
+        if name in budget.get("deferred_modules", DEFERRED_MODULES):
+            problems.append(f"{name} is loaded by the first render; it should be deferred")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile APP.py cold start")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--budget", default=DEFAULT_BUDGET)
+    parser.add_argument("--save-budget", action="store_true",
+                        help=f"write this run (+{BUDGET_HEADROOM:.0%}) as the budget")
+    args = parser.parse_args()
+
+    report = profile(args.repeat)
+    print(f"{'APP.py import':<36} {'ms':>8}")
+    for name, ms in sorted(report["import_ms"].items(), key=lambda item: -item[1]):
+        print(f"{name:<36} {ms:8.1f}")
+    print(f"\n{'slowest modules (cumulative)':<36} {'ms':>8} {'self ms':>8}")
+    for name, own, cumulative in report["slowest"][:args.top]:
+        print(f"{name:<36} {cumulative * 1e3:8.1f} {own * 1e3:8.1f}")
+    print(f"\nTime to first render: {report['first_render_ms']:.0f} ms "
+          f"(median of {args.repeat}, process spawn included)")
+    print(f"Deferred modules loaded at first render: {', '.join(report['deferred_loaded']) or 'none'}")
+
+    if args.save_budget:
+        with open(args.budget, "w") as f:
+            json.dump(make_budget(report), f, indent=2)
+        print(f"\nbudget saved to {args.budget}")
+        return 0
+    if not os.path.exists(args.budget):
+        print(f"\nno budget at {args.budget}; run with --save-budget to create one")
+        return 0
+
+    with open(args.budget) as f:
+        problems = check_budget(report, json.load(f))
+    if problems:
+        print(f"\n❌ startup budget exceeded:\n  " + "\n  ".join(problems))
+        return 1
+    print("\n✅ within startup budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
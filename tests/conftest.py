@@ -0,0 +1,26 @@
+# conftest.py - Make the flat top-level modules importable from tests/
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def fit_tiny_model(seed=0, n_estimators=5, max_depth=4):
+    """A small forest over the app's feature columns: (model, scaler, encoder, X)."""
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(400, 9)) * [15, 0.5, 1, 20, 20, 3, 3, 20, 2] + \
+        [45, 0.5, 37, 80, 120, 96, 8, 10, 13]
+    names = np.where(X[:, 2] > 37.5, "Viral Fever", np.where(X[:, 5] < 95, "Pneumonia", "Healthy"))
+    encoder = LabelEncoder().fit(names)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                   random_state=seed).fit(scaler.transform(X),
+                                                          encoder.transform(names))
+    return model, scaler, encoder, X
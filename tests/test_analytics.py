@@ -0,0 +1,83 @@
+# test_analytics.py - Trigger-maintained aggregates agree with a full rebuild
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import analytics
+import database
+import writer
+
+START = datetime(2026, 3, 1, 8, 30)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "clinic.db")
+    database.init_db(path)
+    analytics.ensure_analytics(path)
+    yield path
+    writer.close_all()
+    database.close_all()
+
+
+def snapshot(db_path):
+    return (
+        analytics.bin_usage(db_path=db_path),
+        analytics.top_medicines(db_path=db_path),
+        analytics.top_medicines(symptom="Fever", limit=1, db_path=db_path),
+        analytics.emergencies_per_hour(db_path=db_path),
+        analytics.dispensed_per_day(db_path=db_path),
+    )
+
+
+def assert_matches_rebuild(db_path):
+    maintained = snapshot(db_path)
+    analytics.rebuild(db_path)
+    assert snapshot(db_path) == maintained
+    return maintained
+
+
+def test_aggregates_match_rebuild(db_path):
+    patient = database.add_patient("Asha", "01-01-1990", 35, "F", db_path=db_path)
+    w = writer.get_writer(db_path)
+    medicines = [("Fever", "High", "Paracetamol", 1), ("Fever", "Low", "Ibuprofen", 2),
+                 ("Cough", "Dry", "Dextromethorphan", 3)]
+    futures = []
+    for i in range(30):
+        symptom, sub_symptom, medicine, bin = medicines[i % len(medicines)]
+        row = database.new_prescription(patient.id, symptom, sub_symptom, medicine, "1 tab",
+                                        bin, when=START + timedelta(hours=7 * i))
+        futures.append(w.submit(row))
+    for i in range(6):
+        database.add_emergency(patient.id, ["Chest Pain", "Fall"][i % 2],
+                               when=START + timedelta(minutes=40 * i), db_path=db_path)
+    for future in futures:
+        future.result(timeout=10)
+
+    written = assert_matches_rebuild(db_path)
+    assert sum(row.units for row in written[0]) == 30
+    assert sum(row.emergencies for row in written[3]) == 6
+
+    # An edit moves a row between bins, medicines and days; deletes take rows out
+    with database.transaction(db_path) as conn:
+        conn.execute(
+            "UPDATE prescriptions SET medicine = 'Aspirin', bin = 4,"
+            " created_at = '2026-04-01 12:00:00' WHERE id = ?",
+            (futures[0].result().id,),
+        )
+        conn.execute("UPDATE prescriptions SET sub_symptom = 'Stroke'"
+                     " WHERE symptom = 'Emergency' AND sub_symptom = 'Fall'")
+        conn.execute("DELETE FROM prescriptions WHERE medicine = 'Ibuprofen'")
+    edited = assert_matches_rebuild(db_path)
+    assert edited != written
+    assert sum(row.units for row in edited[0]) == 20
+
+    # A rolled-back transaction leaves the aggregates as they were
+    with pytest.raises(RuntimeError):
+        with database.transaction(db_path) as conn:
+            conn.execute("DELETE FROM prescriptions")
+            database.insert_prescription(
+                conn, database.new_emergency(patient.id, "Fall", START))
+            raise RuntimeError("abort")
+    assert assert_matches_rebuild(db_path) == edited
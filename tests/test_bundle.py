@@ -0,0 +1,87 @@
+# test_bundle.py - Bundles refuse to load unless whole, current and as hashed
+
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+import logic
+import train_brain
+from bundle import BUNDLE_FILE, BundleError, build_bundle, load_bundle, save_bundle
+from conftest import fit_tiny_model
+
+
+@pytest.fixture(scope="module")
+def arrays():
+    model, scaler, encoder, _ = fit_tiny_model()
+    return build_bundle(model, scaler, encoder, train_brain.FEATURE_COLUMNS)
+
+
+@pytest.fixture
+def path(tmp_path, arrays):
+    path = str(tmp_path / BUNDLE_FILE)
+    save_bundle(path, arrays)
+    return path
+
+
+def flip_last_byte(path, member):
+    """Corrupt one byte of a stored member in place, as bit rot would."""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(member + ".npy")
+    with open(path, "r+b") as f:
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+        offset = info.header_offset + 30 + int(name_len) + int(extra_len) + info.compress_size - 1
+        f.seek(offset)
+        byte = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([byte ^ 0xFF]))
+
+
+def test_round_trip(path, arrays):
+    for mmap in (True, False):
+        bundle = load_bundle(path, mmap=mmap)
+        assert bundle.feature_columns == train_brain.FEATURE_COLUMNS
+        assert bundle.schema_version == int(arrays["schema_version"])
+        assert np.array_equal(bundle.forest.threshold, arrays["threshold"])
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_corrupt_member_is_refused(path, mmap):
+    flip_last_byte(path, "threshold")
+    with pytest.raises(BundleError):
+        load_bundle(path, mmap=mmap)
+
+
+def test_tampered_hash_is_refused(path, arrays):
+    np.savez(path, sha256=np.asarray("0" * 64), **arrays)
+    with pytest.raises(BundleError, match="content hash mismatch"):
+        load_bundle(path)
+
+
+def test_missing_member_is_refused(path, arrays):
+    partial = {name: a for name, a in arrays.items() if name != "scaler_mean"}
+    save_bundle(path, partial)
+    with pytest.raises(BundleError, match="missing scaler_mean"):
+        load_bundle(path)
+
+
+def test_unknown_schema_version_is_refused(path, arrays):
+    save_bundle(path, dict(arrays, schema_version=np.int64(99)))
+    with pytest.raises(BundleError, match="schema version 99"):
+        load_bundle(path)
+
+
+def test_registry_reports_a_bad_bundle(path):
+    flip_last_byte(path, "value")
+    registry = logic.ModelRegistry(os.path.dirname(path))
+    assert registry.get() is None
+    assert registry.state() == "error"
+
+
+def test_missing_variant_does_not_fall_back(path):
+    registry = logic.ModelRegistry(os.path.dirname(path), variant="tiny")
+    assert registry.get() is None
+    assert "model variant 'tiny' not found" in registry.error
+    assert registry.source is None
@@ -0,0 +1,97 @@
+# test_database.py - Connection pool reuse and bounds, failed commits, migrations
+
+import sqlite3
+import threading
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "clinic.db")
+    database.init_db(path)
+    yield path
+    database.close_all()
+
+
+def borrow_on_new_thread(db_path):
+    seen = []
+
+    def run():
+        with database.connection(db_path) as conn:
+            seen.append(conn)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return seen[0]
+
+
+def test_new_threads_reuse_pooled_connections(db_path):
+    # Streamlit reruns each start on a fresh thread
+    first = borrow_on_new_thread(db_path)
+    for _ in range(5):
+        assert borrow_on_new_thread(db_path) is first
+    assert database.get_pool(db_path).stats()["open"] == 1
+
+
+def test_pool_is_bounded(db_path):
+    pool = database.ConnectionPool(db_path, size=2, timeout=0.1)
+    a, b = pool.acquire(), pool.acquire()
+    assert a is not b
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    pool.release(a)
+    assert pool.acquire() is a
+    pool.close()
+
+
+def test_released_connection_has_no_open_transaction(db_path):
+    with database.connection(db_path) as conn:
+        conn.execute("BEGIN")
+    with database.connection(db_path) as again:
+        assert again is conn
+        assert not again.in_transaction
+
+
+def test_failed_commit_is_rolled_back(db_path):
+    # A deferred foreign key is checked at COMMIT, so COMMIT itself raises
+    with database.connection(db_path) as conn:
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE child (parent_id INTEGER"
+                     " REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED)")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with database.transaction(db_path) as conn:
+            conn.execute("INSERT INTO child VALUES (1)")
+    assert not conn.in_transaction
+
+    with database.transaction(db_path) as conn:
+        conn.execute("INSERT INTO parent VALUES (1)")
+        conn.execute("INSERT INTO child VALUES (1)")
+    with database.connection(db_path) as conn:
+        assert conn.execute("SELECT count(*) FROM child").fetchone()[0] == 1
+
+
+def test_migration_drops_redundant_patient_index(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE prescriptions (id TEXT PRIMARY KEY, patient_id TEXT, symptom TEXT,"
+                 " sub_symptom TEXT, medicine TEXT, dosage TEXT, bin INTEGER)")
+    conn.execute("CREATE INDEX idx_prescriptions_patient_id ON prescriptions (patient_id)")
+    conn.commit()
+    conn.close()
+
+    database.init_db(path)
+    conn = database.open_connection(path)
+    try:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM prescriptions WHERE patient_id = ?", ("p",)))
+    finally:
+        conn.close()
+    assert "idx_prescriptions_patient_id" not in indexes
+    assert "idx_prescriptions_patient_created" in plan
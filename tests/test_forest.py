@@ -0,0 +1,115 @@
+# test_forest.py - Compiled evaluator parity with sklearn
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier  # noqa: E402
+from sklearn.preprocessing import StandardScaler  # noqa: E402
+from sklearn.tree import DecisionTreeClassifier  # noqa: E402
+
+from forest import CompiledForest, export_boosted, export_forest  # noqa: E402
+
+
+def vitals(n, seed):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(18, 91, n),            # Age
+        rng.integers(0, 2, n),              # Gender
+        rng.normal(37.2, 1.1, n).round(1),  # Temp
+        rng.integers(50, 150, n),           # HR
+        rng.integers(70, 160, n),           # Sys
+        rng.integers(80, 100, n),           # SpO2
+        rng.normal(8.5, 4.0, n).round(1),   # WBC
+        rng.exponential(25.0, n).round(1),  # CRP
+        rng.normal(14.0, 1.5, n).round(1),  # Hb
+    ]).astype(np.float64)
+
+
+def labels(X):
+    return (X[:, 2] > 38).astype(int) + 2 * (X[:, 5] < 90) + (X[:, 7] > 40)
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    X = vitals(3000, seed=1)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=30, random_state=42)
+    model.fit(scaler.transform(X), labels(X))
+    return model, scaler
+
+
+def sklearn_proba(model, scaler, X):
+    # Same arithmetic as scaler.transform, without the feature-name warning
+    return model.predict_proba((X - scaler.mean_) / scaler.scale_)
+
+
+def with_edges(compiled, X):
+    """X plus rows sitting on every folded threshold and its float neighbours."""
+    split = ~compiled.is_leaf
+    edges, feats = compiled.threshold[split], compiled.feature[split]
+    probe = X[np.arange(len(edges)) % len(X)]
+    rows = [X]
+    for shift in (-np.inf, 0, np.inf):
+        edge_rows = probe.copy()
+        edge_rows[np.arange(len(edges)), feats] = np.nextafter(edges, shift)
+        rows.append(edge_rows)
+    return np.vstack(rows)
+
+
+def test_forest_is_bit_identical_to_sklearn(fitted):
+    model, scaler = fitted
+    compiled = CompiledForest(**export_forest(model, scaler))
+    X = with_edges(compiled, vitals(5000, seed=2))
+
+    assert np.array_equal(compiled.predict_proba(X), sklearn_proba(model, scaler, X))
+    assert np.array_equal(compiled.predict(X), model.predict((X - scaler.mean_) / scaler.scale_))
+
+
+@pytest.mark.parametrize("rows", [1, 7, 1024, 1025, 5000])
+def test_block_boundaries_do_not_change_results(fitted, rows):
+    model, scaler = fitted
+    compiled = CompiledForest(**export_forest(model, scaler))
+    X = vitals(rows, seed=3)
+    expected = sklearn_proba(model, scaler, X)
+
+    assert np.array_equal(compiled.predict_proba(X), expected)
+    compiled.block_rows = 3
+    assert np.array_equal(compiled.predict_proba(X), expected)
+
+
+def test_apply_matches_sklearn_leaves(fitted):
+    model, scaler = fitted
+    compiled = CompiledForest(**export_forest(model, scaler))
+    X = vitals(500, seed=4)
+    scaled = ((X - scaler.mean_) / scaler.scale_).astype(np.float32)
+
+    for tree, (estimator, leaves) in enumerate(zip(model.estimators_, compiled.apply(X))):
+        expected = estimator.tree_.apply(scaled)
+        # Same leaf, renumbered breadth-first: compare what the leaves predict
+        assert np.array_equal(compiled.value[leaves], estimator.tree_.value[expected, 0, :]
+                              / estimator.tree_.value[expected, 0, :].sum(axis=1, keepdims=True))
+
+
+def test_single_tree():
+    X = vitals(2000, seed=5)
+    scaler = StandardScaler().fit(X)
+    model = DecisionTreeClassifier(random_state=0).fit(scaler.transform(X), labels(X))
+    compiled = CompiledForest(**export_forest(model, scaler))
+    X = with_edges(compiled, vitals(2000, seed=6))
+
+    assert np.array_equal(compiled.predict_proba(X), sklearn_proba(model, scaler, X))
+
+
+def test_boosted_matches_sklearn():
+    X = vitals(2000, seed=7)
+    scaler = StandardScaler().fit(X)
+    model = GradientBoostingClassifier(n_estimators=10, max_depth=3, random_state=0)
+    model.fit(scaler.transform(X), labels(X))
+    compiled = CompiledForest(**export_boosted(model, scaler))
+    X = vitals(3000, seed=8)
+
+    np.testing.assert_allclose(compiled.predict_proba(X), sklearn_proba(model, scaler, X),
+                               rtol=1e-9, atol=1e-12)
+    assert np.array_equal(compiled.predict(X), model.predict((X - scaler.mean_) / scaler.scale_))
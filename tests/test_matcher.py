@@ -0,0 +1,69 @@
+# test_matcher.py - Emergency and spoken-symptom matching rules
+
+import pytest
+
+from logic import detect_emergency, detect_speech_symptom, match_clinical_terms
+from matcher import Term, TermMatcher
+
+
+@pytest.mark.parametrize("text, keyword", [
+    ("he has chest pain", "chest pain"),
+    ("CHEST PAIN since morning", "chest pain"),
+    ("chest   pain", "chest pain"),
+    ("she is having seizures", "seizure"),
+    ("sharp chest pains", "chest pain"),
+    ("pain in my chest", "chest pain"),
+    ("shortness of breath", "breathing difficulty"),
+    ("I can't breathe", "breathing difficulty"),
+    ("I can’t breathe", "breathing difficulty"),
+    ("cant breathe", "breathing difficulty"),
+    ("he passed out", "unconscious"),
+    ("he is having a fit", "seizure"),
+    ("convulsions", "seizure"),
+])
+def test_emergency_detected(text, keyword):
+    assert detect_emergency(text) == (True, keyword)
+
+
+@pytest.mark.parametrize("text", [
+    "the shoe is fitting fine",
+    "a strokeless swim",
+    "the unconsciously placed cup",
+    "",
+])
+def test_everyday_words_are_not_emergencies(text):
+    assert detect_emergency(text) == (False, None)
+
+
+@pytest.mark.parametrize("text, symptom", [
+    ("painful knee", "Pain"),
+    ("my back is aching", "Pain"),
+    ("bad coughing at night", "Cough"),
+    ("coughs", "Cough"),
+    ("feverish and tired", "Fever"),
+    ("short breath", "Breathing Difficulty"),
+])
+def test_speech_symptom_detected(text, symptom):
+    assert detect_speech_symptom(text) == symptom
+
+
+@pytest.mark.parametrize("text", ["painkiller", "a coughdrop", "feverfew tea"])
+def test_symptom_words_match_whole_words_only(text):
+    assert detect_speech_symptom(text) is None
+
+
+def test_emergency_outranks_symptom_and_longest_phrase_wins():
+    matches = match_clinical_terms("fever and chest pain")
+    assert [(m.kind, m.label) for m in matches] == [
+        ("symptom", "Fever"), ("emergency", "chest pain"),
+    ]
+
+
+def test_first_prefers_priority_then_position():
+    matcher = TermMatcher([
+        Term("pain", "symptom", "Pain", 10),
+        Term("stroke", "emergency", "stroke", 100),
+    ])
+    assert matcher.first("pain after a stroke").label == "stroke"
+    assert matcher.first("pain then pain").start == 0
+    assert matcher.first("nothing here") is None
@@ -0,0 +1,81 @@
+# test_model_variants.py - Variants only serve next to the full model they came from
+
+import os
+
+import pytest
+
+import logic
+import train_brain
+from bundle import BUNDLE_FILE, build_bundle, list_variants, load_bundle, save_bundle, variant_file
+from conftest import fit_tiny_model
+from forest import export_forest
+
+
+def save_variant(directory, name, model, scaler, encoder, parent_sha256):
+    arrays = build_bundle(model, scaler, encoder, train_brain.FEATURE_COLUMNS,
+                          forest=export_forest(model, scaler, max_depth=2, n_trees=2),
+                          parent_sha256=parent_sha256)
+    save_bundle(os.path.join(directory, variant_file(name)), arrays)
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    model, scaler, encoder, _ = fit_tiny_model()
+    sha256 = train_brain.save_artifacts(model, scaler, encoder, str(tmp_path))["bundle"]["sha256"]
+    save_variant(str(tmp_path), "small", model, scaler, encoder, sha256)
+    return str(tmp_path)
+
+
+def test_variant_records_its_parent(model_dir):
+    full = load_bundle(os.path.join(model_dir, BUNDLE_FILE))
+    variant = load_bundle(os.path.join(model_dir, variant_file("small")))
+    assert full.parent_sha256 is None
+    assert variant.parent_sha256 == full.sha256
+    assert logic.ModelRegistry(model_dir, variant="small").get() is not None
+
+
+def test_retraining_removes_stale_variants(model_dir):
+    model, scaler, encoder, _ = fit_tiny_model(seed=1)
+    train_brain.save_artifacts(model, scaler, encoder, model_dir)
+    assert list_variants(model_dir) == []
+
+
+def test_variant_of_another_model_is_refused(model_dir):
+    # A variant copied in from another training run
+    model, scaler, encoder, _ = fit_tiny_model(seed=1)
+    save_variant(model_dir, "stale", model, scaler, encoder, "0" * 64)
+    registry = logic.ModelRegistry(model_dir, variant="stale")
+    assert registry.get() is None
+    assert "not the installed full model" in registry.error
+
+
+def test_variant_without_parent_is_refused(model_dir):
+    model, scaler, encoder, _ = fit_tiny_model()
+    save_variant(model_dir, "old", model, scaler, encoder, None)
+    registry = logic.ModelRegistry(model_dir, variant="old")
+    assert registry.get() is None
+    assert "unrecorded" in registry.error
+
+
+def test_variants_are_named_after_what_was_built(tmp_path):
+    model, scaler, encoder, X = fit_tiny_model(n_estimators=5, max_depth=4)
+    y = model.predict(scaler.transform(X))
+    data = train_brain.Dataset(scaler.transform(X).astype("float32"), y, X, y, scaler, encoder, 0.0)
+    train_brain.save_artifacts(model, scaler, encoder, str(tmp_path))
+    variants = (
+        {"kind": "prune", "n_trees": 50, "max_depth": 12},   # more than the model has
+        {"kind": "prune", "n_trees": 3, "max_depth": 12},    # depth capped by the model
+        {"kind": "prune", "n_trees": 3, "max_depth": 2},
+        {"kind": "tree", "max_depth": 20},
+        {"kind": "tree", "max_depth": 30},                   # same tree as the one above
+    )
+    reports = train_brain.compress(model, data, str(tmp_path), variants, tolerance=1.0)
+
+    names = [r["name"] for r in reports]
+    depth = reports[0]["max_depth"]
+    assert names[:3] == ["full", f"prune-3x{depth}", "prune-3x2"]
+    assert len(names) == 4 and names[3].startswith("tree-d")
+    for r in reports[1:]:
+        assert r["name"] in list_variants(str(tmp_path))
+        assert r["name"].endswith(f"{r['trees']}x{r['max_depth']}") or \
+            r["name"] == f"tree-d{r['max_depth']}"
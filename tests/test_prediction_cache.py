@@ -0,0 +1,196 @@
+# test_prediction_cache.py - Memoized diagnoses: LRU, TTL, batching, invalidation
+
+import os
+
+import numpy as np
+import pytest
+
+import logic
+import model_server
+import prediction_cache
+import train_brain
+from conftest import fit_tiny_model
+from prediction_cache import PredictionCache
+
+ROW = [30, 1, 37.0, 80, 120, 98, 7.0, 1.0, 13.0]
+
+
+class Model:
+    """compute() stand-in that records every row it is asked to score."""
+
+    def __init__(self, version="v1"):
+        self.version = version
+        self.scored = []
+
+    def __call__(self, X):
+        self.scored.extend(map(tuple, X))
+        return [f"label-{row[0]:g}" for row in X], self.version
+
+
+def rows(*ages):
+    return np.array([[age] + ROW[1:] for age in ages], dtype=np.float64)
+
+
+def make_cache(**kwargs):
+    return PredictionCache([1] * 9, **kwargs)
+
+
+def test_lru_evicts_least_recently_used():
+    cache, model = make_cache(max_entries=2), Model()
+    cache.predict(rows(1), "v1", model)
+    cache.predict(rows(2), "v1", model)
+    cache.predict(rows(1), "v1", model)   # 1 is now the most recent
+    cache.predict(rows(3), "v1", model)   # evicts 2
+    model.scored.clear()
+
+    cache.predict(rows(1, 3), "v1", model)
+    assert model.scored == []
+    cache.predict(rows(2), "v1", model)
+    assert [row[0] for row in model.scored] == [2]
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: clock[0])
+    cache, model = make_cache(ttl=10), Model()
+    cache.predict(rows(1), "v1", model)
+
+    clock[0] += 9
+    cache.predict(rows(1), "v1", model)
+    assert len(model.scored) == 1
+
+    clock[0] += 2
+    cache.predict(rows(1), "v1", model)
+    assert len(model.scored) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_repeated_rows_are_scored_once():
+    cache, model = make_cache(), Model()
+    labels = cache.predict(rows(5, 6, 5, 5, 6, 7), "v1", model)
+    assert list(labels) == ["label-5", "label-6", "label-5", "label-5", "label-6", "label-7"]
+    assert sorted(row[0] for row in model.scored) == [5, 6, 7]
+
+    # Only the new row of a later batch reaches the model
+    model.scored.clear()
+    cache.predict(rows(7, 8, 8, 5), "v1", model)
+    assert [row[0] for row in model.scored] == [8]
+
+
+def test_stats_count_hits_and_misses():
+    cache, model = make_cache(), Model()
+    cache.predict(rows(1, 2), "v1", model)
+    cache.predict(rows(1, 2, 3), "v1", model)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+    assert stats["hit_rate"] == pytest.approx(0.4)
+    assert stats["model_version"] == "v1"
+
+
+def test_answers_from_another_model_are_not_kept():
+    cache = make_cache()
+    labels = cache.predict(rows(1), "server", Model(version="local"))
+    assert list(labels) == ["label-1"]
+    assert cache.stats()["entries"] == 0
+
+
+# ---------------------------
+# Model versions as logic computes them
+
+@pytest.fixture
+def local_model(tmp_path, monkeypatch):
+    model, scaler, encoder, X = fit_tiny_model()
+    train_brain.save_artifacts(model, scaler, encoder, str(tmp_path))
+    registry = logic.ModelRegistry(str(tmp_path))
+    cache = PredictionCache([logic.FEATURE_RESOLUTION[name] for name in logic.FEATURE_COLUMNS])
+    monkeypatch.setattr(logic, "registry", registry)
+    monkeypatch.setattr(logic, "prediction_cache", cache)
+    monkeypatch.setattr(logic, "MODEL_SERVER", None)
+    monkeypatch.setattr(logic, "_version", (None, 0.0))
+    return registry, cache, X[:20]
+
+
+def next_second(monkeypatch):
+    # _model_version re-stats the artifact at most once a second
+    monkeypatch.setattr(logic, "_version", (None, 0.0))
+
+
+def test_touching_the_bundle_invalidates(local_model, monkeypatch):
+    registry, cache, X = local_model
+    logic.get_ai_diagnosis_batch(X)
+    logic.get_ai_diagnosis_batch(X)
+    assert cache.stats()["invalidations"] == 0
+
+    st = os.stat(registry.source)
+    os.utime(registry.source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    next_second(monkeypatch)
+    logic.get_ai_diagnosis_batch(X)
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["misses"] == 2 * len(np.unique(cache.quantize(X), axis=0))
+
+
+def test_retrained_bundle_invalidates(local_model, monkeypatch):
+    registry, cache, X = local_model
+    logic.get_ai_diagnosis_batch(X)
+    old_sha = registry.sha256
+
+    model, scaler, encoder, _ = fit_tiny_model(seed=1)
+    train_brain.save_artifacts(model, scaler, encoder, registry.base_dir)
+    registry.reset()
+    next_second(monkeypatch)
+    logic.get_ai_diagnosis_batch(X)
+    assert registry.sha256 != old_sha
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["model_version"][0] == registry.sha256
+
+
+# ---------------------------
+# Model server answers
+
+@pytest.fixture
+def server_address(tmp_path, monkeypatch):
+    address = "unix:" + str(tmp_path / "model.sock")
+    monkeypatch.setattr(logic, "MODEL_SERVER", address)
+    monkeypatch.setattr(logic, "_server_client", None)
+    monkeypatch.setattr(logic, "_server_retry_at", 0.0)
+    servers = []
+
+    def start(label, model_id):
+        server = model_server.ModelServer(address, lambda X: [label] * len(X),
+                                          model_id=model_id).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+    if logic._server_client is not None:
+        logic._server_client.close()
+
+
+def test_restarted_server_invalidates(local_model, server_address):
+    _, cache, _ = local_model
+    first = server_address("A", "sha-a")
+    assert [logic.get_ai_diagnosis(ROW) for _ in range(2)] == ["A", "A"]
+
+    first.close()
+    server_address("B", "sha-b")
+    assert [logic.get_ai_diagnosis(ROW) for _ in range(2)] == ["B", "B"]
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["model_version"] == ("server", logic.MODEL_SERVER, "sha-b")
+
+
+def test_overloaded_fallback_is_not_cached(local_model, server_address, monkeypatch):
+    _, cache, _ = local_model
+    server_address("remote", "sha-a")
+
+    def overloaded(self, row):
+        raise model_server.Overloaded("server overloaded")
+
+    monkeypatch.setattr(model_server.ModelClient, "predict", overloaded)
+    label = logic.get_ai_diagnosis(ROW)
+    assert label in logic.get_ai_classes()
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,57 @@
+# test_search.py - A search that runs out of time keeps what it found
+
+import pytest
+
+import database
+import search
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "clinic.db")
+    database.init_db(path)
+    # Many fillers share the trigram "sha", so the fuzzy stage has work to do
+    for name in ["Asha Verma", "Rasha Khan"] + [f"Shaw Filler {i:04d}" for i in range(1000)]:
+        database.add_patient(name, "1990-01-01", 35, "Female", db_path=path)
+    yield path
+    database.close_all()
+
+
+@pytest.fixture
+def expire_in_fuzzy_stage(monkeypatch):
+    """Make the deadline pass as soon as the fuzzy (last) stage starts."""
+    state = {"armed": False}
+
+    class Deadline(search._Deadline):
+        def __call__(self):
+            if state["armed"]:
+                self.hit = True
+                return 1
+            return 0
+
+    fuzzy_expression = search._fuzzy_expression
+
+    def arm(query):
+        state["armed"] = True
+        return fuzzy_expression(query)
+
+    monkeypatch.setattr(search, "_Deadline", Deadline)
+    monkeypatch.setattr(search, "_fuzzy_expression", arm)
+    return state
+
+
+def test_timeout_returns_earlier_stages(db_path, expire_in_fuzzy_stage):
+    searcher = search.PatientSearch(db_path)
+    found = [patient.name for patient, _ in searcher.search("asha")]
+    assert expire_in_fuzzy_stage["armed"]
+    assert searcher.timeouts == 1
+    # The prefix and the substring match both survive the aborted fuzzy stage
+    assert found == ["Asha Verma", "Rasha Khan"]
+
+
+def test_timed_out_answer_is_not_cached(db_path, expire_in_fuzzy_stage):
+    searcher = search.PatientSearch(db_path)
+    searcher.search("asha")
+    searcher.search("asha")
+    assert searcher.hits == 0
+    assert searcher.timeouts == 2
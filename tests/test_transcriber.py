@@ -0,0 +1,100 @@
+# test_transcriber.py - Worker pool cancellation, timeouts and restarts
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import voice
+from transcriber import CANCELLED, DONE, QUEUED, RUNNING, TIMEOUT, TranscriptionService
+
+
+class SleepyModel:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def transcribe(self, samples, fp16=False):
+        time.sleep(self.seconds)
+        return {"text": "fake transcript"}
+
+
+def sleepy_loader(name):
+    # name is "sleep:<seconds>"; top level so spawned workers can import it
+    return SleepyModel(float(name.split(":", 1)[1]))
+
+
+def clip(seconds=1.0):
+    t = np.arange(int(seconds * voice.SAMPLE_RATE)) / voice.SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def wait_for(predicate, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def service(request):
+    seconds = getattr(request, "param", 30.0)
+    svc = TranscriptionService(workers=1, model_name=f"sleep:{seconds}",
+                               model_loader=sleepy_loader, timeout=60.0)
+    wait_for(lambda: svc.stats()["ready_workers"] == 1)
+    yield svc
+    svc.close()
+
+
+def test_cancel_running_job_restarts_worker_without_blocking_poll(service):
+    first = service.submit(clip())
+    wait_for(lambda: service.poll(first).state == RUNNING)
+
+    # The dispatcher may be blocked in wait() on this worker's pipe, so only
+    # the dispatcher may stop the worker and close it
+    worker = service._workers[0]
+    stopped_by = []
+    stop = worker.stop
+    worker.stop = lambda kill=False: (stopped_by.append(threading.current_thread().name),
+                                      stop(kill))
+    assert service.cancel(first)
+    assert service.poll(first).state == CANCELLED
+
+    # The replacement is started by the dispatcher, not by cancel(); poll
+    # stays responsive while the old worker is killed and a new one spawns
+    second = service.submit(clip())
+    slowest = 0.0
+    while service.stats()["worker_restarts"] == 0:
+        start = time.perf_counter()
+        assert service.poll(second).state in (QUEUED, RUNNING)
+        slowest = max(slowest, time.perf_counter() - start)
+        time.sleep(0.01)
+    assert slowest < 0.1
+    assert stopped_by == ["transcriber"]
+    wait_for(lambda: service.stats()["ready_workers"] == 1)
+    assert service._thread.is_alive()
+
+
+def test_repeated_cancels_keep_the_dispatcher_alive(service):
+    for _ in range(3):
+        job = service.submit(clip())
+        wait_for(lambda: service.poll(job).state == RUNNING)
+        service.cancel(job)
+        wait_for(lambda: service.stats()["ready_workers"] == 1)
+    assert service._thread.is_alive()
+    assert service.stats()["worker_restarts"] == 3
+
+
+@pytest.mark.parametrize("service", [0.2], indirect=True)
+def test_job_after_cancel_completes(service):
+    job = service.submit(clip())
+    queued = service.submit(clip())
+    assert service.cancel(queued)
+    assert service.result(job, timeout=30).state == DONE
+    assert service.poll(queued).state == CANCELLED
+
+
+def test_timeout_replaces_worker(service):
+    job = service.submit(clip(), timeout=0.5)
+    assert service.result(job, timeout=30).state == TIMEOUT
+    wait_for(lambda: service.stats()["worker_restarts"] == 1)
@@ -0,0 +1,31 @@
+# test_vitals_store.py - Process-wide vitals stores are kept per database file
+
+import pytest
+
+import database
+import vitals_store
+
+
+@pytest.fixture
+def db_paths(tmp_path):
+    paths = [str(tmp_path / "a.db"), str(tmp_path / "b.db")]
+    for path in paths:
+        database.init_db(path)
+    yield paths
+    vitals_store.flush_all()
+    database.close_all()
+
+
+def test_stores_are_keyed_by_path(db_paths):
+    a, b = db_paths
+    assert vitals_store.get_vitals_store(a) is vitals_store.get_vitals_store(a)
+    assert vitals_store.get_vitals_store(a) is not vitals_store.get_vitals_store(b)
+
+
+def test_readings_land_in_their_own_database(db_paths):
+    a, b = db_paths
+    vitals_store.get_vitals_store(a).record("p1", {"pulse": 72.0})
+    vitals_store.get_vitals_store(b).record("p2", {"temperature": 37.5})
+    assert vitals_store.get_vitals_store(a).series("p1") == ["pulse"]
+    assert vitals_store.get_vitals_store(a).series("p2") == []
+    assert vitals_store.get_vitals_store(b).series("p2") == ["temperature"]
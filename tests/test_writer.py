@@ -0,0 +1,81 @@
+# test_writer.py - Write-behind queue: per-path writers, flush on close
+
+import threading
+
+import pytest
+
+import database
+import writer
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "clinic.db")
+    database.init_db(path)
+    yield path
+    writer.close_all()
+    database.close_all()
+
+
+def count_rows(db_path):
+    conn = database.open_connection(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM prescriptions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_writers_are_keyed_by_path(tmp_path, db_path):
+    other = str(tmp_path / "other.db")
+    database.init_db(other)
+    assert writer.get_writer(db_path) is writer.get_writer(db_path)
+    assert writer.get_writer(db_path) is not writer.get_writer(other)
+    assert writer.get_writer(other).db_path == other
+
+
+def test_close_commits_everything_queued(db_path):
+    # A long flush interval keeps rows queued until close() drains them
+    w = writer.WriteBehindQueue(db_path, batch_size=8, flush_interval=5.0)
+    patient = database.add_patient("Asha", "01-01-1990", 35, "F", db_path=db_path)
+    futures = [w.submit_prescription(patient.id, "Fever", "High", "Paracetamol", "500mg", 1)
+               for _ in range(50)]
+    w.close()
+    assert all(f.done() for f in futures)
+    assert [f.exception() for f in futures] == [None] * 50
+    assert count_rows(db_path) == 50
+
+
+def test_submit_after_close_raises(db_path):
+    w = writer.WriteBehindQueue(db_path)
+    w.close()
+    row = database.new_prescription("p", "Fever", "High", "Paracetamol", "500mg", 1)
+    with pytest.raises(RuntimeError):
+        w.submit(row)
+    with pytest.raises(RuntimeError):
+        w.submit(row, immediate=True)
+
+
+def test_submit_racing_close_never_leaves_a_future_pending(db_path):
+    w = writer.WriteBehindQueue(db_path, max_queue=16, batch_size=4)
+    futures = []
+    start = threading.Barrier(5)
+
+    def submitter():
+        start.wait()
+        for _ in range(200):
+            row = database.new_prescription("p", "Fever", "High", "Paracetamol", "500mg", 1)
+            try:
+                futures.append(w.submit(row))
+            except RuntimeError:
+                return
+
+    threads = [threading.Thread(target=submitter) for _ in range(4)]
+    for t in threads:
+        t.start()
+    start.wait()
+    w.close()
+    for t in threads:
+        t.join()
+
+    assert all(f.done() for f in futures)
+    assert count_rows(db_path) == len(futures)
@@ -1,36 +1,668 @@
+# train_brain.py - Training Pipeline for the AI "Brain" (parallel, chunked)
+#
+# Usage: python train_brain.py [--data advanced_patient_dataset.csv] [--out-dir .]
+#                              [--sweep] [--sweep-workers N] [--report train_report.json]
+#                              [--n-estimators 100] [--max-depth D] [--max-rows N]
+#                              [--compress] [--agreement-tolerance 0.01]
+#                              [--work-dir DIR | --in-memory] [--jobs N]
+# The dataset (CSV or Parquet) is read in typed chunks and spilled to
+# memory-mapped .npy files (--work-dir), so loading needs about one chunk
+# of RAM; trees are grown on --jobs threads (every core by default), each
+# needing ~70 bytes per training row on top of the first. --sweep trains
+# each SWEEP_GRID candidate in its own process and reports held-out
+# accuracy, training time, artifact size and inference latency for each,
+# then ships the most accurate one as a single checksummed bundle
+# (medical_bundle.npz). --compress then derives smaller
+# variants from it (pruned, distilled to one tree, distilled to a small
+# boosted ensemble), keeps those that agree with it within
+# --agreement-tolerance as medical_bundle.<name>.npz, and prints a Pareto
+# report (accuracy vs bytes, load time, p99 single-row latency).
+# Select one at run time with CLINIC_MODEL_VARIANT=<name>.
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
-import joblib
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from bundle import (BUNDLE_FILE, FOREST_MEMBERS, OPTIONAL_FOREST_MEMBERS, build_bundle,
+                    bundle_sha256, content_hash, load_bundle, remove_variants, save_bundle,
+                    variant_file)
+from forest import CompiledForest, export_boosted, export_forest, save_forest
+
+FEATURE_COLUMNS = ["Age", "Gender", "Temp", "HR", "Sys", "SpO2", "WBC", "CRP", "Hb"]
+LABEL_COLUMN = "Diagnosis"
+
+# Typed reads: narrow ints and a categorical label instead of int64/object
+# columns. Measurements stay float64 so held-out rows match live input exactly.
+DTYPES = {
+    "Age": "int16", "Gender": "int8", "Temp": "float64", "HR": "int16", "Sys": "int16",
+    "SpO2": "int16", "WBC": "float64", "CRP": "float64", "Hb": "float64",
+    LABEL_COLUMN: "category",
+}
+
+DEFAULT_CHUNK_SIZE = 500_000
+DEFAULT_PARAMS = {"n_estimators": 100, "max_depth": None, "min_samples_leaf": 1}
+
+SWEEP_GRID = {
+    "n_estimators": [25, 50, 100],
+    "max_depth": [None, 16],
+    "min_samples_leaf": [1, 5],
+}
+
+# Compressed variants tried by --compress. "prune" keeps the first n_trees
+# trees of the full forest cut at max_depth; "tree" and "boost" are trained
+# on the full model's own predictions (distillation), on distill_rows rows.
+COMPRESSION_VARIANTS = (
+    {"kind": "prune", "n_trees": 50, "max_depth": 12},
+    {"kind": "prune", "n_trees": 25, "max_depth": 10},
+    {"kind": "prune", "n_trees": 10, "max_depth": 8},
+    {"kind": "tree", "max_depth": 8},
+    {"kind": "tree", "max_depth": 12},
+    {"kind": "boost", "n_estimators": 10, "max_depth": 3},
+)
+DEFAULT_AGREEMENT_TOLERANCE = 0.01
+DEFAULT_DISTILL_ROWS = 200_000
+
+Dataset = namedtuple(
+    "Dataset", ["X_train", "y_train", "X_test", "y_test", "scaler", "encoder", "load_seconds"]
+)
+
+
+# ==================================================
+# 📥 CHUNKED LOADING
+# ==================================================
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, max_rows=None):
+    """Yield typed DataFrame chunks of a CSV or Parquet dataset."""
+    if str(path).endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_size, columns=FEATURE_COLUMNS + [LABEL_COLUMN]
+        )
+        chunks = (batch.to_pandas().astype(DTYPES) for batch in batches)
+    else:
+        chunks = pd.read_csv(
+            path, usecols=FEATURE_COLUMNS + [LABEL_COLUMN], dtype=DTYPES, chunksize=chunk_size
+        )
+
+    seen = 0
+    for chunk in chunks:
+        if max_rows is not None and seen + len(chunk) > max_rows:
+            chunk = chunk.iloc[: max_rows - seen]
+        seen += len(chunk)
+        if len(chunk):
+            yield chunk
+        if max_rows is not None and seen >= max_rows:
+            return
+
+
+class _Spill:
+    """Rows appended to a raw file as they arrive, read back as a memory map."""
+
+    def __init__(self, path, dtype, width=None):
+        self.path, self.dtype, self.width, self.rows = path, np.dtype(dtype), width, 0
+        self._file = open(path + ".raw", "wb")
+
+    def append(self, array):
+        np.ascontiguousarray(array, dtype=self.dtype).tofile(self._file)
+        self.rows += len(array)
+
+    def finish(self, transform=None, block_rows=DEFAULT_CHUNK_SIZE):
+        """Copy into a .npy file block by block (applying transform) and memory-map it."""
+        self._file.close()
+        shape = (self.rows, self.width) if self.width else (self.rows,)
+        raw = np.memmap(self.path + ".raw", dtype=self.dtype, mode="r", shape=shape)
+        out = np.lib.format.open_memmap(self.path + ".npy", mode="w+", dtype=self.dtype,
+                                        shape=shape)
+        for row in range(0, self.rows, block_rows):
+            block = raw[row:row + block_rows]
+            out[row:row + len(block)] = transform(block) if transform else block
+        out.flush()
+        del raw, out
+        os.remove(self.path + ".raw")
+        return np.load(self.path + ".npy", mmap_mode="r")
+
+
+def load_dataset(path, test_size=0.2, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, max_rows=None,
+                 work_dir=None):
+    """
+    One pass over the file: each chunk is split train/test at random, the
+    scaler is fitted incrementally on training rows only and labels are
+    encoded as they arrive. Training features end up scaled in float32
+    (what the trees train on anyway); test features stay raw float64, which
+    is what the compiled forest takes.
+
+    With work_dir, every array is spilled to a .npy file there (about 50
+    bytes of disk a row) and returned memory-mapped, so the dataset is held
+    by the page cache rather than the process: loading stays near one
+    chunk (~200 MB at the default chunk_size) however large the file.
+    Without it, the arrays live in RAM, about 100 bytes a row at peak.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    scaler = StandardScaler()
+    labels = {}
+    width = len(FEATURE_COLUMNS)
+    if work_dir is None:
+        train_X, train_y, test_X, test_y = [], [], [], []
+    else:
+        spills = {name: _Spill(os.path.join(work_dir, name), dtype, w) for name, dtype, w in (
+            ("X_train", np.float32, width), ("y_train", np.int64, None),
+            ("X_test", np.float64, width), ("y_test", np.int64, None))}
+        train_X, train_y, test_X, test_y = (spills[name] for name in
+                                            ("X_train", "y_train", "X_test", "y_test"))
+
+    for chunk in read_chunks(path, chunk_size, max_rows):
+        X = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        diagnosis = chunk[LABEL_COLUMN].cat
+        lookup = np.array([labels.setdefault(c, len(labels)) for c in diagnosis.categories])
+        y = lookup[diagnosis.codes.to_numpy()]
+
+        is_test = rng.random(len(X)) < test_size
+        scaler.partial_fit(X[~is_test])
+        train_X.append(X[~is_test].astype(np.float32))
+        train_y.append(y[~is_test])
+        test_X.append(X[is_test])
+        test_y.append(y[is_test])
+
+    if not labels:
+        raise ValueError(f"{path} has no rows")
+
+    # Re-number labels the way LabelEncoder does (sorted)
+    encoder = LabelEncoder().fit(list(labels))
+    remap = np.empty(len(labels), dtype=np.int64)
+    remap[list(labels.values())] = encoder.transform(list(labels))
+
+    def scale(block):
+        return (block - scaler.mean_) / scaler.scale_
+
+    if work_dir is not None:
+        return Dataset(
+            X_train=train_X.finish(scale),
+            y_train=train_y.finish(remap.take),
+            X_test=test_X.finish(),
+            y_test=test_y.finish(remap.take),
+            scaler=scaler,
+            encoder=encoder,
+            load_seconds=time.perf_counter() - start,
+        )
+
+    X_train = np.empty((sum(len(c) for c in train_X), width), dtype=np.float32)
+    row = 0
+    while train_X:
+        chunk = train_X.pop(0)
+        X_train[row:row + len(chunk)] = scale(chunk)
+        row += len(chunk)
+
+    return Dataset(
+        X_train=X_train,
+        y_train=remap[np.concatenate(train_y)],
+        X_test=np.concatenate(test_X),
+        y_test=remap[np.concatenate(test_y)],
+        scaler=scaler,
+        encoder=encoder,
+        load_seconds=time.perf_counter() - start,
+    )
+
+
+# ==================================================
+# 🧠 TRAINING & EVALUATION
+# ==================================================
+
+def train_model(X, y, n_jobs=-1, random_state=42, **params):
+    """
+    Memory ceiling on top of X itself: about 30 bytes per training row,
+    plus about 70 more for every tree-building thread beyond the first
+    (bootstrap weights and split buffers are per tree). Lower n_jobs for
+    very large datasets.
+    """
+    model = RandomForestClassifier(random_state=random_state, n_jobs=n_jobs, **params)
+    model.fit(X, y)
+    return model
+
+
+def _artifact_bytes(model, arrays):
+    forest_file = io.BytesIO()
+    np.savez(forest_file, **arrays)
+    pickle_file = io.BytesIO()
+    joblib.dump(model, pickle_file)
+    return forest_file.tell(), pickle_file.tell()
+
+
+def measure_latency(forest, X, single_rows=200, batch_rows=10_000):
+    """Compiled-forest latency: p50/p99 for one row, and one batch of rows."""
+    singles = []
+    for row in X[:single_rows]:
+        start = time.perf_counter()
+        forest.predict_proba(row)
+        singles.append(time.perf_counter() - start)
+    singles.sort()
+
+    batch = X[:batch_rows]
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        forest.predict_proba(batch)
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "single_ms_p50": singles[len(singles) // 2] * 1e3,
+        "single_ms_p99": singles[min(int(len(singles) * 0.99), len(singles) - 1)] * 1e3,
+        "batch_rows": len(batch),
+        "batch_ms": best * 1e3,
+    }
+
+
+def evaluate_candidate(params, data, n_jobs=-1):
+    """Train one configuration; returns (model, forest arrays, report row)."""
+    start = time.perf_counter()
+    model = train_model(data.X_train, data.y_train, n_jobs=n_jobs, **params)
+    train_seconds = time.perf_counter() - start
+
+    arrays = export_forest(model, data.scaler)
+    forest = CompiledForest(**arrays)
+    accuracy = float(np.mean(forest.predict(data.X_test) == data.y_test))
+    forest_bytes, pickle_bytes = _artifact_bytes(model, arrays)
+
+    report = {
+        "params": params,
+        "accuracy": accuracy,
+        "train_seconds": train_seconds,
+        "forest_bytes": forest_bytes,
+        "pickle_bytes": pickle_bytes,
+        "nodes": int(len(arrays["feature"])),
+        "max_depth": int(arrays["max_depth"]),
+    }
+    report.update(measure_latency(forest, data.X_test))
+    return model, arrays, report
+
+
+# ==================================================
+# 🔬 HYPERPARAMETER SWEEP
+# ==================================================
+
+def grid_candidates(grid=SWEEP_GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _sweep_worker(params, paths, n_jobs):
+    # Arrays are memory-mapped, so every sweep process shares one copy
+    arrays = {name: np.load(path, mmap_mode="r") for name, path in paths.items()
+              if name != "scaler"}
+    scaler = joblib.load(paths["scaler"])
+    data = Dataset(scaler=scaler, encoder=None, load_seconds=None, **arrays)
+    return evaluate_candidate(params, data, n_jobs=n_jobs)[2]
+
+
+def sweep(data, candidates, workers=None):
+    """
+    Evaluate candidates in a process pool. Cores are split between the
+    processes (each forest gets cores // workers tree-building threads), so
+    the sweep does not oversubscribe the CPU.
+    """
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(candidates)))
+    n_jobs = max(1, cores // workers)
+
+    with tempfile.TemporaryDirectory(prefix="clinic-sweep-") as data_dir:
+        # Arrays load_dataset already spilled to .npy files are mapped as they are
+        paths = {"scaler": os.path.join(data_dir, "scaler.pkl")}
+        for name in ("X_train", "y_train", "X_test", "y_test"):
+            array = getattr(data, name)
+            if isinstance(array, np.memmap) and str(array.filename).endswith(".npy"):
+                paths[name] = array.filename
+            else:
+                paths[name] = os.path.join(data_dir, name + ".npy")
+                np.save(paths[name], array)
+        joblib.dump(data.scaler, paths["scaler"])
+
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_sweep_worker, params, paths, n_jobs) for params in candidates]
+            return [future.result() for future in futures]
+
+
+def select_candidate(reports):
+    """Most accurate; near-ties (within 0.1%) go to the faster single-row model."""
+    best = max(r["accuracy"] for r in reports)
+    close = [r for r in reports if r["accuracy"] >= best - 0.001]
+    return min(close, key=lambda r: (r["single_ms_p50"], r["forest_bytes"]))
+
+
+# ==================================================
+# 🗜 COMPRESSION
+# ==================================================
+
+def variant_name(kind, n_trees, max_depth):
+    """Name a compressed variant after what was built (trees, or boosting stages, and depth)."""
+    if kind == "prune":
+        return f"prune-{n_trees}x{max_depth}"
+    if kind == "tree":
+        return f"tree-d{max_depth}"
+    if kind == "boost":
+        return f"boost-{n_trees}x{max_depth}"
+    raise ValueError(f"unknown compression kind {kind!r}")
+
+
+def compress_variant(spec, model, data, teacher_rows, teacher_labels):
+    """
+    (name, exported arrays) of one compressed variant of `model`. A spec
+    asking for at least as many trees and as much depth as the model has
+    is clamped to the model, so its name says what it really holds.
+    """
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if spec["kind"] == "prune":
+        arrays = export_forest(model, data.scaler, max_depth=spec["max_depth"],
+                               n_trees=spec["n_trees"])
+        n_trees = len(arrays["roots"])
+    else:
+        X = data.X_train[teacher_rows]
+        if spec["kind"] == "tree":
+            student = DecisionTreeClassifier(max_depth=spec["max_depth"], random_state=42)
+            arrays = export_forest(student.fit(X, teacher_labels), data.scaler)
+            n_trees = 1
+        elif spec["kind"] == "boost":
+            student = GradientBoostingClassifier(n_estimators=spec["n_estimators"],
+                                                 max_depth=spec["max_depth"], random_state=42)
+            arrays = export_boosted(student.fit(X, teacher_labels), data.scaler)
+            n_trees = student.n_estimators_
+        else:
+            raise ValueError(f"unknown compression kind {spec['kind']!r}")
+    return variant_name(spec["kind"], n_trees, int(arrays["max_depth"])), arrays
+
+
+def measure_load(path, repeat=5):
+    """Median seconds to load and verify a bundle (file already in the page cache)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load_bundle(path)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def pareto_front(reports, keys=("bytes", "load_ms", "single_ms_p99")):
+    """Mark rows no other row beats on accuracy and on every cost in keys."""
+    for r in reports:
+        r["pareto"] = not any(
+            o is not r
+            and o["accuracy"] >= r["accuracy"]
+            and all(o[k] <= r[k] for k in keys)
+            and (o["accuracy"] > r["accuracy"] or any(o[k] < r[k] for k in keys))
+            for o in reports
+        )
+    return reports
+
+
+def compress(model, data, out_dir=".", variants=COMPRESSION_VARIANTS,
+             tolerance=DEFAULT_AGREEMENT_TOLERANCE, distill_rows=DEFAULT_DISTILL_ROWS, seed=42):
+    """
+    Build each variant, score it against the held-out labels and against
+    the full model's answers, and save those whose agreement is at least
+    1 - tolerance as medical_bundle.<name>.npz. Returns report rows, the
+    full model first; "saved" tells which variants shipped.
+    """
+    full = CompiledForest(**export_forest(model, data.scaler))
+    full_test = full.predict(data.X_test)
+
+    rng = np.random.default_rng(seed)
+    teacher_rows = np.sort(rng.choice(len(data.X_train), min(distill_rows, len(data.X_train)),
+                                      replace=False))
+    # The student learns the full model's answers, not the raw labels
+    teacher_labels = model.predict(data.X_train[teacher_rows])
+
+    reports = []
+    parent = None   # content hash of the full bundle, recorded in every variant
+    for spec in ({"kind": "full"},) + tuple(variants):
+        start = time.perf_counter()
+        if spec["kind"] == "full":
+            name, arrays = "full", None
+        else:
+            name, arrays = compress_variant(spec, model, data, teacher_rows, teacher_labels)
+            # Pruning no further than the model reaches is the full model again, and
+            # two specs can build the same thing (a shallow tree never hits either cap)
+            if spec["kind"] == "prune" and (len(arrays["roots"]), int(arrays["max_depth"])) == \
+                    (full.n_trees, full.max_depth):
+                print(f"skipping {spec}: no smaller than the full model")
+                continue
+            if any(r["name"] == name for r in reports):
+                print(f"skipping {spec}: builds the same model as {name}")
+                continue
+        path = os.path.join(out_dir, BUNDLE_FILE if name == "full" else variant_file(name))
+        arrays = build_bundle(model, data.scaler, data.encoder, FEATURE_COLUMNS, forest=arrays,
+                              parent_sha256=parent)
+        build_seconds = time.perf_counter() - start
+
+        forest = CompiledForest(**{k: arrays[k] for k in FOREST_MEMBERS + OPTIONAL_FOREST_MEMBERS
+                                   if k in arrays})
+        predicted = forest.predict(data.X_test)
+        agreement = float(np.mean(predicted == full_test))
+        report = {
+            "name": name,
+            "spec": spec,
+            "accuracy": float(np.mean(predicted == data.y_test)),
+            "agreement": agreement,
+            "within_tolerance": agreement >= 1.0 - tolerance,
+            "trees": forest.n_trees,
+            "max_depth": forest.max_depth,
+            "nodes": int(len(forest.feature)),
+            "build_seconds": build_seconds,
+        }
+
+        if name == "full":
+            parent = content_hash(arrays)
+            # Normally already written by save_artifacts; any other full
+            # bundle there takes its variants with it when replaced
+            if not os.path.exists(path) or bundle_sha256(path) != parent:
+                remove_variants(out_dir)
+                save_bundle(path, arrays)
+        else:
+            save_bundle(path, arrays)
+        report["bytes"] = os.path.getsize(path)
+        report["load_ms"] = measure_load(path) * 1e3
+        report.update(measure_latency(forest, data.X_test, single_rows=1000))
+        report["saved"] = name != "full" and report["within_tolerance"]
+        if name != "full" and not report["saved"]:
+            os.remove(path)
+        reports.append(report)
+
+    return pareto_front(reports)
+
+
+def format_compression_report(reports, tolerance=DEFAULT_AGREEMENT_TOLERANCE):
+    lines = [
+        f"{'variant':<16} {'acc':>7} {'agree':>7} {'trees':>5} {'depth':>5} {'KB':>8} "
+        f"{'load ms':>8} {'p99 ms':>7}  {'':<6}",
+    ]
+    for r in reports:
+        verdict = ("" if r["name"] == "full"
+                   else "saved" if r["saved"] else f"<{1 - tolerance:.1%}")
+        lines.append(
+            f"{r['name']:<16} {r['accuracy']:7.4f} {r['agreement']:7.4f} {r['trees']:5d} "
+            f"{r['max_depth']:5d} {r['bytes'] / 1e3:8.1f} {r['load_ms']:8.2f} "
+            f"{r['single_ms_p99']:7.3f}  {verdict:<6}{' ★ pareto' if r['pareto'] else ''}"
+        )
+    return "\n".join(lines)
+
+
+# ==================================================
+# 🚀 PIPELINE
+# ==================================================
+
+def save_artifacts(model, scaler, encoder, out_dir=".", legacy=False):
+    """
+    Write the model bundle (forest, scaler stats, labels, feature order,
+    schema version and content hash in one file). legacy=True also writes
+    the old loose files: the "Big Three" pickles and the bare compiled forest.
+    """
+    bundle_path = os.path.join(out_dir, BUNDLE_FILE)
+    arrays = build_bundle(model, scaler, encoder, FEATURE_COLUMNS)
+    # Variants of the model being replaced would otherwise outlive it
+    remove_variants(out_dir)
+    sha256 = save_bundle(bundle_path, arrays)
+    artifacts = {"bundle": {"path": bundle_path, "bytes": os.path.getsize(bundle_path),
+                            "sha256": sha256}}
+
+    if legacy:
+        paths = {
+            "model": os.path.join(out_dir, "medical_model.pkl"),
+            "scaler": os.path.join(out_dir, "scaler.pkl"),
+            "encoder": os.path.join(out_dir, "encoder.pkl"),
+            "forest": os.path.join(out_dir, "medical_forest.npz"),
+        }
+        joblib.dump(model, paths["model"])
+        joblib.dump(scaler, paths["scaler"])
+        joblib.dump(encoder, paths["encoder"])
+        save_forest(paths["forest"], export_forest(model, scaler))
+        for name, path in paths.items():
+            artifacts[name] = {"path": path, "bytes": os.path.getsize(path)}
+    return artifacts
+
+
+def format_report(reports):
+    lines = [
+        f"{'candidate':<54} {'acc':>7} {'train s':>8} {'forest MB':>9} "
+        f"{'1-row ms':>8} {'batch ms':>9}"
+    ]
+    for r in reports:
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        lines.append(
+            f"{params:<54} {r['accuracy']:7.4f} {r['train_seconds']:8.2f} "
+            f"{r['forest_bytes'] / 1e6:9.2f} {r['single_ms_p50']:8.3f} {r['batch_ms']:9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def run_pipeline(data_path="advanced_patient_dataset.csv", out_dir=".", params=None,
+                 do_sweep=False, sweep_workers=None, grid=SWEEP_GRID, report_path=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, max_rows=None, test_size=0.2, seed=42,
+                 legacy=False, do_compress=False, variants=COMPRESSION_VARIANTS,
+                 tolerance=DEFAULT_AGREEMENT_TOLERANCE, distill_rows=DEFAULT_DISTILL_ROWS,
+                 work_dir=None, in_memory=False, n_jobs=-1):
+    """
+    Load, (optionally sweep), train the chosen model and save it; with
+    do_compress, also derive and save its compressed variants. The dataset
+    is spilled to a scratch directory under work_dir (see load_dataset)
+    unless in_memory is set.
+    """
+    with contextlib.ExitStack() as stack:
+        if not in_memory:
+            work_dir = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="clinic-train-", dir=work_dir))
+        else:
+            work_dir = None
+
+        print("Loading the dataset... 📥")
+        data = load_dataset(data_path, test_size, seed, chunk_size, max_rows, work_dir)
+        print(f"{len(data.X_train):,} training / {len(data.X_test):,} held-out rows "
+              f"in {data.load_seconds:.1f}s" + ("" if work_dir is None else f" (spilled to {work_dir})"))
+
+        candidates = []
+        if do_sweep:
+            print("Sweeping hyperparameters... 🔬")
+            candidates = sweep(data, grid_candidates(grid), sweep_workers)
+            print(format_report(candidates))
+            params = select_candidate(candidates)["params"]
+
+        params = dict(DEFAULT_PARAMS, **(params or {}))
+        print(f"Training the AI model ({params})... 🧠")
+        model, _, selected = evaluate_candidate(params, data, n_jobs=n_jobs)
+        print(format_report([selected]))
+
+        artifacts = save_artifacts(model, data.scaler, data.encoder, out_dir, legacy)
+        report = {
+            "dataset": {
+                "path": str(data_path),
+                "train_rows": len(data.X_train),
+                "test_rows": len(data.X_test),
+                "load_seconds": data.load_seconds,
+            },
+            "candidates": candidates,
+            "selected": selected,
+            "artifacts": artifacts,
+        }
 
-# 1. Load the data generated in Phase 1
-df = pd.read_csv('advanced_patient_dataset.csv')
+        if do_compress:
+            print(f"Compressing (agreement with the full model ≥ {1 - tolerance:.1%})... 🗜")
+            compression = compress(model, data, out_dir, variants, tolerance, distill_rows, seed)
+            print(format_compression_report(compression, tolerance))
+            report["compression"] = compression
+            for row in compression:
+                if row["saved"]:
+                    path = os.path.join(out_dir, variant_file(row["name"]))
+                    artifacts[f"variant:{row['name']}"] = {"path": path, "bytes": row["bytes"]}
 
-# 2. Encoding (Phase 2): Convert text labels to numbers
-le = LabelEncoder()
-df['Diagnosis'] = le.fit_transform(df['Diagnosis'])
+        if report_path:
+            with open(report_path, "w") as f:
+                json.dump(report, f, indent=2)
+        return report
 
-# 3. Separate Features (Vitals) from Label (Diagnosis)
-X = df.drop('Diagnosis', axis=1)
-y = df['Diagnosis']
 
-# 4. Split: 80% for studying, 20% for testing
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+def main():
+    parser = argparse.ArgumentParser(description="Train the diagnosis model")
+    parser.add_argument("--data", default="advanced_patient_dataset.csv")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--n-estimators", type=int, default=DEFAULT_PARAMS["n_estimators"])
+    parser.add_argument("--max-depth", type=int, default=DEFAULT_PARAMS["max_depth"])
+    parser.add_argument("--min-samples-leaf", type=int, default=DEFAULT_PARAMS["min_samples_leaf"])
+    parser.add_argument("--sweep", action="store_true", help="try every SWEEP_GRID candidate")
+    parser.add_argument("--sweep-workers", type=int, default=None)
+    parser.add_argument("--report", default=None, help="write the JSON report here")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--work-dir", default=None,
+                        help="where the dataset is spilled as memory-mapped .npy files "
+                             "(default: the system temp dir; ~50 bytes a row of disk)")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="keep the dataset in RAM instead (~100 bytes a row at peak)")
+    parser.add_argument("--jobs", type=int, default=-1,
+                        help="tree-building threads for the final model (-1: every core); "
+                             "each thread past the first needs ~70 bytes per training row")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy-artifacts", action="store_true",
+                        help="also write the old .pkl files and medical_forest.npz")
+    parser.add_argument("--compress", action="store_true",
+                        help="also save the COMPRESSION_VARIANTS that agree with the full model")
+    parser.add_argument("--agreement-tolerance", type=float, default=DEFAULT_AGREEMENT_TOLERANCE,
+                        help="largest share of held-out rows a variant may answer differently")
+    parser.add_argument("--distill-rows", type=int, default=DEFAULT_DISTILL_ROWS,
+                        help="training rows the distilled variants learn from")
+    args = parser.parse_args()
 
-# 5. Scaling (Phase 2): Normalize numbers for the AI
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
+    params = {
+        "n_estimators": args.n_estimators,
+        "max_depth": args.max_depth,
+        "min_samples_leaf": args.min_samples_leaf,
+    }
+    report = run_pipeline(
+        args.data, args.out_dir, params, args.sweep, args.sweep_workers,
+        report_path=args.report, chunk_size=args.chunk_size, max_rows=args.max_rows,
+        test_size=args.test_size, seed=args.seed, legacy=args.legacy_artifacts,
+        do_compress=args.compress, tolerance=args.agreement_tolerance,
+        distill_rows=args.distill_rows, work_dir=args.work_dir, in_memory=args.in_memory,
+        n_jobs=args.jobs,
+    )
 
-# 6. Training (Phase 3): Build the Random Forest "Brain"
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-print("Training the AI model... 🧠")
-model.fit(X_train_scaled, y_train)
+    print("✅ Phase 3 Complete!")
+    print("Files generated: " + ", ".join(
+        os.path.basename(a["path"]) for a in report["artifacts"].values()
+    ))
 
-# 7. Save the files (The "Big Three")
-joblib.dump(model, 'medical_model.pkl')
-joblib.dump(scaler, 'scaler.pkl')
-joblib.dump(le, 'encoder.pkl')
 
-print("✅ Phase 3 Complete!")
-print("Files generated: medical_model.pkl, scaler.pkl, encoder.pkl")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
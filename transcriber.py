@@ -0,0 +1,371 @@
+# transcriber.py - Whisper Transcription Worker Pool (non-blocking submit/poll)
+
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from multiprocessing.connection import wait
+
+import voice
+
+QUEUED, RUNNING, DONE, FAILED, TIMEOUT, CANCELLED = (
+    "queued", "running", "done", "failed", "timeout", "cancelled"
+)
+FINISHED = (DONE, FAILED, TIMEOUT, CANCELLED)
+
+JobStatus = namedtuple("JobStatus", ["state", "result", "error", "wait_seconds", "run_seconds"])
+
+
+class QueueFull(Exception):
+    pass
+
+
+# ==================================================
+# 👷 WORKER PROCESS
+# ==================================================
+
+def _worker_main(conn, model_loader, model_name):
+    # Each worker loads its own model once, then serves jobs until told to stop
+    try:
+        model = model_loader(model_name)
+    except Exception as e:
+        conn.send(("error", None, f"model load failed: {e}"))
+        return
+    conn.send(("ready", None, None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        job_id, audio, sample_rate = message
+        try:
+            result = voice.transcribe(audio, sample_rate, model=model)
+            conn.send(("done", job_id, result))
+        except Exception as e:
+            conn.send(("failed", job_id, str(e)))
+
+
+class _Worker:
+    def __init__(self, context, model_loader, model_name):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, model_loader, model_name), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.job = None
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class _Job:
+    def __init__(self, job_id, audio, sample_rate, timeout):
+        self.id = job_id
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.timeout = timeout
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.event = threading.Event()
+
+    def finish(self, state, result=None, error=None):
+        self.state = state
+        self.result = result
+        self.error = error
+        self.finished = time.monotonic()
+        self.audio = None
+        self.event.set()
+
+    def status(self):
+        started = self.started or self.finished
+        wait_seconds = (started or time.monotonic()) - self.submitted
+        run_seconds = None
+        if self.started is not None:
+            run_seconds = (self.finished or time.monotonic()) - self.started
+        return JobStatus(self.state, self.result, self.error, wait_seconds, run_seconds)
+
+
+# ==================================================
+# 🎛 SERVICE
+# ==================================================
+
+class TranscriptionService:
+    """
+    A pool of worker processes, each holding a preloaded Whisper model.
+
+    submit() returns a job id immediately (or raises QueueFull when
+    max_queue jobs are already waiting); poll() reports progress without
+    blocking. A job that runs past its timeout, or is cancelled while
+    running, has its worker killed and replaced.
+
+    Only the dispatcher thread touches worker processes and pipes, and
+    never while holding the lock: callers just mark a worker for
+    replacement and wake it, so poll() never waits on a process join.
+    """
+
+    def __init__(self, workers=1, model_name=voice.DEFAULT_MODEL, max_queue=16,
+                 timeout=60.0, model_loader=voice.load_model, keep_finished=256):
+        self.model_name = model_name
+        self.model_loader = model_loader
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.keep_finished = keep_finished
+
+        # spawn: never fork a process that is running Streamlit/torch threads
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._queue = deque()
+        self._closed = False
+        self.completed = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.load_error = None
+        # Workers taken out of service, stopped (and respawned) by the dispatcher
+        self._doomed = []
+        self._retired = []
+
+        self._wake_r, self._wake_w = self._context.Pipe(duplex=False)
+        self._workers = [self._spawn() for _ in range(workers)]
+        self._thread = threading.Thread(target=self._dispatch, name="transcriber", daemon=True)
+        self._thread.start()
+
+    def _spawn(self):
+        return _Worker(self._context, self.model_loader, self.model_name)
+
+    def _wake(self):
+        try:
+            self._wake_w.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+
+    # ---------------------------
+    # Public API
+    def submit(self, audio, sample_rate=None, timeout=None):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("transcription service is closed")
+            if not self._workers and not self._doomed:
+                raise RuntimeError(f"no transcription workers: {self.load_error}")
+            if len(self._queue) >= self.max_queue:
+                raise QueueFull(f"{len(self._queue)} transcriptions already waiting")
+            job = _Job(next(self._ids), audio, sample_rate, timeout or self.timeout)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._forget_old()
+        self._wake()
+        return job.id
+
+    def poll(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"unknown transcription job {job_id}")
+            return job.status()
+
+    def result(self, job_id, timeout=None):
+        """Block until the job finishes (or timeout) and return its JobStatus."""
+        with self._lock:
+            job = self._jobs[job_id]
+        job.event.wait(timeout)
+        return self.poll(job_id)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED:
+                return False
+            if job.state == QUEUED:
+                self._queue.remove(job)
+                job.finish(CANCELLED)
+                return True
+            worker = next(w for w in self._workers if w.job is job)
+            job.finish(CANCELLED)
+            self._replace(worker)
+        # The dispatcher kills and respawns the worker; it may be waiting
+        # on that worker's pipe right now, so it must be the one to close it
+        self._wake()
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": len(self._workers) + len(self._doomed),
+                "ready_workers": sum(w.ready for w in self._workers),
+                "busy_workers": sum(w.job is not None for w in self._workers),
+                "queue_depth": len(self._queue),
+                "completed": self.completed,
+                "timeouts": self.timeouts,
+                "worker_restarts": self.restarts,
+                "load_error": self.load_error,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for job in self._queue:
+                job.finish(CANCELLED)
+            self._queue.clear()
+        self._wake()
+        self._thread.join(10)
+        for worker in self._doomed + self._retired:
+            worker.stop(kill=True)
+        for worker in self._workers:
+            worker.stop(kill=worker.job is not None)
+
+    # ---------------------------
+    # Dispatcher thread
+    def _forget_old(self):
+        finished = [j for j in self._jobs.values() if j.state in FINISHED]
+        for job in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+
+    def _replace(self, worker):
+        # Caller holds the lock; _restart() does the killing and spawning
+        self._workers.remove(worker)
+        self._doomed.append(worker)
+
+    def _retire(self, worker, error):
+        # A worker that never got ready (model won't load, crash on import)
+        # would fail the same way again: drop it instead of respawning
+        self.load_error = error
+        self._workers.remove(worker)
+        self._retired.append(worker)
+        if not self._workers and not self._doomed:
+            for job in self._queue:
+                job.finish(FAILED, error=error)
+            self._queue.clear()
+
+    def _assign(self):
+        for worker in self._workers:
+            if not self._queue:
+                return
+            if worker.ready and worker.job is None:
+                job = self._queue.popleft()
+                job.state = RUNNING
+                job.started = time.monotonic()
+                worker.job = job
+                worker.conn.send((job.id, job.audio, job.sample_rate))
+
+    def _handle(self, worker, message):
+        kind, job_id, payload = message
+        if kind == "ready":
+            worker.ready = True
+            return
+        if kind == "error":
+            self._retire(worker, payload)
+            return
+
+        job, worker.job = worker.job, None
+        if job is None or job.id != job_id or job.state != RUNNING:
+            return
+        if kind == "done":
+            job.finish(DONE, result=payload)
+            self.completed += 1
+        else:
+            job.finish(FAILED, error=payload)
+
+    def _expire(self):
+        now = time.monotonic()
+        for worker in list(self._workers):
+            job = worker.job
+            if job is not None and now - job.started > job.timeout:
+                job.finish(TIMEOUT, error=f"timed out after {job.timeout:g}s")
+                self.timeouts += 1
+                self._replace(worker)
+
+    def _restart(self):
+        """Stop workers taken out of service and start their replacements, without the lock."""
+        with self._lock:
+            # Doomed workers stay listed until replaced, so submit() still
+            # sees the pool's capacity while they restart
+            doomed = self._doomed[:]
+            retired, self._retired = self._retired, []
+        if not doomed and not retired:
+            return
+        for worker in doomed + retired:
+            worker.stop(kill=True)
+        fresh = [self._spawn() for _ in doomed]
+        with self._lock:
+            del self._doomed[:len(doomed)]
+            self._workers.extend(fresh)
+            self.restarts += len(fresh)
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._assign()
+                conns = {w.conn: w for w in self._workers}
+
+            for conn in wait(list(conns) + [self._wake_r], timeout=0.25):
+                if conn is self._wake_r:
+                    self._wake_r.recv()
+                    continue
+                with self._lock:
+                    worker = conns[conn]
+                    if worker not in self._workers:
+                        continue  # replaced while we waited
+                    try:
+                        self._handle(worker, conn.recv())
+                    except (EOFError, OSError) as e:
+                        if not worker.ready:
+                            self._retire(worker, "worker exited during startup")
+                            continue
+                        # Worker died mid-job: fail the job and restart the worker
+                        if worker.job is not None:
+                            worker.job.finish(FAILED, error=str(e) or "worker exited")
+                            worker.job = None
+                        self._replace(worker)
+
+            with self._lock:
+                self._expire()
+            self._restart()
+
+
+# ==================================================
+# 🔁 PROCESS-WIDE SERVICE
+# ==================================================
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_transcription_service():
+    """Shared pool, sized by CLINIC_TRANSCRIBE_WORKERS (default: half the cores)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                workers = int(os.environ.get(
+                    "CLINIC_TRANSCRIBE_WORKERS", max(1, (os.cpu_count() or 2) // 2)
+                ))
+                _service = TranscriptionService(workers=workers)
+                atexit.register(_service.close)
+    return _service
@@ -0,0 +1,328 @@
+# vitals.py - Streaming Vitals Ingestion (ring buffers, window classification, alerts)
+#
+# Bedside monitors push readings several times a second. Each (patient,
+# vital) stream keeps its last `capacity` readings in a fixed-size NumPy
+# ring buffer; whole windows are classified against hardware limits in
+# one vectorized pass, and alerts fire only once a reading has stayed out
+# of range for `confirm` consecutive samples (and clear after `clear`
+# consecutive normal ones), so one noisy sample never pages anyone.
+
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from hardware import CLASS_LABELS, NORMAL, classify_array, get_vital_limits
+
+# Monitor channels and the hardware limit each one is checked against
+STREAM_VITALS = ("heart_rate", "spo2", "bp_systolic", "bp_diastolic", "temperature")
+
+Alert = namedtuple("Alert", ["patient_id", "vital", "state", "level", "value", "time"])
+WindowStats = namedtuple(
+    "WindowStats", ["n", "last", "mean", "std", "min", "max", "out_of_range", "since", "until"]
+)
+
+
+# ==================================================
+# 🔁 RING BUFFER
+# ==================================================
+
+class RingBuffer:
+    """Fixed-capacity (time, value) buffer; writes are vectorized slice copies."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.head = 0          # next write position
+        self.size = 0
+        self.total = 0         # readings ever written
+
+    def extend(self, times, values):
+        n = len(values)
+        if n >= self.capacity:
+            # Only the newest `capacity` readings survive anyway
+            times, values = times[-self.capacity:], values[-self.capacity:]
+            self.times[:] = times
+            self.values[:] = values
+            self.head = 0
+        else:
+            first = min(n, self.capacity - self.head)
+            self.times[self.head:self.head + first] = times[:first]
+            self.values[self.head:self.head + first] = values[:first]
+            self.times[:n - first] = times[first:]
+            self.values[:n - first] = values[first:]
+            self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+        self.total += n
+
+    def window(self, n=None):
+        """The newest n readings (all by default), oldest first, as copies."""
+        n = self.size if n is None else min(n, self.size)
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.times[start:start + n].copy(), self.values[start:start + n].copy()
+        index = np.arange(start, start + n) % self.capacity
+        return self.times.take(index), self.values.take(index)
+
+
+# ==================================================
+# 📈 PER-STREAM STATE
+# ==================================================
+
+class VitalStream:
+    def __init__(self, patient_id, vital, capacity, low, high):
+        self.patient_id = patient_id
+        self.vital = vital
+        self.low = low
+        self.high = high
+        self.buffer = RingBuffer(capacity)
+        self.lock = threading.Lock()
+        # Debounce state: current run of identical codes, and what is alerting
+        self.run_code = NORMAL
+        self.run_length = 0
+        self.alerting = NORMAL
+        self.last_raised = -np.inf
+
+    def _debounce(self, times, values, codes, confirm, clear, min_interval):
+        """Walk the runs of equal codes in this batch (not every sample)."""
+        alerts = []
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(codes)]))
+
+        for start, end in zip(starts, ends):
+            code = int(codes[start])
+            before = self.run_length if code == self.run_code else 0
+            self.run_code = code
+            self.run_length = before + (end - start)
+
+            needed = clear if code == NORMAL else confirm
+            if self.run_length < needed or code == self.alerting:
+                continue
+            # Index of the sample that completed the run
+            at = start + max(needed - before, 1) - 1
+            when, value = float(times[at]), float(values[at])
+
+            if code == NORMAL:
+                alerts.append(Alert(self.patient_id, self.vital, "cleared",
+                                    CLASS_LABELS[self.alerting], value, when))
+                self.alerting = NORMAL
+            elif when - self.last_raised >= min_interval or self.alerting != NORMAL:
+                alerts.append(Alert(self.patient_id, self.vital, "raised",
+                                    CLASS_LABELS[code], value, when))
+                self.alerting = code
+                self.last_raised = when
+        return alerts
+
+
+# ==================================================
+# 🩺 MONITOR
+# ==================================================
+
+class VitalsMonitor:
+    """
+    Ingests readings for many (patient, vital) streams.
+
+    push() accepts one reading or a batch; non-finite readings (sensor
+    dropouts) are discarded. Alerts go to `on_alert` (called outside the
+    stream lock) and to the bounded `alerts` deque.
+    """
+
+    def __init__(self, capacity=1024, confirm=5, clear=10, min_interval=30.0,
+                 limits=None, on_alert=None, max_alerts=1000):
+        self.capacity = capacity
+        self.confirm = confirm
+        self.clear = clear
+        self.min_interval = min_interval
+        self.limits = limits or get_vital_limits()
+        self.on_alert = on_alert
+        self.alerts = deque(maxlen=max_alerts)
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.readings = 0
+
+    def stream(self, patient_id, vital):
+        key = (patient_id, vital)
+        stream = self._streams.get(key)
+        if stream is None:
+            if vital not in self.limits:
+                raise KeyError(f"no limits for vital {vital!r}")
+            with self._lock:
+                stream = self._streams.get(key)
+                if stream is None:
+                    low, high = self.limits[vital]
+                    stream = VitalStream(patient_id, vital, self.capacity, low, high)
+                    self._streams[key] = stream
+        return stream
+
+    def push(self, patient_id, vital, values, times=None):
+        """Add readings; returns the alerts this batch raised or cleared."""
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if times is None:
+            times = np.full(len(values), time.time())
+        else:
+            times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+
+        finite = np.isfinite(values)
+        if not finite.all():
+            values, times = values[finite], times[finite]
+        if not len(values):
+            return []
+
+        stream = self.stream(patient_id, vital)
+        codes = classify_array(values, stream.low, stream.high)
+        with stream.lock:
+            stream.buffer.extend(times, values)
+            alerts = stream._debounce(times, values, codes, self.confirm, self.clear,
+                                      self.min_interval)
+        self.readings += len(values)
+
+        for alert in alerts:
+            self.alerts.append(alert)
+            if self.on_alert is not None:
+                self.on_alert(alert)
+        return alerts
+
+    # ---------------------------
+    # Queries
+    def window(self, patient_id, vital, n=None):
+        stream = self.stream(patient_id, vital)
+        with stream.lock:
+            return stream.buffer.window(n)
+
+    def classify(self, patient_id, vital, n=None):
+        """(times, values, codes) for the newest n readings, codes index CLASS_LABELS."""
+        stream = self.stream(patient_id, vital)
+        times, values = self.window(patient_id, vital, n)
+        return times, values, classify_array(values, stream.low, stream.high)
+
+    def stats(self, patient_id, vital, seconds=None, now=None):
+        """Rolling statistics over the buffer, or just its last `seconds`."""
+        stream = self.stream(patient_id, vital)
+        times, values = self.window(patient_id, vital)
+        if seconds is not None and len(times):
+            cutoff = (times[-1] if now is None else now) - seconds
+            first = np.searchsorted(times, cutoff, side="left")
+            times, values = times[first:], values[first:]
+        if not len(values):
+            return WindowStats(0, None, None, None, None, None, 0.0, None, None)
+
+        codes = classify_array(values, stream.low, stream.high)
+        return WindowStats(
+            n=len(values),
+            last=float(values[-1]),
+            mean=float(values.mean()),
+            std=float(values.std()),
+            min=float(values.min()),
+            max=float(values.max()),
+            out_of_range=float(np.count_nonzero(codes != NORMAL) / len(codes)),
+            since=float(times[0]),
+            until=float(times[-1]),
+        )
+
+    def latest(self):
+        """
+        {(patient_id, vital): (value, label)} for every stream, classified
+        in one vectorized pass per vital.
+        """
+        with self._lock:
+            streams = list(self._streams.values())
+        by_vital = {}
+        for stream in streams:
+            if stream.buffer.size:
+                last = stream.buffer.values[(stream.buffer.head - 1) % stream.buffer.capacity]
+                by_vital.setdefault(stream.vital, []).append((stream, last))
+
+        result = {}
+        for vital, items in by_vital.items():
+            low, high = self.limits[vital]
+            values = np.fromiter((v for _, v in items), dtype=np.float64, count=len(items))
+            for (stream, value), code in zip(items, classify_array(values, low, high)):
+                result[(stream.patient_id, vital)] = (float(value), CLASS_LABELS[code])
+        return result
+
+    def active_alerts(self):
+        with self._lock:
+            streams = list(self._streams.values())
+        return {(s.patient_id, s.vital): CLASS_LABELS[s.alerting]
+                for s in streams if s.alerting != NORMAL}
+
+    def stream_count(self):
+        return len(self._streams)
+
+
+# ==================================================
+# 🧪 SIMULATED DEVICE
+# ==================================================
+
+# (baseline, random-walk step, episode offset) per vital
+SIMULATED = {
+    "heart_rate": (75.0, 1.5, 135.0),
+    "spo2": (98.0, 0.3, -10.0),
+    "bp_systolic": (118.0, 1.5, 95.0),
+    "bp_diastolic": (78.0, 1.0, 60.0),
+    "temperature": (36.8, 0.02, 5.5),
+}
+
+
+class SimulatedDevice:
+    """
+    A bedside monitor for one patient: a mean-reverting random walk per
+    vital at `rate_hz`, with occasional abnormal episodes (sustained
+    offsets) and sensor dropouts (NaN), from a seeded Generator.
+    """
+
+    def __init__(self, patient_id, rate_hz=4.0, seed=None, episode_rate=0.0002,
+                 dropout_rate=0.001, vitals=STREAM_VITALS):
+        self.patient_id = patient_id
+        self.rate_hz = rate_hz
+        self.vitals = vitals
+        self.rng = np.random.default_rng(seed)
+        self.episode_rate = episode_rate
+        self.dropout_rate = dropout_rate
+        self.state = {v: SIMULATED[v][0] for v in vitals}
+        self.episode = {v: 0 for v in vitals}   # samples of abnormal episode left
+        self.clock = 0.0
+
+    def read(self, seconds, start=None):
+        """{vital: (times, values)} covering the next `seconds` of signal."""
+        n = max(1, int(round(seconds * self.rate_hz)))
+        if start is not None:
+            self.clock = start
+        times = self.clock + np.arange(1, n + 1) / self.rate_hz
+        self.clock = float(times[-1])
+
+        batch = {}
+        for vital in self.vitals:
+            baseline, step, offset = SIMULATED[vital]
+            # Mean-reverting walk, vectorized via a cumulative sum of noise
+            noise = self.rng.normal(0.0, step, n)
+            walk = self.state[vital] + np.cumsum(noise) * 0.5 + (baseline - self.state[vital]) * 0.1
+            self.state[vital] = float(walk[-1])
+
+            shift = np.zeros(n)
+            left = self.episode[vital]
+            if left == 0 and self.rng.random() < self.episode_rate * n:
+                left = int(self.rng.integers(10, 40) * self.rate_hz)
+            if left:
+                shift[:min(left, n)] = offset
+                left = max(0, left - n)
+            self.episode[vital] = left
+
+            values = walk + shift
+            if vital == "spo2":
+                np.minimum(values, 100.0, out=values)
+            values[self.rng.random(n) < self.dropout_rate] = np.nan
+            batch[vital] = (times, values)
+        return batch
+
+
+def feed(monitor, devices, seconds, start=None):
+    """Push `seconds` of simulated readings from every device into monitor."""
+    alerts = []
+    for device in devices:
+        for vital, (times, values) in device.read(seconds, start).items():
+            alerts += monitor.push(device.patient_id, vital, values, times)
+    return alerts
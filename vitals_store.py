@@ -0,0 +1,371 @@
+# vitals_store.py - Vitals History (columnar blocks in SQLite, downsampling, retention)
+#
+# Readings for each (patient, metric) series are buffered in memory and
+# written as blocks: one vitals_blocks row holds up to BLOCK_SIZE readings
+# as two packed arrays (uint32 millisecond offsets from start_ms, float32
+# values), 8 bytes a reading. Range queries read only the blocks whose
+# [start_ms, end_ms] overlaps the range, through the series index. Raw
+# blocks older than the retention window are folded into hourly rollups
+# before they are deleted, so long trends survive at coarser resolution.
+
+import atexit
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import database
+import metrics
+
+BLOCK_SIZE = 4096
+MAX_BLOCK_SPAN_MS = 86_400_000         # keeps uint32 offsets far from overflow
+ROLLUP_MS = 3_600_000
+RAW_RETENTION_DAYS = 30
+
+_FAR_PAST, _FAR_FUTURE = -(2 ** 62), 2 ** 62
+
+Buckets = namedtuple("Buckets", ["start", "n", "min", "max", "mean"])
+
+
+# ==================================================
+# 📦 BLOCK ENCODING
+# ==================================================
+
+def _to_ms(seconds):
+    return np.rint(np.asarray(seconds, dtype=np.float64) * 1e3).astype(np.int64)
+
+
+def _bound_ms(seconds, default):
+    return default if seconds is None else int(round(seconds * 1e3))
+
+
+def _encode(t_ms, values):
+    start = int(t_ms[0])
+    return (start, int(t_ms[-1]), len(t_ms),
+            (t_ms - start).astype("<u4").tobytes(), values.astype("<f4").tobytes())
+
+
+def _decode(start_ms, times, vals):
+    return start_ms + np.frombuffer(times, "<u4").astype(np.int64), np.frombuffer(vals, "<f4")
+
+
+def _sorted(t_ms, values):
+    if len(t_ms) > 1 and (np.diff(t_ms) < 0).any():
+        order = np.argsort(t_ms, kind="stable")
+        return t_ms[order], values[order]
+    return t_ms, values
+
+
+def _split(t_ms, values, block_size):
+    """Consecutive slices of at most block_size readings and MAX_BLOCK_SPAN_MS."""
+    i = 0
+    while i < len(t_ms):
+        end = min(i + block_size,
+                  int(np.searchsorted(t_ms, t_ms[i] + MAX_BLOCK_SPAN_MS, side="left")))
+        yield t_ms[i:end], values[i:end]
+        i = end
+
+
+def _reduce(index, n, lo, hi, total):
+    """Collapse sorted bucket indexes to per-bucket count/min/max/sum."""
+    buckets, first = np.unique(index, return_index=True)
+    return (buckets, np.add.reduceat(n, first), np.minimum.reduceat(lo, first),
+            np.maximum.reduceat(hi, first), np.add.reduceat(total, first))
+
+
+# ==================================================
+# 🗄 STORE
+# ==================================================
+
+class VitalsStore:
+    """
+    Append-mostly vitals history on top of the clinic database.
+
+    append() only buffers; a series is written once it holds block_size
+    readings, and everything is written once the oldest buffered reading
+    is flush_interval seconds old (checked on append) or on flush(). A
+    flush tops up the series' last block before starting new ones, so a
+    trickle of small flushes still ends up in full-size blocks. Reads
+    include readings that are still buffered.
+    """
+
+    def __init__(self, db_path=None, block_size=BLOCK_SIZE, flush_interval=5.0):
+        self.db_path = db_path
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self._pending = {}          # (patient_id, metric) -> ([t_ms arrays], [value arrays], count)
+        self._oldest = None         # monotonic time the oldest pending reading arrived
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # Writes
+    def append(self, patient_id, metric, values, times=None):
+        """Buffer readings (times in epoch seconds; default now). NaNs are dropped."""
+        values = np.atleast_1d(np.asarray(values, dtype=np.float32))
+        if times is None:
+            t_ms = np.full(len(values), _to_ms(time.time()), dtype=np.int64)
+        else:
+            t_ms = np.atleast_1d(_to_ms(times))
+        finite = np.isfinite(values)
+        if not finite.all():
+            t_ms, values = t_ms[finite], values[finite]
+        if not len(values):
+            return
+
+        key = (patient_id, metric)
+        with self._lock:
+            entry = self._pending.setdefault(key, [[], [], 0])
+            entry[0].append(t_ms)
+            entry[1].append(values)
+            entry[2] += len(values)
+            full = entry[2] >= self.block_size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            stale = time.monotonic() - self._oldest >= self.flush_interval
+
+        if stale:
+            self.flush()
+        elif full:
+            self.flush([key])
+
+    def record(self, patient_id, readings, when=None, flush=True):
+        """One reading per metric at the same time, e.g. a form's vitals."""
+        when = time.time() if when is None else when
+        for metric, value in readings.items():
+            self.append(patient_id, metric, value, when)
+        if flush:
+            self.flush()
+
+    def _take(self, keys=None):
+        with self._lock:
+            if keys is None:
+                taken, self._pending = self._pending, {}
+            else:
+                taken = {k: self._pending.pop(k) for k in keys if k in self._pending}
+            if not self._pending:
+                self._oldest = None
+        return taken
+
+    def _restore(self, taken):
+        # A failed flush puts its readings back rather than losing them
+        with self._lock:
+            for key, (times, values, count) in taken.items():
+                entry = self._pending.setdefault(key, [[], [], 0])
+                entry[0][:0] = times
+                entry[1][:0] = values
+                entry[2] += count
+            if self._pending and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def flush(self, keys=None):
+        """Write buffered readings (all series, or just `keys`) in one transaction."""
+        taken = self._take(keys)
+        if not taken:
+            return 0
+        written = 0
+        try:
+            with metrics.timed("vitals_flush_seconds"), database.transaction(self.db_path) as conn:
+                for (patient_id, metric), (times, values, _) in taken.items():
+                    written += self._write_series(conn, patient_id, metric,
+                                                  np.concatenate(times), np.concatenate(values))
+        except Exception:
+            self._restore(taken)
+            raise
+        metrics.count("vitals_readings_written_total", written)
+        return written
+
+    def _write_series(self, conn, patient_id, metric, t_ms, values):
+        t_ms, values = _sorted(t_ms, values)
+        tail = conn.execute(
+            "SELECT rowid, start_ms, end_ms, n, times, vals FROM vitals_blocks"
+            " WHERE patient_id = ? AND metric = ? ORDER BY end_ms DESC LIMIT 1",
+            (patient_id, metric),
+        ).fetchone()
+        # Top up a partial last block when the new readings follow it in time
+        if (tail is not None and tail[3] < self.block_size and tail[2] <= t_ms[0]
+                and t_ms[0] - tail[1] < MAX_BLOCK_SPAN_MS):
+            old_t, old_v = _decode(tail[1], tail[4], tail[5])
+            t_ms = np.concatenate((old_t, t_ms))
+            values = np.concatenate((old_v, values))
+            conn.execute("DELETE FROM vitals_blocks WHERE rowid = ?", (tail[0],))
+            written = len(t_ms) - tail[3]
+        else:
+            written = len(t_ms)
+
+        conn.executemany(
+            "INSERT INTO vitals_blocks (patient_id, metric, start_ms, end_ms, n, times, vals)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((patient_id, metric) + _encode(t, v) for t, v in _split(t_ms, values, self.block_size)),
+        )
+        return written
+
+    # ---------------------------
+    # Reads
+    def _raw_ms(self, patient_id, metric, start_ms, end_ms):
+        with database.connection(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT start_ms, times, vals FROM vitals_blocks"
+                " WHERE patient_id = ? AND metric = ? AND end_ms >= ? AND start_ms <= ?"
+                " ORDER BY start_ms",
+                (patient_id, metric, start_ms, end_ms),
+            ).fetchall()
+        parts = [_decode(*row) for row in rows]
+
+        with self._lock:
+            entry = self._pending.get((patient_id, metric))
+            if entry is not None:
+                parts.append((np.concatenate(entry[0]), np.concatenate(entry[1])))
+        if not parts:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+
+        t_ms, values = _sorted(np.concatenate([p[0] for p in parts]),
+                               np.concatenate([p[1] for p in parts]))
+        lo = np.searchsorted(t_ms, start_ms, side="left")
+        hi = np.searchsorted(t_ms, end_ms, side="right")
+        return t_ms[lo:hi], values[lo:hi]
+
+    def range(self, patient_id, metric, start=None, end=None):
+        """Raw (times, values) with start <= time <= end (epoch seconds), oldest first."""
+        with metrics.timed("vitals_query_seconds", kind="range"):
+            t_ms, values = self._raw_ms(patient_id, metric, _bound_ms(start, _FAR_PAST),
+                                        _bound_ms(end, _FAR_FUTURE))
+            return t_ms / 1e3, values.astype(np.float64)
+
+    def downsample(self, patient_id, metric, start, end, buckets=200, bucket_seconds=None):
+        """
+        Min/max/mean per time bucket over [start, end) for charting; only
+        non-empty buckets are returned. Readings already rolled up count
+        in the bucket their hour starts in.
+        """
+        with metrics.timed("vitals_query_seconds", kind="downsample"):
+            start_ms, end_ms = _bound_ms(start, None), _bound_ms(end, None)
+            width = int(bucket_seconds * 1e3) if bucket_seconds else max(
+                1, -(-(end_ms - start_ms) // buckets))
+
+            parts = []
+            t_ms, values = self._raw_ms(patient_id, metric, start_ms, end_ms - 1)
+            if len(t_ms):
+                v = values.astype(np.float64)
+                parts.append(_reduce((t_ms - start_ms) // width, np.ones(len(v), np.int64), v, v, v))
+
+            with database.connection(self.db_path) as conn:
+                rollups = conn.execute(
+                    "SELECT bucket_ms, n, vmin, vmax, vsum FROM vitals_rollups"
+                    " WHERE patient_id = ? AND metric = ? AND bucket_ms >= ? AND bucket_ms < ?"
+                    " ORDER BY bucket_ms",
+                    (patient_id, metric, start_ms, end_ms),
+                ).fetchall()
+            if rollups:
+                r = np.array(rollups, dtype=np.float64)
+                parts.append(_reduce((r[:, 0].astype(np.int64) - start_ms) // width,
+                                     r[:, 1].astype(np.int64), r[:, 2], r[:, 3], r[:, 4]))
+
+            if not parts:
+                empty = np.empty(0)
+                return Buckets(empty, np.empty(0, np.int64), empty, empty, empty)
+            if len(parts) == 2:
+                columns = [np.concatenate(cols) for cols in zip(*parts)]
+                order = np.argsort(columns[0], kind="stable")
+                parts = [_reduce(*(col[order] for col in columns))]
+
+            index, n, lo, hi, total = parts[0]
+            return Buckets((start_ms + index * width) / 1e3, n, lo, hi, total / n)
+
+    def series(self, patient_id):
+        """Metric names with any history for this patient."""
+        with database.connection(self.db_path) as conn:
+            names = {row[0] for row in conn.execute(
+                "SELECT DISTINCT metric FROM vitals_blocks WHERE patient_id = ?", (patient_id,))}
+            names.update(row[0] for row in conn.execute(
+                "SELECT DISTINCT metric FROM vitals_rollups WHERE patient_id = ?", (patient_id,)))
+        with self._lock:
+            names.update(metric for pid, metric in self._pending if pid == patient_id)
+        return sorted(names)
+
+    # ---------------------------
+    # Retention
+    def expire(self, max_age_days=RAW_RETENTION_DAYS, now=None):
+        """
+        Fold raw readings older than max_age_days into hourly rollups and
+        delete them; a block straddling the cutoff keeps its newer part.
+        Returns the number of raw readings removed.
+        """
+        self.flush()
+        cutoff = _bound_ms((time.time() if now is None else now) - max_age_days * 86400, None)
+        removed = 0
+        with database.transaction(self.db_path) as conn:
+            blocks = conn.execute(
+                "SELECT rowid, patient_id, metric, start_ms, times, vals FROM vitals_blocks"
+                " WHERE start_ms < ?", (cutoff,)
+            ).fetchall()
+            for rowid, patient_id, metric, start_ms, times, vals in blocks:
+                t_ms, values = _decode(start_ms, times, vals)
+                split = int(np.searchsorted(t_ms, cutoff, side="left"))
+                old_v = values[:split].astype(np.float64)
+                index, n, lo, hi, total = _reduce(
+                    t_ms[:split] // ROLLUP_MS, np.ones(split, np.int64), old_v, old_v, old_v)
+                conn.executemany(
+                    "INSERT INTO vitals_rollups (patient_id, metric, bucket_ms, n, vmin, vmax, vsum)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (patient_id, metric, bucket_ms) DO UPDATE SET"
+                    " n = n + excluded.n, vmin = min(vmin, excluded.vmin),"
+                    " vmax = max(vmax, excluded.vmax), vsum = vsum + excluded.vsum",
+                    ((patient_id, metric, int(b) * ROLLUP_MS, int(c), float(mn), float(mx), float(s))
+                     for b, c, mn, mx, s in zip(index, n, lo, hi, total)),
+                )
+                conn.execute("DELETE FROM vitals_blocks WHERE rowid = ?", (rowid,))
+                if split < len(t_ms):
+                    conn.execute(
+                        "INSERT INTO vitals_blocks (patient_id, metric, start_ms, end_ms, n, times, vals)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (patient_id, metric) + _encode(t_ms[split:], values[split:]),
+                    )
+                removed += split
+        return removed
+
+    def stats(self):
+        with database.connection(self.db_path) as conn:
+            blocks, readings, payload = conn.execute(
+                "SELECT count(*), coalesce(sum(n), 0), coalesce(sum(length(times) + length(vals)), 0)"
+                " FROM vitals_blocks"
+            ).fetchone()
+            rollups = conn.execute("SELECT count(*) FROM vitals_rollups").fetchone()[0]
+        with self._lock:
+            pending = sum(entry[2] for entry in self._pending.values())
+        return {
+            "blocks": blocks,
+            "readings": readings,
+            "payload_bytes": payload,
+            "bytes_per_reading": payload / readings if readings else 0.0,
+            "rollup_rows": rollups,
+            "pending_readings": pending,
+        }
+
+
+# ==================================================
+# 🔁 PROCESS-WIDE STORE
+# ==================================================
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_vitals_store(db_path=None):
+    """One store per database file, shared by every session in the process."""
+    db_path = db_path or database.DB_PATH
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = VitalsStore(db_path)
+        return _stores[db_path]
+
+
+def flush_all():
+    """Write out every store's buffered readings (process exit, tests)."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+atexit.register(flush_all)
@@ -1,17 +1,209 @@
 # voice.py - Whisper-based Speech Recognition Helper (LOW MEMORY)
 
-import whisper
+import io
+import os
+import subprocess
+import time
+import wave
+from collections import namedtuple
+from math import gcd
+
+import numpy as np
+
+import metrics
 
 # Tiny model = fastest + lowest RAM
-model = whisper.load_model("tiny")
+DEFAULT_MODEL = "tiny"
+
+SAMPLE_RATE = 16000  # what Whisper expects
+
+TranscriptionResult = namedtuple(
+    "TranscriptionResult",
+    ["text", "audio_seconds", "speech_seconds", "skipped_seconds", "latency_seconds"],
+)
+
+
+# ==================================================
+# 🎧 IN-MEMORY DECODING
+# ==================================================
+
+def _decode_wav(data):
+    with wave.open(io.BytesIO(data)) as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"unsupported WAV sample width: {width} bytes")
+
+    return samples.reshape(-1, channels).mean(axis=1), rate
+
 
-def recognize_audio(audio_path):
+def _decode_ffmpeg(data):
+    # Anything that isn't plain WAV (e.g. the recorder's webm) goes through
+    # ffmpeg over pipes, already downmixed and resampled - no temp file
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+        input=data, capture_output=True, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768, SAMPLE_RATE
+
+
+def _resample(samples, rate):
+    if rate == SAMPLE_RATE:
+        return samples
     try:
-        result = model.transcribe(audio_path, fp16=False)
+        from scipy.signal import resample_poly
+    except ImportError:
+        # Linear interpolation: no anti-aliasing, but fine for speech
+        duration = len(samples) / rate
+        target = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+        return np.interp(target, np.arange(len(samples)) / rate, samples).astype(np.float32)
+    divisor = gcd(SAMPLE_RATE, rate)
+    return resample_poly(samples, SAMPLE_RATE // divisor, rate // divisor).astype(np.float32)
+
+
+def decode_audio(audio, sample_rate=None):
+    """
+    Return mono float32 samples at 16 kHz.
+
+    audio may be a file path, encoded bytes (WAV is parsed directly,
+    anything else is piped through ffmpeg) or a NumPy sample buffer;
+    int16 buffers are scaled to [-1, 1] and sample_rate defaults to 16 kHz.
+    """
+    if isinstance(audio, (str, os.PathLike)):
+        with open(audio, "rb") as f:
+            audio = f.read()
+
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        data = bytes(audio)
+        if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+            samples, rate = _decode_wav(data)
+        else:
+            samples, rate = _decode_ffmpeg(data)
+    else:
+        samples = np.asarray(audio)
+        rate = sample_rate or SAMPLE_RATE
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768
+        samples = samples.astype(np.float32, copy=False)
+        if samples.ndim == 2:
+            # (frames, channels) is what most audio libraries hand back
+            samples = samples.mean(axis=1)
+
+    return _resample(np.ascontiguousarray(samples, dtype=np.float32), rate)
+
+
+# ==================================================
+# 🔇 VOICE ACTIVITY DETECTION
+# ==================================================
+
+FRAME_SECONDS = 0.03
+PAD_SECONDS = 0.2          # keep this much audio either side of speech
+MAX_GAP_SECONDS = 0.6      # internal silences longer than this ...
+KEEP_GAP_SECONDS = 0.3     # ... are shortened to this
+
+
+def trim_silence(samples, min_level_db=-45.0, max_level_db=-30.0, margin_db=12.0):
+    """
+    Energy-based VAD: frames louder than the noise floor + margin count as
+    speech (the threshold is clamped to [min_level_db, max_level_db] dBFS
+    so a recording that is all speech is not mistaken for noise). Returns
+    the samples with leading/trailing silence removed and long internal
+    pauses shortened, plus the number of seconds removed.
+    """
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return samples, 0.0
+
+    frames = samples[: n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    level_db = 20 * np.log10(np.maximum(rms, 1e-10))
+
+    noise_floor = np.percentile(level_db, 10)
+    threshold = min(max(noise_floor + margin_db, min_level_db), max_level_db)
+    speech = level_db > threshold
+    if not speech.any():
+        return samples[:0], len(samples) / SAMPLE_RATE
+
+    # Pad speech regions, then shorten long runs of silence between them
+    pad = int(PAD_SECONDS / FRAME_SECONDS)
+    keep = np.convolve(speech, np.ones(2 * pad + 1, dtype=bool), mode="same") > 0
+
+    max_gap = int(MAX_GAP_SECONDS / FRAME_SECONDS)
+    keep_gap = int(KEEP_GAP_SECONDS / FRAME_SECONDS)
+    first, last = np.flatnonzero(keep)[[0, -1]]
+    inner = keep[first:last + 1]  # view: edits land in keep
+
+    # Silent runs between speech: short pauses stay, long ones shrink
+    change = np.diff(np.concatenate(([1], inner.astype(np.int8), [1])))
+    for start, stop in zip(np.flatnonzero(change == -1), np.flatnonzero(change == 1)):
+        if stop - start <= max_gap:
+            inner[start:stop] = True
+        else:
+            inner[start:start + keep_gap // 2] = True
+            inner[stop - (keep_gap - keep_gap // 2):stop] = True
+
+    trimmed = frames[keep].ravel()
+    skipped = (len(samples) - len(trimmed)) / SAMPLE_RATE
+    return trimmed, skipped
+
+
+# ==================================================
+# 🗣 TRANSCRIPTION
+# ==================================================
+
+_models = {}
+
+
+def load_model(name=DEFAULT_MODEL):
+    """Load (once per process) and return a Whisper model."""
+    if name not in _models:
+        import whisper
+        _models[name] = whisper.load_model(name)
+    return _models[name]
+
+
+def transcribe(audio, sample_rate=None, model=None):
+    """Decode, trim silence and run Whisper; returns a TranscriptionResult."""
+    start = time.perf_counter()
+    samples = decode_audio(audio, sample_rate)
+    speech, skipped = trim_silence(samples)
+
+    text = ""
+    if len(speech):
+        if model is None:
+            model = load_model()
+        result = model.transcribe(speech, fp16=False)
         text = result.get("text", "").strip()
-        if text == "":
+
+    return TranscriptionResult(
+        text=text,
+        audio_seconds=len(samples) / SAMPLE_RATE,
+        speech_seconds=len(speech) / SAMPLE_RATE,
+        skipped_seconds=skipped,
+        latency_seconds=time.perf_counter() - start,
+    )
+
+
+def recognize_audio(audio, sample_rate=None):
+    try:
+        # Timed inside the try so a failure counts in transcription_errors_total
+        with metrics.timed("transcription_seconds", source="inline"):
+            result = transcribe(audio, sample_rate)
+        metrics.count("transcription_audio_seconds_total", result.audio_seconds)
+        if result.text == "":
             return None
-        return text.lower()
+        return result.text.lower()
     except Exception as e:
         print("Whisper Error:", e)
         return None
@@ -0,0 +1,214 @@
+# writer.py - Write-Behind Queue with Group Commit (prescriptions & emergencies)
+
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import database
+import metrics
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Background writer for prescription and emergency rows.
+
+    The UI thread enqueues a row and gets a Future back straight away; a
+    single writer thread commits queued rows together, one transaction per
+    batch_size rows or flush_interval seconds, whichever comes first.
+    Emergencies can skip the queue with immediate=True and are committed
+    synchronously with a full fsync.
+    """
+
+    def __init__(self, db_path=None, max_queue=1000, batch_size=64,
+                 flush_interval=0.05, latency_window=1000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._close_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._commit_latency = deque(maxlen=latency_window)
+        self.batches_committed = 0
+        self.rows_committed = 0
+        self.rows_failed = 0
+        self.immediate_commits = 0
+        self.overflow_commits = 0
+
+        self._thread = threading.Thread(target=self._run, name="clinic-writer", daemon=True)
+        self._thread.start()
+
+    # ---------------------------
+    # Submission
+    def submit(self, row, immediate=False, timeout=0.5):
+        """
+        Queue a Prescription row; the Future resolves to the row once it
+        is committed. If the queue stays full for `timeout` seconds the
+        row is written synchronously rather than dropped.
+        """
+        future = Future()
+        if immediate:
+            if self._closed:
+                raise RuntimeError("writer is closed")
+            self._commit_now(row, future, durable=True)
+            with self._stats_lock:
+                self.immediate_commits += 1
+            return future
+
+        # Checked and queued under the close lock, so nothing can land
+        # behind the stop marker and be left unresolved
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("writer is closed")
+            try:
+                self._queue.put((row, future), timeout=timeout)
+                return future
+            except queue.Full:
+                pass
+        self._commit_now(row, future, durable=False)
+        with self._stats_lock:
+            self.overflow_commits += 1
+        return future
+
+    def submit_prescription(self, patient_id, symptom, sub_symptom, medicine, dosage, bin):
+        row = database.new_prescription(patient_id, symptom, sub_symptom, medicine, dosage, bin)
+        return self.submit(row)
+
+    def submit_emergency(self, patient_id, reason, when=None, immediate=True):
+        return self.submit(database.new_emergency(patient_id, reason, when), immediate=immediate)
+
+    # ---------------------------
+    # Writer thread
+    def _commit_now(self, row, future, durable):
+        start = time.perf_counter()
+        try:
+            with database.transaction(self.db_path, durable=durable) as conn:
+                database.insert_prescription(conn, row)
+        except Exception as e:
+            future.set_exception(e)
+            with self._stats_lock:
+                self.rows_failed += 1
+            return
+        self._record(time.perf_counter() - start, 1)
+        future.set_result(row)
+
+    def _commit_batch(self, batch):
+        start = time.perf_counter()
+        try:
+            with database.transaction(self.db_path) as conn:
+                for row, _ in batch:
+                    database.insert_prescription(conn, row)
+        except Exception:
+            # One bad row must not sink the rest of the batch: retry singly
+            for row, future in batch:
+                self._commit_now(row, future, durable=False)
+            return
+
+        self._record(time.perf_counter() - start, len(batch))
+        for row, future in batch:
+            future.set_result(row)
+
+    def _record(self, seconds, rows):
+        metrics.observe("db_commit_seconds", seconds)
+        metrics.count("db_commit_rows_total", rows)
+        with self._stats_lock:
+            self._commit_latency.append(seconds)
+            self.batches_committed += 1
+            self.rows_committed += rows
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit_batch(batch)
+
+    # ---------------------------
+    # Shutdown & stats
+    def close(self):
+        """Commit everything queued, then checkpoint the WAL so it is on disk."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        # Every row queued before the stop marker is committed (or its
+        # future fails) before the thread exits; nothing is dropped
+        self._thread.join()
+
+        with database.connection(self.db_path) as conn:
+            conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = sorted(self._commit_latency)
+            batches = self.batches_committed
+            rows = self.rows_committed
+            stats = {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "batches_committed": batches,
+                "rows_committed": rows,
+                "rows_failed": self.rows_failed,
+                "immediate_commits": self.immediate_commits,
+                "overflow_commits": self.overflow_commits,
+                "mean_batch_size": rows / batches if batches else 0.0,
+            }
+        if latencies:
+            stats["commit_ms_p50"] = latencies[len(latencies) // 2] * 1e3
+            stats["commit_ms_p99"] = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1e3
+            stats["commit_ms_max"] = latencies[-1] * 1e3
+        return stats
+
+
+# ==================================================
+# 🔁 PROCESS-WIDE WRITER
+# ==================================================
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path=None):
+    """One writer per database file, shared by every session in the process."""
+    db_path = db_path or database.DB_PATH
+    with _writers_lock:
+        if db_path not in _writers:
+            _writers[db_path] = WriteBehindQueue(db_path)
+        return _writers[db_path]
+
+
+def close_all():
+    """Flush and close every writer (process exit, tests, benchmarks)."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_all)